@@ -0,0 +1,108 @@
+"""Measure backend cold start: import time of app.py and time to a green health check.
+
+Examples:
+    python bench_startup.py                  # import app.py 5 times in fresh interpreters
+    python bench_startup.py --serve          # also start gunicorn and poll /api/status
+    python bench_startup.py --budget 1.0     # exit 1 if the health check takes longer
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+# Modules that should only be loaded once a scrape job runs
+LAZY_MODULES = ('scraper', 'firecrawl', 'pydantic')
+
+IMPORT_PROBE = """
+import sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+loaded = [name for name in {lazy!r} if name in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+
+def time_import(workdir, env):
+    """(seconds, eagerly loaded lazy modules) for `import app` in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_PROBE.format(lazy=LAZY_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1].split(',') if len(output) > 1 else []
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_health_check(workdir, env, timeout):
+    """Seconds from launching gunicorn until /api/status answers, or None."""
+    port = free_port()
+    env = dict(env, PORT=str(port))
+    url = f'http://127.0.0.1:{port}/api/status'
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(SRC_DIR, 'gunicorn.conf.py'), 'app:app'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        return None
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend startup")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--serve', action='store_true', help="Also time gunicorn until /api/status answers")
+    parser.add_argument('--budget', type=float, default=None, help="Fail if startup exceeds this many seconds")
+    args = parser.parse_args()
+
+    # A scratch working directory so the benchmark never touches real data/
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+
+    timings = []
+    eager = set()
+    for _ in range(args.repeat):
+        elapsed, loaded = time_import(workdir, env)
+        timings.append(elapsed)
+        eager.update(loaded)
+    print(f"import app: median {statistics.median(timings) * 1000:.0f} ms, "
+          f"best {min(timings) * 1000:.0f} ms over {args.repeat} runs")
+    if eager:
+        print(f"loaded at import (should be lazy): {', '.join(sorted(eager))}")
+
+    startup = statistics.median(timings)
+    if args.serve:
+        startup = time_health_check(workdir, env, timeout=max(args.budget or 0, 10.0))
+        if startup is None:
+            print("health check: no answer")
+            sys.exit(1)
+        print(f"health check green after {startup * 1000:.0f} ms")
+
+    if eager or (args.budget is not None and startup > args.budget):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+"""Saved searches evaluated against what each crawl changed, with an outbox for delivery.
+
+When a new broker file is published (or the ListingStore loads one that was
+not), the history store diffs it against the broker's previous file. Only those changed units (new, repriced
+or otherwise updated) are matched against the saved searches, so the cost of
+a crawl's alerting follows the number of changes rather than every listing.
+The searches themselves are held in a PredicateIndex (term lists for broker,
+city and keywords, interval trees for the SF and $/SF ranges), so a changed
+unit only touches the searches whose predicates it hits, not all of them.
+Matches are queued in an outbox table and delivered to each search's webhook,
+or appended to a local JSONL sink when it has none. Failed webhook deliveries
+are retried with backoff, by the API's delivery loop (every DELIVERY_INTERVAL
+seconds) or `python alerts.py deliver`. Webhooks must be http(s) URLs of
+public hosts, and are posted to the address that was checked.
+
+Examples:
+    python alerts.py add "Midtown under $60" --city manhattan --max-psf 60 --min-sf 2000
+    python alerts.py add "JLL lofts" --broker jll --keywords "loft penthouse"
+    python alerts.py list
+    python alerts.py deliver
+    python alerts.py bench --searches 5000     # index vs. checking every search
+"""
+import argparse
+import http.client
+import ipaddress
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+from listings import BROKER_DATA_DIR, assign_unit_ids, latest_broker_files
+from predicates import PredicateIndex, unit_cities, unit_tokens
+from search import tokenize
+
+ALERTS_DB = os.environ.get('ALERTS_DB', os.path.join('data', 'alerts.db'))
+
+# Matches for searches without a webhook are appended here
+OUTBOX_SINK = os.environ.get('ALERTS_SINK', os.path.join('data', 'alerts_outbox.jsonl'))
+
+# Changes a saved search can subscribe to (units that disappear are not alerted)
+ALERT_CHANGES = ('new', 'repriced', 'updated')
+DEFAULT_CHANGES = ('new', 'repriced')
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 60
+WEBHOOK_TIMEOUT = 10
+DELIVERY_INTERVAL = 60         # seconds between delivery passes of the API's background loop
+
+WEBHOOK_SCHEMES = ('http', 'https')
+
+# Unit fields copied into an alert
+UNIT_FIELDS = (
+    'id', 'broker', 'property_name', 'address', 'location', 'borough', 'floor_suite',
+    'space_available', 'price', 'annual_psf', 'annual_rent', 'size_sf', 'listing_url'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_searches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    broker TEXT,
+    city TEXT,                     -- location city or borough, case-insensitive
+    min_sf REAL,
+    max_sf REAL,
+    min_psf REAL,                  -- annual $/SF
+    max_psf REAL,
+    keywords TEXT,                 -- every token must appear in the unit's name, address or suite
+    changes TEXT NOT NULL,         -- comma-separated subset of ALERT_CHANGES
+    webhook_url TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    search_id INTEGER NOT NULL,
+    unit_id TEXT NOT NULL,
+    change TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (next_attempt_at) WHERE delivered_at IS NULL;
+CREATE INDEX IF NOT EXISTS outbox_search ON outbox (search_id, created_at);
+"""
+
+# Columns added to saved_searches after it was first created
+ADDED_COLUMNS = (('broker', 'TEXT'), ('min_psf', 'REAL'), ('keywords', 'TEXT'))
+
+
+def check_webhook_url(url):
+    """Raise ValueError unless url is http(s) to a host whose addresses are all public; returns them.
+
+    Webhooks are posted from inside the deployment, so a URL pointing at
+    localhost, a private network or the cloud metadata address
+    (169.254.169.254) would let anyone who saves a search reach them.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in WEBHOOK_SCHEMES or not parts.hostname:
+        raise ValueError(f"webhook_url must be an http or https URL: {url}")
+    try:
+        addresses = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(parts.hostname, None, proto=socket.IPPROTO_TCP)))
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"webhook_url host {parts.hostname} does not resolve: {e}")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ValueError(f"webhook_url host {parts.hostname} resolves to a non-public address ({address})")
+    return addresses
+
+
+class _PinnedAddress:
+    """Connects to an address checked beforehand instead of resolving the host again.
+
+    Resolving twice would let a host answer with a public address for the
+    check and a private one for the request (DNS rebinding). The URL's host
+    still goes in the Host header and, for https, the SNI and certificate check.
+    """
+
+    def __init__(self, address, host, port=None, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self._create_connection = lambda target, *args: socket.create_connection((address, target[1]), *args)
+
+
+class _PinnedHTTPConnection(_PinnedAddress, http.client.HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedAddress, http.client.HTTPSConnection):
+    pass
+
+
+def post_webhook(url, payload):
+    """POST a JSON payload to a checked webhook URL; raises on errors and on any non-2xx, redirects included."""
+    address = check_webhook_url(url)[0]
+    parts = urllib.parse.urlsplit(url)
+    connection_class = _PinnedHTTPSConnection if parts.scheme == 'https' else _PinnedHTTPConnection
+    connection = connection_class(address, parts.hostname, parts.port, timeout=WEBHOOK_TIMEOUT)
+    try:
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        connection.request('POST', path, payload.encode('utf-8'), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        if not 200 <= response.status < 300:
+            raise OSError(f"webhook answered {response.status} {response.reason}")
+    finally:
+        connection.close()
+
+
+def matches(search, change):
+    """Whether one changed unit satisfies a saved search (the reference PredicateIndex is checked against)."""
+    if change['change'] not in search['changes']:
+        return False
+    unit = change['unit']
+    if search.get('broker') and search['broker'] != unit.get('broker'):
+        return False
+    if search['city'] and search['city'].lower() not in unit_cities(unit):
+        return False
+    size = unit.get('size_sf')
+    if search['min_sf'] is not None and (size is None or size < search['min_sf']):
+        return False
+    if search['max_sf'] is not None and (size is None or size > search['max_sf']):
+        return False
+    psf = unit.get('annual_psf')
+    if search.get('min_psf') is not None and (psf is None or psf < search['min_psf']):
+        return False
+    if search['max_psf'] is not None and (psf is None or psf > search['max_psf']):
+        return False
+    if search.get('keywords') and not set(tokenize(search['keywords'])) <= unit_tokens(unit):
+        return False
+    return True
+
+
+def build_indexes(searches):
+    """{change type: PredicateIndex of the searches subscribed to it}."""
+    return {change: PredicateIndex([search for search in searches if change in search['changes']]) for change in ALERT_CHANGES}
+
+
+class AlertStore:
+    """Saved searches and their alert outbox in SQLite (shared by every worker)."""
+
+    def __init__(self, path=ALERTS_DB, sink_path=OUTBOX_SINK):
+        self.path = path
+        self.sink_path = sink_path
+        self.local = threading.local()
+        self.delivering = threading.Lock()
+        self.index_lock = threading.Lock()
+        self.indexed = None    # (signature, searches by id, indexes)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        existing = {row['name'] for row in connection.execute('PRAGMA table_info(saved_searches)')}
+        for column, kind in ADDED_COLUMNS:
+            if column not in existing:
+                connection.execute(f'ALTER TABLE saved_searches ADD COLUMN {column} {kind}')
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def add_search(self, name, *, broker=None, city=None, min_sf=None, max_sf=None, min_psf=None, max_psf=None,
+                   keywords=None, changes=DEFAULT_CHANGES, webhook_url=None):
+        if isinstance(changes, str) or not all(isinstance(change, str) for change in changes):
+            raise ValueError(f"changes must be a list of change types (any of {', '.join(ALERT_CHANGES)})")
+        unknown = set(changes) - set(ALERT_CHANGES)
+        if unknown:
+            raise ValueError(f"Unknown change types: {', '.join(sorted(unknown))} (any of {', '.join(ALERT_CHANGES)})")
+        for field, value in (('name', name), ('broker', broker), ('city', city), ('keywords', keywords), ('webhook_url', webhook_url)):
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{field} must be a string")
+        for low, high in ((min_sf, max_sf), (min_psf, max_psf)):
+            if low is not None and high is not None and low > high:
+                raise ValueError(f'Empty range: {low} > {high}')
+        if webhook_url:
+            check_webhook_url(webhook_url)
+        cursor = self._connection().execute(
+            'INSERT INTO saved_searches (name, broker, city, min_sf, max_sf, min_psf, max_psf, keywords, changes, webhook_url, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, broker, city, min_sf, max_sf, min_psf, max_psf, keywords, ','.join(changes), webhook_url, time.time())
+        )
+        return cursor.lastrowid
+
+    def delete_search(self, search_id):
+        return self._connection().execute('DELETE FROM saved_searches WHERE id = ?', (search_id,)).rowcount > 0
+
+    def searches(self):
+        searches = []
+        for row in self._connection().execute('SELECT * FROM saved_searches ORDER BY id'):
+            search = dict(row)
+            search['changes'] = tuple(search['changes'].split(','))
+            searches.append(search)
+        return searches
+
+    def _indexes(self):
+        """(searches by id, indexes by change type), rebuilt only when the saved searches changed.
+
+        Searches are only ever inserted (with AUTOINCREMENT ids) or deleted,
+        so their count and highest id identify the set, in any worker.
+        """
+        signature = tuple(self._connection().execute('SELECT COUNT(*), MAX(id) FROM saved_searches').fetchone())
+        with self.index_lock:
+            if self.indexed is None or self.indexed[0] != signature:
+                searches = self.searches()
+                self.indexed = (signature, {search['id']: search for search in searches}, build_indexes(searches))
+            return self.indexed[1], self.indexed[2]
+
+    def evaluate(self, changes):
+        """Queue an alert for every (saved search, changed unit) match; returns how many."""
+        alertable = [change for change in changes if change['change'] in ALERT_CHANGES]
+        if not alertable:
+            return 0
+        searches, indexes = self._indexes()
+        if not searches:
+            return 0
+        now = time.time()
+        detected_at = datetime.fromtimestamp(now, timezone.utc).isoformat()
+        queued = []
+        started = time.perf_counter()
+        for change in alertable:
+            for search_id in indexes[change['change']].match(change['unit']):
+                search = searches[search_id]
+                payload = {
+                    'search': {'id': search['id'], 'name': search['name']},
+                    'change': change['change'],
+                    'unit': {field: change['unit'].get(field) for field in UNIT_FIELDS},
+                    'previous': change['previous'],
+                    'detected_at': detected_at
+                }
+                queued.append((search['id'], change['unit_id'], change['change'], json.dumps(payload), now, now))
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO outbox (search_id, unit_id, change, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?)',
+                queued
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        logging.info('%d changes matched %d alerts across %d saved searches in %.1f ms',
+                     len(alertable), len(queued), len(searches), (time.perf_counter() - started) * 1000)
+        return len(queued)
+
+    def recent(self, search_id=None, limit=100):
+        """Newest alerts (optionally of one search) with their delivery state."""
+        query = 'SELECT * FROM outbox'
+        params = ()
+        if search_id is not None:
+            query += ' WHERE search_id = ?'
+            params = (search_id,)
+        query += ' ORDER BY id DESC LIMIT ?'
+        alerts = []
+        for row in self._connection().execute(query, params + (limit,)):
+            alert = json.loads(row['payload'])
+            alert['id'] = row['id']
+            alert['delivered'] = row['delivered_at'] is not None
+            alert['attempts'] = row['attempts']
+            alerts.append(alert)
+        return alerts
+
+    def _claim(self, now, batch):
+        """Lease due outbox rows so another worker delivering at the same time skips them."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'SELECT outbox.*, saved_searches.webhook_url FROM outbox '
+                'LEFT JOIN saved_searches ON saved_searches.id = outbox.search_id '
+                'WHERE delivered_at IS NULL AND attempts < ? AND next_attempt_at <= ? ORDER BY id LIMIT ?',
+                (MAX_ATTEMPTS, now, batch)
+            ).fetchall()
+            connection.executemany(
+                'UPDATE outbox SET next_attempt_at = ? WHERE id = ?',
+                [(now + WEBHOOK_TIMEOUT * 3, row['id']) for row in rows]
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return rows
+
+    def deliver(self, batch=100):
+        """Send due alerts: POST to the search's webhook, else append to the local sink.
+
+        Returns (delivered, failed).
+        """
+        delivered = failed = 0
+        with self.delivering:
+            while True:
+                now = time.time()
+                rows = self._claim(now, batch)
+                if not rows:
+                    break
+                sink_lines = []
+                for row in rows:
+                    try:
+                        if row['webhook_url']:
+                            # Checked again at delivery: the host may resolve differently by now
+                            post_webhook(row['webhook_url'], row['payload'])
+                        else:
+                            sink_lines.append(row['payload'])
+                        self._connection().execute(
+                            'UPDATE outbox SET delivered_at = ?, attempts = attempts + 1 WHERE id = ?', (time.time(), row['id'])
+                        )
+                        delivered += 1
+                    except Exception as e:
+                        attempts = row['attempts'] + 1
+                        self._connection().execute(
+                            'UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+                            (attempts, now + RETRY_BASE_SECONDS * 2 ** attempts, str(e), row['id'])
+                        )
+                        logging.warning('Alert %d delivery failed (attempt %d): %s', row['id'], attempts, e)
+                        failed += 1
+                if sink_lines:
+                    os.makedirs(os.path.dirname(self.sink_path) or '.', exist_ok=True)
+                    with open(self.sink_path, 'a') as f:
+                        f.write('\n'.join(sink_lines) + '\n')
+        return delivered, failed
+
+    def deliver_in_background(self):
+        """Deliver without holding up the request that triggered the crawl load."""
+        threading.Thread(target=self.deliver, daemon=True).start()
+
+    def start_delivery_loop(self, interval=DELIVERY_INTERVAL):
+        """Deliver every `interval` seconds in a daemon thread, so retries go out without a new crawl."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.deliver()
+                except Exception:
+                    logging.exception('Alert delivery failed')
+        threading.Thread(target=loop, daemon=True).start()
+
+
+def random_searches(units, count, seed=0):
+    """Saved searches shaped like the units' own brokers, cities, sizes, rents and words."""
+    rng = random.Random(seed)
+    brokers = sorted({unit['broker'] for unit in units})
+    cities = sorted({city for unit in units for city in unit_cities(unit)})
+    words = sorted({token for unit in units for token in unit_tokens(unit) if len(token) > 3})
+    searches = []
+    for search_id in range(1, count + 1):
+        low_sf = rng.choice([None, rng.randrange(500, 20000, 500)])
+        low_psf = rng.choice([None, rng.randrange(10, 80, 5)])
+        searches.append({
+            'id': search_id,
+            'name': f'search {search_id}',
+            'broker': rng.choice(brokers) if rng.random() < 0.3 else None,
+            'city': rng.choice(cities) if cities and rng.random() < 0.6 else None,
+            'min_sf': low_sf,
+            'max_sf': (low_sf or 0) + rng.randrange(1000, 50000, 1000) if rng.random() < 0.7 else None,
+            'min_psf': low_psf,
+            'max_psf': (low_psf or 0) + rng.randrange(5, 60, 5) if rng.random() < 0.5 else None,
+            'keywords': rng.choice(words) if words and rng.random() < 0.2 else None,
+            'changes': DEFAULT_CHANGES
+        })
+    return searches
+
+
+def bench(units, search_count, batch):
+    """Time a crawl batch against search_count searches: the index vs. checking every search."""
+    searches = random_searches(units, search_count)
+    changes = [{'change': 'new', 'unit_id': unit['id'], 'unit': unit, 'previous': None}
+               for unit in random.Random(1).sample(units, min(batch, len(units)))]
+
+    started = time.perf_counter()
+    indexes = build_indexes(searches)
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed = [sorted(indexes[change['change']].match(change['unit'])) for change in changes]
+    matched = time.perf_counter() - started
+
+    started = time.perf_counter()
+    linear = [[search['id'] for search in searches if matches(search, change)] for change in changes]
+    scanned = time.perf_counter() - started
+
+    if indexed != linear:
+        raise RuntimeError('Index and linear matching disagree')
+    print(f"{search_count} searches x {len(changes)} changed units -> {sum(map(len, indexed))} alerts")
+    print(f"  index build {built * 1000:.1f} ms, match {matched * 1000:.1f} ms; "
+          f"every search {scanned * 1000:.1f} ms ({scanned / matched:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Saved-search alerts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add_parser = subparsers.add_parser('add', help="Save a search")
+    add_parser.add_argument('name')
+    add_parser.add_argument('--broker', help="Broker name, e.g. jll")
+    add_parser.add_argument('--city', help="City or borough, e.g. 'New York' or 'Brooklyn'")
+    add_parser.add_argument('--min-sf', type=float)
+    add_parser.add_argument('--max-sf', type=float)
+    add_parser.add_argument('--min-psf', type=float, help="Minimum annual $/SF")
+    add_parser.add_argument('--max-psf', type=float, help="Maximum annual $/SF")
+    add_parser.add_argument('--keywords', help="Words that must all appear in the name, address or suite")
+    add_parser.add_argument('--changes', default=','.join(DEFAULT_CHANGES), help=f"Any of {', '.join(ALERT_CHANGES)}")
+    add_parser.add_argument('--webhook', help="URL to POST alerts to (default: the local outbox file)")
+    delete_parser = subparsers.add_parser('delete', help="Delete a saved search")
+    delete_parser.add_argument('id', type=int)
+    subparsers.add_parser('list', help="Show saved searches")
+    subparsers.add_parser('deliver', help="Deliver queued alerts")
+    bench_parser = subparsers.add_parser('bench', help="Time the search index against checking every search")
+    bench_parser.add_argument('--searches', type=int, default=5000)
+    bench_parser.add_argument('--batch', type=int, default=1000, help="Changed units per crawl batch")
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        units = []
+        for broker, path in latest_broker_files(BROKER_DATA_DIR).items():
+            with open(path) as f:
+                rows = json.load(f)
+            units.extend(assign_unit_ids(rows, broker))
+        if not units:
+            print(f"No broker files under {BROKER_DATA_DIR}")
+            return
+        bench(units, args.searches, args.batch)
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    store = AlertStore()
+    if args.command == 'add':
+        search_id = store.add_search(args.name, broker=args.broker, city=args.city, min_sf=args.min_sf, max_sf=args.max_sf,
+                                     min_psf=args.min_psf, max_psf=args.max_psf, keywords=args.keywords,
+                                     changes=tuple(args.changes.split(',')), webhook_url=args.webhook)
+        print(f"Saved search {search_id}")
+    elif args.command == 'delete':
+        print("Deleted" if store.delete_search(args.id) else "No such search")
+    elif args.command == 'list':
+        for search in store.searches():
+            print(json.dumps(search))
+    else:
+        delivered, failed = store.deliver()
+        print(f"{delivered} alerts delivered, {failed} failed")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,16 @@
 from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
-from scraper import scrape_real_estate
+from alerts import DEFAULT_CHANGES, AlertStore
+from history import HistoryStore
+from listings import ListingStore, filter_units
+from responses import cached_json_response, json_response, to_columnar
+from snapshots import SnapshotStore
+from state import StateStore
 import json
 import os
 import time
 import threading
 import logging
-from datetime import datetime
 
 # Configure logging
 logging.basicConfig(
@@ -14,13 +18,35 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-# Global variables to track scraping status
-scraping_status = {
-    'is_scraping': False,
-    'current_data': None,
-    'error': None
+# Ensure the data directory exists
+os.makedirs('data', exist_ok=True)
+
+# Scrape jobs and the latest snapshot filename, shared by all worker processes
+state = StateStore()
+
+# Atomically written raw_data snapshots and their manifest
+snapshots = SnapshotStore()
+
+# This worker's copy of the most recent snapshot's listings; reloaded when
+# the snapshot recorded in the state store changes
+latest_snapshot = {
+    'filename': None,
+    'listings': None
 }
 
+# Merged broker units (crawler output) with their spatial and search indexes;
+# every broker file loaded is also recorded in the per-unit history and its
+# changes are matched against the saved searches
+history_store = HistoryStore()
+alert_store = AlertStore()
+listing_store = ListingStore(history=history_store, alerts=alert_store)
+
+# Alerts whose webhook failed are retried from here, whether or not a new
+# crawl comes in (each worker runs one; claimed alerts are not sent twice)
+alert_store.start_delivery_loop()
+
+MAX_QUERY_LIMIT = 1000
+
 app = Flask(__name__)
 
 # Configure CORS for GitHub Pages and local development
@@ -32,42 +58,33 @@ CORS(app, resources={r"/api/*": {"origins": [
     "http://127.0.0.1:8000"
 ]}}, supports_credentials=True)
 
-# Ensure the data directory exists
-os.makedirs('data', exist_ok=True)
-
 @app.route('/')
 def index():
     return jsonify({'status': 'API is running'})
 
 
 
-def run_scraper():
-    """Run the scraper in a separate thread"""
-    global scraping_status
+def run_scraper(job_id, api_key):
+    """Run the scraper in a separate thread and record the outcome in the state store"""
     try:
-        logging.info('Starting scraper with API key: %s', scraping_status.get('api_key')[:8] + '...')
-        scraping_status['is_scraping'] = True
-        data = scrape_real_estate(scraping_status.get('api_key'))
+        logging.info('Starting scraper job %s with API key: %s', job_id, api_key[:8] + '...')
+        # Imported here: firecrawl and pydantic are only needed while a job
+        # runs, and loading them at startup delays the first health check
+        from scraper import scrape_real_estate
+        data = scrape_real_estate(api_key)
         
-        # Save the data with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        os.makedirs('data', exist_ok=True)
-        filename = f'data/raw_data_{timestamp}.json'
+        filename = snapshots.write(data)
+        logging.info('Data saved to %s', filename)
         
-        logging.info('Saving data to %s', filename)
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
-        logging.info('Data saved successfully')
-            
-        scraping_status['current_data'] = True
+        use_snapshot(data, filename)
+        state.set('latest_snapshot', filename)
+        state.finish_job(job_id, snapshot=filename)
     except Exception as e:
-        scraping_status['error'] = str(e)
-    finally:
-        scraping_status['is_scraping'] = False
+        logging.error('Scraper job %s failed: %s', job_id, e)
+        state.finish_job(job_id, error=str(e))
 
 @app.route('/api/generate-report', methods=['POST'])
 def generate_report():
-    global scraping_status
     try:
         # Check content type
         if not request.is_json:
@@ -92,14 +109,16 @@ def generate_report():
                 'error': 'API key is required'
             }), 400
 
-        # Reset status first
-        scraping_status['is_scraping'] = False
-        scraping_status['current_data'] = None
-        scraping_status['error'] = None
-        scraping_status['api_key'] = api_key
+        # Only one scrape at a time across all workers
+        job_id = state.start_job()
+        if job_id is None:
+            return jsonify({
+                'success': False,
+                'error': 'A report is already being generated'
+            }), 409
         
         # Start scraping in a separate thread
-        thread = threading.Thread(target=run_scraper)
+        thread = threading.Thread(target=run_scraper, args=(job_id, api_key), daemon=True)
         thread.start()
         
         return jsonify({
@@ -114,27 +133,27 @@ def generate_report():
 
 @app.route('/api/status')
 def get_status():
-    global scraping_status
     try:
-        if scraping_status['error']:
+        job = state.latest_job()
+        if job is None:
             return jsonify({
                 'success': False,
-                'error': scraping_status['error']
+                'error': 'No data available'
             })
-        elif scraping_status['is_scraping']:
+        elif job['status'] == 'failed':
             return jsonify({
                 'success': False,
-                'error': 'Data not ready'
+                'error': job['error']
             })
-        elif scraping_status['current_data']:
+        elif job['status'] == 'running':
             return jsonify({
-                'success': True,
-                'data': scraping_status['current_data']
+                'success': False,
+                'error': 'Data not ready'
             })
         else:
             return jsonify({
-                'success': False,
-                'error': 'No data available'
+                'success': True,
+                'data': True
             })
     except Exception as e:
         return jsonify({
@@ -144,44 +163,223 @@ def get_status():
 
 @app.route('/api/latest-data', methods=['GET'])
 def get_latest_data():
+    """Listings of the newest snapshot; ?format=columnar sends keys once plus value arrays."""
     try:
-        # Get the latest data file
-        data_dir = 'data'
-        logging.info(f'Looking for data files in {data_dir}')
-        data_files = [f for f in os.listdir(data_dir) if f.startswith('raw_data_')]
-        logging.info(f'Found data files: {data_files}')
-        
-        if not data_files:
-            logging.warning('No data files found')
+        # Another worker may have finished a scrape since this one last loaded
+        shared = state.get('latest_snapshot')
+        if shared and shared != latest_snapshot['filename'] and os.path.exists(shared):
+            load_snapshot(shared)
+
+        # Read the key before the listings: run_scraper swaps listings first,
+        # so a stale key can only ever be paired with newer listings
+        snapshot_key = latest_snapshot['filename']
+        listings = latest_snapshot['listings']
+        if listings is None:
+            listings = load_latest_listings()
+            snapshot_key = latest_snapshot['filename']
+            if listings is None:
+                logging.warning('No data files found')
+                return jsonify({
+                    'success': False,
+                    'error': 'No data available'
+                })
+
+        if request.args.get('format') == 'columnar':
+            return cached_json_response('latest-data-columnar', snapshot_key, lambda: {
+                'success': True,
+                'data': to_columnar(listings)
+            })
+
+        return cached_json_response('latest-data', snapshot_key, lambda: {
+            'success': True,
+            'data': {
+                'properties': listings
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def query_limit():
+    return max(1, min(request.args.get('limit', 200, type=int), MAX_QUERY_LIMIT))
+
+@app.route('/api/listings/near', methods=['GET'])
+def listings_near():
+    """Units within radius_m meters of (lat, lon), nearest first."""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radius_m = request.args.get('radius_m', 1000.0, type=float)
+    if lat is None or lon is None or radius_m <= 0:
+        return jsonify({
+            'success': False,
+            'error': 'lat, lon and a positive radius_m are required'
+        }), 400
+
+    try:
+        listings = listing_store.refresh()
+        matches = listings.spatial.near(lat, lon, radius_m)
+        distances = {index: distance for distance, index in matches}
+        indices = filter_units(listings.units, (index for _, index in matches), request.args)
+        limit = query_limit()
+        properties = []
+        for index in indices:
+            properties.append(dict(listings.units[index], distance_m=round(distances[index], 1)))
+            if len(properties) >= limit:
+                break
+        return json_response({
+            'success': True,
+            'data': {
+                'properties': properties
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/listings/bbox', methods=['GET'])
+def listings_bbox():
+    """Units inside the south/west/north/east bounding box."""
+    south = request.args.get('south', type=float)
+    west = request.args.get('west', type=float)
+    north = request.args.get('north', type=float)
+    east = request.args.get('east', type=float)
+    if None in (south, west, north, east) or south > north or west > east:
+        return jsonify({
+            'success': False,
+            'error': 'south, west, north and east are required (south <= north, west <= east)'
+        }), 400
+
+    try:
+        listings = listing_store.refresh()
+        indices = filter_units(listings.units, listings.spatial.bbox(south, west, north, east), request.args)
+        limit = query_limit()
+        properties = []
+        for index in indices:
+            properties.append(listings.units[index])
+            if len(properties) >= limit:
+                break
+        return json_response({
+            'success': True,
+            'data': {
+                'properties': properties
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/search', methods=['GET'])
+def search_listings():
+    """Ranked units whose name, address, location or suite match q (last word as a prefix)."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'q is required'
+        }), 400
+
+    try:
+        listings = listing_store.refresh()
+        limit = max(1, min(request.args.get('limit', 20, type=int), MAX_QUERY_LIMIT))
+        results = listings.search.search(query, limit)
+        return json_response({
+            'success': True,
+            'data': {
+                'properties': [dict(unit, score=score) for score, unit in results]
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/units/<unit_id>/history', methods=['GET'])
+def unit_history(unit_id):
+    """A unit's price and availability versions, oldest first."""
+    try:
+        listing_store.refresh()
+        timeline = history_store.timeline(unit_id)
+        if timeline is None:
             return jsonify({
                 'success': False,
-                'error': 'No data available'
-            })
-        
-        latest_file = max(data_files, key=lambda x: os.path.getmtime(os.path.join(data_dir, x)))
-        logging.info(f'Loading latest file: {latest_file}')
-        
-        with open(os.path.join(data_dir, latest_file), 'r') as f:
-            data = json.load(f)
-            logging.info(f'Loaded data structure: {list(data.keys())}')
-        
-        # Get listings and convert location to address if needed
-        listings = data.get('data', {}).get('listings', [])
-        logging.info(f'Found {len(listings)} listings in data')
-        
-        for listing in listings:
-            if 'location' in listing and 'address' not in listing:
-                listing['address'] = listing['location']
-                del listing['location']
-                
-        logging.info(f'Processed {len(listings)} listings for response')
-        if listings:
-            logging.info(f'Sample listing: {listings[0]}')
-        
+                'error': f'Unknown unit {unit_id}'
+            }), 404
+        return json_response({
+            'success': True,
+            'data': timeline
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/saved-searches', methods=['GET'])
+def list_saved_searches():
+    return jsonify({
+        'success': True,
+        'data': {
+            'searches': alert_store.searches()
+        }
+    })
+
+@app.route('/api/saved-searches', methods=['POST'])
+def create_saved_search():
+    """Save a search (name plus optional broker, city, min_sf, max_sf, min_psf, max_psf, keywords, changes, webhook_url)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('name'):
+        return jsonify({
+            'success': False,
+            'error': 'A JSON body with a name is required'
+        }), 400
+
+    try:
+        changes = data.get('changes') or list(DEFAULT_CHANGES)
+        bounds = {key: (float(data[key]) if data.get(key) is not None else None) for key in ('min_sf', 'max_sf', 'min_psf', 'max_psf')}
+        search_id = alert_store.add_search(
+            data['name'], broker=data.get('broker'), city=data.get('city'), keywords=data.get('keywords'),
+            changes=changes, webhook_url=data.get('webhook_url'), **bounds
+        )
+    except (TypeError, ValueError) as e:
         return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'id': search_id
+        }
+    }), 201
+
+@app.route('/api/saved-searches/<int:search_id>', methods=['DELETE'])
+def delete_saved_search(search_id):
+    if not alert_store.delete_search(search_id):
+        return jsonify({
+            'success': False,
+            'error': f'Unknown saved search {search_id}'
+        }), 404
+    return jsonify({
+        'success': True
+    })
+
+@app.route('/api/alerts', methods=['GET'])
+def list_alerts():
+    """Newest alerts, optionally for one saved search (?search_id=)."""
+    try:
+        alerts = alert_store.recent(request.args.get('search_id', type=int), query_limit())
+        return json_response({
             'success': True,
             'data': {
-                'properties': listings
+                'alerts': alerts
             }
         })
     except Exception as e:
@@ -190,6 +388,31 @@ def get_latest_data():
             'error': str(e)
         }), 500
 
+def use_snapshot(data, filename):
+    """Make one snapshot's listings this worker's latest_snapshot; returns the listings."""
+    # Get listings and convert location to address if needed
+    listings = data.get('data', {}).get('listings', [])
+    for listing in listings:
+        if 'location' in listing and 'address' not in listing:
+            listing['address'] = listing['location']
+            del listing['location']
+
+    latest_snapshot['listings'] = listings
+    latest_snapshot['filename'] = filename
+    return listings
+
+def load_snapshot(path):
+    """Load one snapshot's listings into this worker's latest_snapshot."""
+    logging.info('Loading snapshot: %s', path)
+    return use_snapshot(snapshots.read(path), path)
+
+def load_latest_listings():
+    """Load listings from the latest snapshot in the manifest (e.g. after a restart)."""
+    path = snapshots.latest_path()
+    if path is None:
+        return None
+    return load_snapshot(path)
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser()
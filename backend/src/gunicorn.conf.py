@@ -0,0 +1,15 @@
+import os
+
+# Threaded workers: a slow /api/latest-data or a long-polling client no longer
+# holds the only worker, so /api/status and the health check keep answering.
+# (gevent is avoided because the scraper runs its own asyncio loop and thread pool.)
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,271 @@
+"""Per-unit price and availability history (SCD2) built from the broker files.
+
+Every broker file is ingested once, when the scheduler publishes it (the
+ingest command) or else when the ListingStore first loads it: a unit whose
+tracked fields changed gets its open version closed (valid_to) and a new one
+opened (valid_from); units missing from the new file are closed, which leaves
+a gap while they are off the market. A unit's whole timeline is then one
+indexed lookup on unit_id.
+
+Examples:
+    python history.py backfill                  # every file under data/brokers, oldest first
+    python history.py ingest data/brokers/lee_properties_20250301_120000.json
+    python history.py show 1f0c2a9b3d4e5f60
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from alerts import AlertStore
+from listings import BROKER_DATA_DIR, assign_unit_ids
+
+HISTORY_DB = os.environ.get('HISTORY_DB', os.path.join('data', 'history.db'))
+
+# Fields whose change opens a new version of a unit
+TRACKED_FIELDS = ('price', 'space_available', 'annual_psf', 'annual_rent', 'size_sf')
+
+# A change in any of these makes a version change a 'repriced' one
+PRICE_FIELDS = ('price', 'annual_psf', 'annual_rent')
+
+# What one ingest changed. changes holds {'change', 'unit_id', 'unit', 'previous'}
+# dicts (change is new, repriced, updated or removed); baseline is True for a
+# broker's first file, where every unit is "new" only because nothing came before.
+IngestResult = namedtuple('IngestResult', 'opened closed changes baseline')
+
+_STAMP_RE = re.compile(r'_properties_(\d{8}_\d{6})')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    unit_id TEXT PRIMARY KEY,
+    broker TEXT NOT NULL,
+    property_name TEXT,
+    address TEXT,
+    listing_url TEXT,
+    floor_suite TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unit_history (
+    unit_id TEXT NOT NULL,
+    broker TEXT NOT NULL,
+    valid_from REAL NOT NULL,
+    valid_to REAL,                 -- NULL while this is the current version
+    price TEXT,
+    space_available TEXT,
+    annual_psf REAL,
+    annual_rent REAL,
+    size_sf REAL,
+    run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS unit_history_unit ON unit_history (unit_id, valid_from);
+CREATE INDEX IF NOT EXISTS unit_history_open ON unit_history (broker) WHERE valid_to IS NULL;
+CREATE TABLE IF NOT EXISTS ingested (
+    path TEXT PRIMARY KEY,
+    broker TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    units INTEGER NOT NULL
+);
+"""
+
+
+def observed_at(path, rows):
+    """When a broker file was crawled: its newest fetched_at, else the filename timestamp."""
+    latest = None
+    for row in rows:
+        fetched_at = row.get('fetched_at')
+        if fetched_at:
+            value = datetime.fromisoformat(fetched_at).timestamp()
+            latest = value if latest is None else max(latest, value)
+    if latest is not None:
+        return latest
+    match = _STAMP_RE.search(os.path.basename(path))
+    if match:
+        return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').timestamp()
+    return os.path.getmtime(path)
+
+
+def to_iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat() if epoch is not None else None
+
+
+class HistoryStore:
+    """SQLite history of every unit's tracked fields as valid_from/valid_to ranges."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def ingest(self, broker, path, rows):
+        """Apply one broker file; returns an IngestResult with the diff against the previous file.
+
+        Files are applied once each and only in crawl order per broker, so
+        several workers loading the same file do not double-count it.
+        Rows keep the ids the ListingStore gave them; a file read without
+        one (a backfill) is numbered with assign_unit_ids.
+        """
+        if not all(row.get('id') for row in rows):
+            assign_unit_ids(rows)
+        connection = self._connection()
+        seen_at = observed_at(path, rows)
+        name = os.path.basename(path)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if connection.execute('SELECT 1 FROM ingested WHERE path = ?', (name,)).fetchone():
+                connection.execute('ROLLBACK')
+                return IngestResult(0, 0, [], False)
+            newest = connection.execute('SELECT MAX(observed_at) FROM ingested WHERE broker = ?', (broker,)).fetchone()[0]
+            if newest is not None and seen_at <= newest:
+                logging.warning('Skipping history for %s: older than what is already ingested', path)
+                connection.execute('ROLLBACK')
+                return IngestResult(0, 0, [], False)
+
+            current = {
+                row['unit_id']: tuple(row[field] for field in TRACKED_FIELDS)
+                for row in connection.execute(
+                    f"SELECT unit_id, {', '.join(TRACKED_FIELDS)} FROM unit_history WHERE broker = ? AND valid_to IS NULL",
+                    (broker,)
+                )
+            }
+            opened = closed = 0
+            changes = []
+            present = set()
+            duplicates = 0
+            for row in rows:
+                uid = row['id']
+                if uid in present:
+                    duplicates += 1
+                    continue
+                present.add(uid)
+                values = tuple(row.get(field) for field in TRACKED_FIELDS)
+                connection.execute(
+                    'INSERT INTO units (unit_id, broker, property_name, address, listing_url, floor_suite, first_seen, last_seen) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(unit_id) DO UPDATE SET '
+                    'property_name = excluded.property_name, address = excluded.address, last_seen = excluded.last_seen',
+                    (uid, broker, row.get('property_name'), row.get('address'), row.get('listing_url'),
+                     row.get('floor_suite'), seen_at, seen_at)
+                )
+                previous = current.get(uid)
+                if previous == values:
+                    continue
+                if previous is not None:
+                    connection.execute(
+                        'UPDATE unit_history SET valid_to = ? WHERE unit_id = ? AND valid_to IS NULL', (seen_at, uid)
+                    )
+                    closed += 1
+                    before = dict(zip(TRACKED_FIELDS, previous))
+                    repriced = any(before[field] != row.get(field) for field in PRICE_FIELDS)
+                    changes.append({'change': 'repriced' if repriced else 'updated', 'unit_id': uid, 'unit': row, 'previous': before})
+                else:
+                    changes.append({'change': 'new', 'unit_id': uid, 'unit': row, 'previous': None})
+                connection.execute(
+                    f"INSERT INTO unit_history (unit_id, broker, valid_from, run_id, {', '.join(TRACKED_FIELDS)}) "
+                    f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in TRACKED_FIELDS)})",
+                    (uid, broker, seen_at, row.get('run_id')) + values
+                )
+                opened += 1
+
+            # Units no longer listed are off the market from this crawl on
+            for uid in current.keys() - present:
+                connection.execute(
+                    'UPDATE unit_history SET valid_to = ? WHERE unit_id = ? AND valid_to IS NULL', (seen_at, uid)
+                )
+                closed += 1
+                changes.append({'change': 'removed', 'unit_id': uid, 'unit': None, 'previous': dict(zip(TRACKED_FIELDS, current[uid]))})
+
+            connection.execute(
+                'INSERT INTO ingested (path, broker, observed_at, units) VALUES (?, ?, ?, ?)',
+                (name, broker, seen_at, len(present))
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        if duplicates:
+            logging.warning('History for %s: %d rows repeat an earlier unit id and were not recorded', path, duplicates)
+        logging.info('History for %s: %d versions opened, %d closed', broker, opened, closed)
+        return IngestResult(opened, closed, changes, newest is None)
+
+    def timeline(self, uid):
+        """{'unit': ..., 'history': [...]} for one unit, oldest version first, or None."""
+        connection = self._connection()
+        unit = connection.execute('SELECT * FROM units WHERE unit_id = ?', (uid,)).fetchone()
+        if unit is None:
+            return None
+        history = []
+        for row in connection.execute('SELECT * FROM unit_history WHERE unit_id = ? ORDER BY valid_from', (uid,)):
+            version = {field: row[field] for field in TRACKED_FIELDS}
+            version['valid_from'] = to_iso(row['valid_from'])
+            version['valid_to'] = to_iso(row['valid_to'])
+            version['run_id'] = row['run_id']
+            history.append(version)
+        unit = dict(unit)
+        unit['first_seen'] = to_iso(unit['first_seen'])
+        unit['last_seen'] = to_iso(unit['last_seen'])
+        unit['on_market'] = bool(history) and history[-1]['valid_to'] is None
+        return {'unit': unit, 'history': history}
+
+
+def backfill(store, paths, alerts=None):
+    """Ingest broker files oldest first; returns the number of files applied.
+
+    With an AlertStore, the units each file changed are matched against the
+    saved searches and queued, as the ListingStore does when it loads a file.
+    """
+    applied = 0
+    for path in sorted(paths, key=lambda path: _STAMP_RE.search(path).group(1) if _STAMP_RE.search(path) else path):
+        broker = os.path.basename(path).split('_properties_')[0]
+        with open(path) as f:
+            rows = json.load(f)
+        result = store.ingest(broker, path, assign_unit_ids(rows, broker))
+        applied += 1 if result.opened or result.closed else 0
+        if alerts is not None and not result.baseline:
+            alerts.evaluate(result.changes)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-unit price history")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = subparsers.add_parser('backfill', help="Ingest every broker file, oldest first")
+    backfill_parser.add_argument('files', nargs='*', help=f"Broker files (default: {BROKER_DATA_DIR}/*_properties_*.json)")
+    ingest_parser = subparsers.add_parser('ingest', help="Record newly published broker files and deliver their alerts")
+    ingest_parser.add_argument('files', nargs='+')
+    show_parser = subparsers.add_parser('show', help="Print one unit's timeline")
+    show_parser.add_argument('unit_id')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    store = HistoryStore()
+    if args.command == 'backfill':
+        paths = args.files or glob.glob(os.path.join(BROKER_DATA_DIR, '*_properties_*.json'))
+        print(f"{backfill(store, paths)} of {len(paths)} files added history")
+    elif args.command == 'ingest':
+        alerts = AlertStore()
+        print(f"{backfill(store, args.files, alerts)} of {len(args.files)} files added history")
+        delivered, failed = alerts.deliver()
+        print(f"{delivered} alerts delivered, {failed} failed")
+    else:
+        print(json.dumps(store.timeline(args.unit_id), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from search import SearchIndex
+from spatial import GridIndex
+
+# Crawler output (<broker>_properties_<timestamp>.json) is copied here; the
+# newest file of each broker makes up the merged dataset
+BROKER_DATA_DIR = os.environ.get('BROKER_DATA_DIR', os.path.join('data', 'brokers'))
+
+
+def unit_id(row, occurrence=1):
+    """Stable ID of a unit across crawls: its listing URL plus floor/suite.
+
+    occurrence numbers units of one listing that share a floor/suite
+    (several unnamed spaces, or a row the broker lists twice).
+    """
+    key = f"{row.get('listing_url', '')}|{row.get('floor_suite', '')}"
+    if occurrence > 1:
+        key += f"|{occurrence}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def assign_unit_ids(rows, broker=None):
+    """Set 'id' (and 'broker', if given) on one broker file's rows; returns rows.
+
+    The first unit of a listing and floor/suite keeps the plain unit_id, the
+    next ones are numbered in file order, so every row gets its own id.
+    """
+    occurrences = {}
+    ids = set()
+    for row in rows:
+        if broker is not None:
+            row['broker'] = broker
+        key = (row.get('listing_url', ''), row.get('floor_suite', ''))
+        occurrences[key] = occurrences.get(key, 0) + 1
+        row['id'] = unit_id(row, occurrences[key])
+        ids.add(row['id'])
+    if len(ids) != len(rows):
+        raise ValueError(f"{len(rows) - len(ids)} duplicate unit ids")
+    return rows
+
+
+# Everything a request reads, replaced as a whole on refresh: a request holds
+# one snapshot, so its units, spatial index and search index always agree
+ListingSnapshot = namedtuple('ListingSnapshot', ['units', 'by_id', 'spatial', 'search'])
+EMPTY_SNAPSHOT = ListingSnapshot([], {}, GridIndex([]), SearchIndex())
+
+
+def latest_broker_files(data_dir=BROKER_DATA_DIR):
+    """{broker: path} of the newest property file per broker."""
+    latest = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, '*_properties_*.json'))):
+        broker = os.path.basename(path).split('_properties_')[0]
+        latest[broker] = path  # timestamps sort lexically, so the last one wins
+    return latest
+
+
+class ListingStore:
+    """Merged units of every broker plus the indexes built over them.
+
+    Loaded lazily and refreshed per broker: only brokers whose newest file
+    (or its mtime) changed are re-read and re-indexed, so requests share one
+    in-memory copy and a new snapshot of one broker does not rebuild the rest.
+    Each newly loaded file is also applied to the history store, if given,
+    and the units it changed are checked against the saved searches in the
+    alert store. The scheduler normally records a file when it publishes it
+    (history.py ingest); this catches files copied in some other way, and
+    the history store's record of ingested files keeps it from counting one
+    twice.
+
+    refresh() returns the current ListingSnapshot. A refresh builds the next
+    snapshot off to the side and publishes it in one assignment, so callers
+    take a local reference once per request and never see a mix of two.
+    """
+
+    def __init__(self, data_dir=BROKER_DATA_DIR, history=None, alerts=None):
+        self.data_dir = data_dir
+        self.history = history
+        self.alerts = alerts
+        self.loaded = {}          # broker -> (path, mtime)
+        self.broker_units = {}    # broker -> rows
+        self.snapshot = EMPTY_SNAPSHOT
+        self.lock = threading.Lock()
+
+    def _changes(self):
+        files = latest_broker_files(self.data_dir)
+        current = {broker: (path, os.path.getmtime(path)) for broker, path in files.items()}
+        changed = [broker for broker, stamp in current.items() if self.loaded.get(broker) != stamp]
+        removed = [broker for broker in self.loaded if broker not in current]
+        return current, changed, removed
+
+    def refresh(self):
+        """Reload brokers whose files changed; returns the current ListingSnapshot."""
+        snapshot = self.snapshot
+        current, changed, removed = self._changes()
+        if not changed and not removed:
+            return snapshot
+        with self.lock:
+            current, changed, removed = self._changes()
+            if not changed and not removed:
+                return self.snapshot
+            search = self.snapshot.search.copy()
+            for broker in removed:
+                self.broker_units.pop(broker, None)
+                search.remove(broker)
+            for broker in changed:
+                path = current[broker][0]
+                with open(path) as f:
+                    rows = json.load(f)
+                assign_unit_ids(rows, broker)
+                self.broker_units[broker] = rows
+                search.add(broker, rows)
+                logging.info('Loaded %d units for %s from %s', len(rows), broker, path)
+                if self.history is not None:
+                    try:
+                        result = self.history.ingest(broker, path, rows)
+                        if self.alerts is not None and not result.baseline and self.alerts.evaluate(result.changes):
+                            self.alerts.deliver_in_background()
+                    except Exception:
+                        logging.exception('Could not record history or alerts for %s', path)
+
+            units = [unit for broker in sorted(self.broker_units) for unit in self.broker_units[broker]]
+            self.snapshot = ListingSnapshot(
+                units,
+                {unit['id']: unit for unit in units},
+                GridIndex([(unit.get('lat'), unit.get('lon')) for unit in units]),
+                search
+            )
+            self.loaded = current
+            return self.snapshot
+
+
+def filter_units(units, indices, args):
+    """Apply the optional query-string filters shared by the listing endpoints."""
+    min_psf = args.get('min_psf', type=float)
+    max_psf = args.get('max_psf', type=float)
+    min_sf = args.get('min_sf', type=float)
+    max_sf = args.get('max_sf', type=float)
+    borough = args.get('borough')
+    broker = args.get('broker')
+
+    for index in indices:
+        unit = units[index]
+        psf = unit.get('annual_psf')
+        if (min_psf is not None or max_psf is not None) and psf is None:
+            continue
+        if min_psf is not None and psf < min_psf:
+            continue
+        if max_psf is not None and psf > max_psf:
+            continue
+        size = unit.get('size_sf')
+        if (min_sf is not None or max_sf is not None) and size is None:
+            continue
+        if min_sf is not None and size < min_sf:
+            continue
+        if max_sf is not None and size > max_sf:
+            continue
+        if borough and (unit.get('borough') or '').lower() != borough.lower():
+            continue
+        if broker and unit.get('broker') != broker:
+            continue
+        yield index
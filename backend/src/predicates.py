@@ -0,0 +1,166 @@
+import math
+
+from search import tokenize
+
+# Unit text a saved search's keywords are matched against
+KEYWORD_FIELDS = ('property_name', 'address', 'location', 'floor_suite')
+
+
+def unit_cities(unit):
+    """Lowercased names a search's city can match: the location's city and the borough."""
+    names = set()
+    location = unit.get('location') or ''
+    if location:
+        names.add(location.split(',')[0].strip().lower())
+    if unit.get('borough'):
+        names.add(unit['borough'].lower())
+    return names
+
+
+def unit_tokens(unit):
+    return set(tokenize(' '.join(str(unit.get(field) or '') for field in KEYWORD_FIELDS)))
+
+
+class IntervalTree:
+    """Static centered interval tree: which [low, high] intervals contain a point.
+
+    Built once from (low, high, item) triples; a stabbing query costs
+    O(log n + matches) instead of testing every interval.
+    """
+
+    def __init__(self, intervals):
+        self.root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(point for low, high, _ in intervals for point in (low, high) if math.isfinite(point))
+        center = points[len(points) // 2] if points else 0.0
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        return (
+            center,
+            sorted(here, key=lambda interval: interval[0]),            # by low, ascending
+            sorted(here, key=lambda interval: interval[1], reverse=True),  # by high, descending
+            self._build(left),
+            self._build(right)
+        )
+
+    def stab(self, point):
+        """Items whose interval contains point."""
+        found = []
+        node = self.root
+        while node is not None:
+            center, by_low, by_high, left, right = node
+            if point < center:
+                for low, _, item in by_low:
+                    if low > point:
+                        break
+                    found.append(item)
+                node = left
+            else:
+                for _, high, item in by_high:
+                    if high < point:
+                        break
+                    found.append(item)
+                node = right
+        return found
+
+
+class PredicateIndex:
+    """Saved searches indexed by their predicates, matched against one unit at a time.
+
+    Each search is a conjunction of optional predicates: broker, city, size
+    range, $/SF range and keywords. It is filed under one of them only, its
+    most selective (a keyword, else broker, city, size range, $/SF range):
+    in a term list or an interval tree. A unit collects the searches filed
+    under the terms it has and the ranges it falls in, and only those
+    candidates have their remaining predicates checked, so the work follows
+    the number of plausible searches rather than every saved search.
+    """
+
+    def __init__(self, searches):
+        self.searches = {}
+        self.match_all = []
+        self.brokers = {}         # broker -> [search id]
+        self.cities = {}          # lowercased city -> [search id]
+        self.keywords = {}        # token -> [search id]
+        size_ranges = []
+        psf_ranges = []
+
+        for search in searches:
+            search_id = search['id']
+            predicate = {
+                'broker': search.get('broker') or None,
+                'city': search['city'].lower() if search.get('city') else None,
+                'size': self._range(search.get('min_sf'), search.get('max_sf')),
+                'psf': self._range(search.get('min_psf'), search.get('max_psf')),
+                'keywords': frozenset(tokenize(search.get('keywords')))
+            }
+            self.searches[search_id] = predicate
+            if predicate['keywords']:
+                # Longer words are rarer; one of them is enough to find the search
+                anchor = max(sorted(predicate['keywords']), key=len)
+                self.keywords.setdefault(anchor, []).append(search_id)
+            elif predicate['broker']:
+                self.brokers.setdefault(predicate['broker'], []).append(search_id)
+            elif predicate['city']:
+                self.cities.setdefault(predicate['city'], []).append(search_id)
+            elif predicate['size']:
+                size_ranges.append(predicate['size'] + (search_id,))
+            elif predicate['psf']:
+                psf_ranges.append(predicate['psf'] + (search_id,))
+            else:
+                self.match_all.append(search_id)
+
+        self.size_tree = IntervalTree(size_ranges)
+        self.psf_tree = IntervalTree(psf_ranges)
+
+    def __len__(self):
+        return len(self.searches)
+
+    @staticmethod
+    def _range(low, high):
+        if low is None and high is None:
+            return None
+        return (-math.inf if low is None else low, math.inf if high is None else high)
+
+    def match(self, unit):
+        """Ids of the searches the unit satisfies."""
+        cities = unit_cities(unit)
+        tokens = unit_tokens(unit) if self.keywords else None
+        size = unit.get('size_sf')
+        psf = unit.get('annual_psf')
+
+        candidates = list(self.brokers.get(unit.get('broker'), ()))
+        for city in cities:
+            candidates.extend(self.cities.get(city, ()))
+        if size is not None:
+            candidates.extend(self.size_tree.stab(size))
+        if psf is not None:
+            candidates.extend(self.psf_tree.stab(psf))
+        if self.keywords:
+            for token in tokens:
+                candidates.extend(self.keywords.get(token, ()))
+
+        matched = list(self.match_all)
+        for search_id in candidates:
+            predicate = self.searches[search_id]
+            if predicate['broker'] and predicate['broker'] != unit.get('broker'):
+                continue
+            if predicate['city'] and predicate['city'] not in cities:
+                continue
+            if predicate['size'] and (size is None or not predicate['size'][0] <= size <= predicate['size'][1]):
+                continue
+            if predicate['psf'] and (psf is None or not predicate['psf'][0] <= psf <= predicate['psf'][1]):
+                continue
+            if predicate['keywords'] and not predicate['keywords'] <= tokens:
+                continue
+            matched.append(search_id)
+        return matched
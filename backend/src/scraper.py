@@ -1,7 +1,10 @@
 from firecrawl import FirecrawlApp
 from pydantic import BaseModel, Field
 from typing import Any, Optional, List
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
+import hashlib
 import json
 import os
 
@@ -18,74 +21,152 @@ class ExtractSchema(BaseModel):
 
 import logging
 
-def scrape_real_estate(api_key):
-    logging.info('Starting real estate scraping process')
-    app = FirecrawlApp(api_key=api_key)
-    
-    # Prepare the request payload
-    payload = {
-        'prompt': 'Ensure that the address is always included for each commercial real estate listing. Extract the number of units available, square footage, URL of the listing, contact information, and price.',
-        'schema': ExtractSchema.model_json_schema(),
-        'urls': [
-            "https://property.jll.com/search?tenureType=rent&propertyTypes=office&orderBy=desc&sortBy=dateModified",
-        ]
+EXTRACT_PROMPT = 'Extract all commercial real estate listings. For each listing, get the address, number of units available, square footage, URL, contact information, and price.'
+
+# Search pages extracted per report. Only filters that are sent to the server
+# and that the crawlers already rely on: JLL's office search (the original
+# report URL) and CBRE's search as crawl_cbre.py requests it. Cushman's
+# filters live in the URL fragment, which never reaches the server, so its
+# search page is left to crawl_cushman.py.
+SEARCH_URLS = [
+    "https://property.jll.com/search?tenureType=rent&propertyTypes=office&orderBy=desc&sortBy=dateModified",
+    "https://www.cbre.com/properties/properties-for-lease/commercial-space?sort=lastupdated%2Bdescending&propertytype=Office&transactiontype=isLetting&initialpolygon=%5B%5B67.12117833969766%2C-28.993985994685787%5D%2C%5B-26.464978515643416%2C-141.84554849468577%5D%5D",
+]
+
+URLS_PER_JOB = int(os.environ.get('FIRECRAWL_URLS_PER_JOB', 2))
+MAX_CONCURRENT_JOBS = int(os.environ.get('FIRECRAWL_MAX_CONCURRENT_JOBS', 6))
+POLL_INTERVAL = 2.0       # first status poll, doubled up to MAX_POLL_INTERVAL
+MAX_POLL_INTERVAL = 15.0
+JOB_TIMEOUT = 600.0
+
+
+@lru_cache(maxsize=None)
+def extract_params():
+    """Prompt and JSON schema for extract jobs, built once per process."""
+    return {'prompt': EXTRACT_PROMPT, 'schema': ExtractSchema.model_json_schema()}
+
+
+def listing_key(listing):
+    """Identity used to merge the same listing returned by several jobs.
+
+    Listings without a URL are only merged with an identical extraction
+    (same fields after case and whitespace folding); keying them on the
+    address alone would merge different suites of one building, and on
+    nothing at all would merge every such listing into one.
+    """
+    url = (listing.get('url') or '').strip().rstrip('/').lower()
+    if url:
+        return url
+    folded = {
+        field: ' '.join(value.lower().split()) if isinstance(value, str) else value
+        for field, value in listing.items()
     }
-    
-    # Log the schema
-    schema = ExtractSchema.model_json_schema()
-    logging.info(f'Using schema: {json.dumps(schema, indent=2)}')
-    
-    # Make the API request
-    logging.info('Sending extraction request to Firecrawl API')
-    try:
-        # Log the request details
-        request_urls = [
-            "https://property.jll.com/search?tenureType=rent&propertyTypes=office&orderBy=desc&sortBy=dateModified"
-        ]
-        request_prompt = 'Extract all commercial real estate listings. For each listing, get the address, number of units available, square footage, URL, contact information, and price.'
-        logging.info(f'Making request to URLs: {request_urls}')
-        logging.info(f'Using prompt: {request_prompt}')
-        
-        try:
-            data = app.extract(
-                request_urls,
-                {
-                    'prompt': request_prompt,
-                    'schema': ExtractSchema.model_json_schema()
-                }
-            )
-        except Exception as api_error:
-            logging.error(f'Error during Firecrawl API call: {str(api_error)}')
-            logging.error(f'API error type: {type(api_error)}')
-            logging.error(f'API error details: {api_error.__dict__ if hasattr(api_error, "__dict__") else "No details available"}')
-            raise
-        logging.info('Successfully received response from Firecrawl API')
-        logging.info(f'Raw response data: {data}')
-        
-        # Log basic response info
-        listings = data['data']['listings']
-        logging.info(f'Found {len(listings)} listings')
-        if listings:
-            logging.info(f'Sample listing: {listings[0]}')
-    except Exception as e:
-        logging.error(f'Error during API request: {str(e)}')
-        raise
-    
-    # Save raw data
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'data/raw_data_{timestamp}.json'
-    logging.info(f'Saving data to {filename}')
+    body = json.dumps(folded, sort_keys=True, default=str)
+    return 'sha1:' + hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def normalize_listing(listing):
+    """Map a raw extracted listing onto the NestedModel1 field names."""
+    listing = dict(listing)
+    if 'location' in listing and 'address' not in listing:
+        listing['address'] = listing.pop('location')
+    return listing
+
+
+class FirecrawlPool:
+    """One shared FirecrawlApp driven from a bounded thread pool.
+
+    The SDK is blocking, so calls run in the pool while asyncio schedules
+    them; the semaphore caps how many extract jobs are in flight at once.
+    """
+
+    def __init__(self, api_key, max_concurrent_jobs=MAX_CONCURRENT_JOBS):
+        self.app = FirecrawlApp(api_key=api_key)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix='firecrawl')
+        self.semaphore = asyncio.Semaphore(max_concurrent_jobs)
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def extract(self, urls, params):
+        """Submit one extract job and poll it until it finishes."""
+        async with self.semaphore:
+            job = await self._call(self.app.async_extract, urls, params)
+            if not job.get('success', True) or 'id' not in job:
+                raise RuntimeError(f"Failed to start extract job for {urls}: {job}")
+            job_id = job['id']
+            logging.info('Started extract job %s for %d URLs', job_id, len(urls))
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + JOB_TIMEOUT
+            interval = POLL_INTERVAL
+            while True:
+                await asyncio.sleep(interval)
+                status = await self._call(self.app.get_extract_status, job_id)
+                state = status.get('status')
+                if state == 'completed':
+                    return status
+                if state in ('failed', 'cancelled'):
+                    raise RuntimeError(f"Extract job {job_id} {state}: {status.get('error')}")
+                if loop.time() > deadline:
+                    raise TimeoutError(f"Extract job {job_id} did not finish within {JOB_TIMEOUT}s")
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+async def scrape_real_estate_async(api_key, urls=None):
+    """Fan the search URLs out over concurrent extract jobs and merge the listings."""
+    urls = urls or SEARCH_URLS
+    params = extract_params()
+    logging.debug('Using schema: %s', params['schema'])
+
+    batches = [urls[i:i + URLS_PER_JOB] for i in range(0, len(urls), URLS_PER_JOB)]
+    logging.info('Submitting %d extract jobs for %d URLs', len(batches), len(urls))
+
+    pool = FirecrawlPool(api_key)
+    merged = {}
+    failed = 0
     try:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
-        logging.info('Data saved successfully')
-    except Exception as e:
-        logging.error(f'Error saving data: {str(e)}')
-        raise
-    
-    return data
+        jobs = [asyncio.ensure_future(pool.extract(batch, params)) for batch in batches]
+        for finished in asyncio.as_completed(jobs):
+            try:
+                data = await finished
+            except Exception as e:
+                failed += 1
+                logging.error(f'Extract job failed: {str(e)}')
+                continue
+            logging.debug('Raw response data: %s', data)
+
+            listings = (data.get('data') or {}).get('listings') or []
+            for listing in listings:
+                listing = normalize_listing(listing)
+                merged.setdefault(listing_key(listing), listing)
+            logging.info('Merged %d listings (%d unique so far)', len(listings), len(merged))
+    finally:
+        pool.close()
+
+    if failed == len(batches):
+        raise RuntimeError('All extract jobs failed')
+
+    listings = list(merged.values())
+    logging.info('Found %d listings', len(listings))
+    if listings:
+        logging.debug('Sample listing: %s', listings[0])
+    return {'success': True, 'data': {'listings': listings}}
+
+
+def scrape_real_estate(api_key):
+    """Run a full extraction and return the merged data.
+
+    Persisting the result is the caller's job (see run_scraper in app.py),
+    so each run is written to disk exactly once.
+    """
+    logging.info('Starting real estate scraping process')
+    return asyncio.run(scrape_real_estate_async(api_key))
 
 if __name__ == "__main__":
-    # Create data directory if it doesn't exist
-    os.makedirs('data', exist_ok=True)
-    scrape_real_estate()
+    data = scrape_real_estate(os.environ['FIRECRAWL_API_KEY'])
+    print(f"Extracted {len(data['data']['listings'])} listings")
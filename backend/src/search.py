@@ -0,0 +1,135 @@
+import bisect
+import re
+
+# Field weights: a hit in the property name ranks above one in the suite
+SEARCH_FIELDS = (
+    ('property_name', 3.0),
+    ('address', 2.0),
+    ('location', 1.0),
+    ('floor_suite', 1.0),
+)
+
+# A prefix-only hit on the last (still being typed) token counts this much
+PREFIX_WEIGHT = 0.5
+
+# Abbreviations folded onto one canonical token at index and query time
+SYNONYMS = {
+    'av': 'avenue', 'ave': 'avenue', 'avn': 'avenue',
+    'st': 'street', 'str': 'street',
+    'blvd': 'boulevard', 'rd': 'road', 'dr': 'drive', 'ln': 'lane',
+    'pkwy': 'parkway', 'pky': 'parkway', 'hwy': 'highway', 'fwy': 'freeway',
+    'ct': 'court', 'pl': 'place', 'sq': 'square', 'ter': 'terrace', 'cir': 'circle',
+    'fl': 'floor', 'flr': 'floor', 'ste': 'suite', 'bldg': 'building', 'rm': 'room',
+    'n': 'north', 's': 'south', 'e': 'east', 'w': 'west',
+    'ny': 'new york', 'nyc': 'new york', 'lic': 'long island city',
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens with SYNONYMS applied."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or '').lower()):
+        tokens.extend(SYNONYMS.get(token, token).split())
+    return tokens
+
+
+class _BrokerIndex:
+    """Postings of one broker's units; built once and never modified."""
+
+    def __init__(self, units):
+        self.postings = {}       # token -> {unit id: weight}
+        self.documents = {}      # unit id -> unit row
+        for unit in units:
+            doc_id = unit['id']
+            self.documents[doc_id] = unit
+            weights = {}
+            for field, weight in SEARCH_FIELDS:
+                for token in tokenize(unit.get(field)):
+                    weights[token] = max(weights.get(token, 0.0), weight)
+            for token, weight in weights.items():
+                self.postings.setdefault(token, {})[doc_id] = weight
+        self.vocabulary = sorted(self.postings)
+
+    def _prefix_matches(self, prefix):
+        """{unit id: weight} over every token starting with prefix."""
+        matches = {}
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            factor = 1.0 if token == prefix else PREFIX_WEIGHT
+            for doc_id, weight in self.postings[token].items():
+                matches[doc_id] = max(matches.get(doc_id, 0.0), weight * factor)
+        return matches
+
+    def scores(self, exact, last):
+        """{unit id: score} of the units matching every exact token and the last as a prefix."""
+        candidates = [self.postings.get(token, {}) for token in exact]
+        last_matches = self._prefix_matches(last)
+        canonical = SYNONYMS.get(last)
+        if canonical:
+            # "ave" typed in full should also hit "avenue" at full weight
+            for token in canonical.split():
+                for doc_id, weight in self.postings.get(token, {}).items():
+                    last_matches[doc_id] = max(last_matches.get(doc_id, 0.0), weight)
+        candidates.append(last_matches)
+
+        # Intersect starting from the rarest token
+        candidates.sort(key=len)
+        scores = dict(candidates[0])
+        for posting in candidates[1:]:
+            if not scores:
+                break
+            scores = {doc_id: score + posting[doc_id] for doc_id, score in scores.items() if doc_id in posting}
+        return scores
+
+
+class SearchIndex:
+    """Inverted index from normalized tokens to unit ids, one shard per broker.
+
+    A new snapshot of one broker only re-indexes that broker's units. Shards
+    are never modified once built, and add/remove replace the shard map
+    rather than change it, so a search running during a refresh sees either
+    the old or the new map, never a half-indexed one. ListingStore goes
+    further and re-indexes into a copy() it swaps in when done.
+    """
+
+    def __init__(self, shards=None):
+        self.shards = dict(shards or {})   # broker -> _BrokerIndex
+
+    def __len__(self):
+        return sum(len(shard.documents) for shard in self.shards.values())
+
+    def copy(self):
+        """A new index sharing this one's shards."""
+        return SearchIndex(self.shards)
+
+    def add(self, broker, units):
+        """Index one broker's units (replacing whatever it had indexed before)."""
+        self.shards = {**self.shards, broker: _BrokerIndex(units)}
+
+    def remove(self, broker):
+        """Drop every unit indexed for broker."""
+        if broker in self.shards:
+            self.shards = {name: shard for name, shard in self.shards.items() if name != broker}
+
+    def search(self, query, limit=20):
+        """Ranked [(score, unit)] for units matching every query token.
+
+        All tokens must match exactly except the last, which also matches
+        as a prefix so results update while it is being typed.
+        """
+        raw = _TOKEN_RE.findall((query or '').lower())
+        if not raw:
+            return []
+        exact = tokenize(' '.join(raw[:-1]))
+        last = raw[-1]
+
+        results = []
+        for shard in self.shards.values():
+            documents = shard.documents
+            results.extend((score, documents[doc_id]) for doc_id, score in shard.scores(exact, last).items())
+        results.sort(key=lambda item: (-item[0], item[1].get('property_name') or '', item[1]['id']))
+        return results[:limit]
@@ -0,0 +1,127 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Snapshots (raw_data_<timestamp>.json) and their manifest live here
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'data')
+MANIFEST_NAME = 'manifest.json'
+
+
+def _fsync_dir(path):
+    """Persist a rename: the directory entry has to reach disk as well."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, body):
+    """Write bytes to path via a fsynced temp file in the same directory and a rename."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+class SnapshotStore:
+    """Crash-safe raw_data snapshots plus a manifest naming the latest one.
+
+    A snapshot is only renamed into place once fully written and fsynced, and
+    the manifest is rewritten (also atomically) afterwards, so a reader that
+    follows manifest['latest'] never sees a partial file. Writers from
+    different worker processes are serialized with a lock file.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.directory, '.manifest.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def manifest(self):
+        """{'latest': filename or None, 'snapshots': [entry, ...]} (oldest first)."""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'latest': None, 'snapshots': []}
+
+    def _new_filename(self):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'raw_data_{timestamp}.json'
+        suffix = 1
+        # Two snapshots within one second get distinct names
+        while os.path.exists(os.path.join(self.directory, filename)):
+            suffix += 1
+            filename = f'raw_data_{timestamp}_{suffix}.json'
+        return filename
+
+    def write(self, data):
+        """Store one scrape result as the new latest snapshot; returns its path."""
+        body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        entry = {
+            'rows': len(data.get('data', {}).get('listings', [])),
+            'bytes': len(body),
+            'sha256': hashlib.sha256(body).hexdigest(),
+            'created_at': time.time()
+        }
+        with self._locked():
+            entry['file'] = self._new_filename()
+            atomic_write(os.path.join(self.directory, entry['file']), body)
+            manifest = self.manifest()
+            manifest['snapshots'].append(entry)
+            manifest['latest'] = entry['file']
+            atomic_write(self.manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+        return os.path.join(self.directory, entry['file'])
+
+    def entry(self, path):
+        """Manifest entry of a snapshot path, or None for files written before the manifest."""
+        filename = os.path.basename(path)
+        for entry in self.manifest()['snapshots']:
+            if entry['file'] == filename:
+                return entry
+        return None
+
+    def latest_path(self):
+        """Path of the latest snapshot: one manifest read, or a directory scan for legacy data."""
+        latest = self.manifest()['latest']
+        if latest:
+            return os.path.join(self.directory, latest)
+        data_files = [f for f in os.listdir(self.directory) if f.startswith('raw_data_') and f.endswith('.json')]
+        if not data_files:
+            return None
+        logging.info('No snapshot manifest; falling back to the newest raw_data file')
+        return os.path.join(self.directory, max(data_files, key=lambda x: os.path.getmtime(os.path.join(self.directory, x))))
+
+    def read(self, path):
+        """Parsed snapshot, checked against the manifest checksum when it has one."""
+        with open(path, 'rb') as f:
+            body = f.read()
+        entry = self.entry(path)
+        if entry and hashlib.sha256(body).hexdigest() != entry['sha256']:
+            raise ValueError(f'Snapshot {path} does not match its manifest checksum')
+        return json.loads(body)
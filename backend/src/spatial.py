@@ -0,0 +1,79 @@
+import math
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+# ~1.1 km of latitude per cell; a 1 km radius query touches about 9 cells
+CELL_DEGREES = 0.01
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    """Fixed-size lat/lon grid over a list of points.
+
+    points[i] is (lat, lon) or (None, None) for an item that is not located;
+    queries return the indices i of matching points, so callers keep their
+    rows in a plain list. Each cell maps to the indices inside it, so a query
+    only looks at the cells its box overlaps instead of every point.
+    """
+
+    def __init__(self, points, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.points = points
+        self.cells = {}
+        for index, (lat, lon) in enumerate(points):
+            if lat is None or lon is None:
+                continue
+            self.cells.setdefault(self._cell(lat, lon), []).append(index)
+
+    def __len__(self):
+        return sum(len(indices) for indices in self.cells.values())
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _candidates(self, south, west, north, east):
+        """Indices in every cell overlapping the box (a superset of the answer)."""
+        row_min, col_min = self._cell(south, west)
+        row_max, col_max = self._cell(north, east)
+        span = (row_max - row_min + 1) * (col_max - col_min + 1)
+        if span > len(self.cells):
+            # Huge box: walking the occupied cells is cheaper than the grid
+            for (row, col), indices in self.cells.items():
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    yield from indices
+            return
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                yield from self.cells.get((row, col), ())
+
+    def bbox(self, south, west, north, east):
+        """Indices of points inside the box, in index order."""
+        matches = []
+        for index in self._candidates(south, west, north, east):
+            lat, lon = self.points[index]
+            if south <= lat <= north and west <= lon <= east:
+                matches.append(index)
+        matches.sort()
+        return matches
+
+    def near(self, lat, lon, radius_m):
+        """(distance_m, index) of points within radius_m, nearest first."""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlon = radius_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        matches = []
+        for index in self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            point_lat, point_lon = self.points[index]
+            distance = haversine_m(lat, lon, point_lat, point_lon)
+            if distance <= radius_m:
+                matches.append((distance, index))
+        matches.sort()
+        return matches
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Shared by every gunicorn worker process on the instance
+STATE_DB = os.environ.get('STATE_DB', os.path.join('data', 'state.db'))
+
+# A job still "running" after this long died with its worker
+JOB_TIMEOUT = int(os.environ.get('SCRAPE_JOB_TIMEOUT', 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,          -- running | completed | failed
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    snapshot TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_started_at ON jobs (started_at);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class StateStore:
+    """Scrape job state and shared pointers in SQLite.
+
+    Every worker process opens the same database file (WAL mode, so readers
+    never block the writer), which replaces the old process-global
+    scraping_status dict. Connections are per thread.
+    """
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def _expire_stale(connection, now):
+        """Mark jobs running for longer than JOB_TIMEOUT as failed."""
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Job timed out' "
+            "WHERE status = 'running' AND started_at < ?",
+            (now, now - JOB_TIMEOUT)
+        )
+
+    def start_job(self):
+        """Claim the scraper: a new job id, or None if another job is running."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._expire_stale(connection, now)
+            running = connection.execute("SELECT 1 FROM jobs WHERE status = 'running' LIMIT 1").fetchone()
+            if running:
+                connection.execute('ROLLBACK')
+                return None
+            job_id = uuid.uuid4().hex
+            connection.execute("INSERT INTO jobs (id, status, started_at) VALUES (?, 'running', ?)", (job_id, now))
+            connection.execute('COMMIT')
+            return job_id
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def finish_job(self, job_id, snapshot=None, error=None):
+        self._connection().execute(
+            'UPDATE jobs SET status = ?, finished_at = ?, snapshot = ?, error = ? WHERE id = ?',
+            ('failed' if error else 'completed', time.time(), snapshot, error, job_id)
+        )
+
+    def latest_job(self):
+        """The newest job; one whose worker died reads as failed, not running forever."""
+        connection = self._connection()
+        row = connection.execute('SELECT * FROM jobs ORDER BY started_at DESC LIMIT 1').fetchone()
+        now = time.time()
+        if row is not None and row['status'] == 'running' and row['started_at'] < now - JOB_TIMEOUT:
+            # Only write when there is something to expire; status is polled
+            self._expire_stale(connection, now)
+            row = connection.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+        return dict(row) if row else None
+
+    def get(self, key, default=None):
+        row = self._connection().execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set(self, key, value):
+        self._connection().execute(
+            'INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+            (key, value)
+        )
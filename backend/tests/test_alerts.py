@@ -0,0 +1,114 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import alerts
+from alerts import AlertStore, check_webhook_url
+
+
+def store(tmp_path):
+    return AlertStore(str(tmp_path / 'alerts.db'), str(tmp_path / 'outbox.jsonl'))
+
+
+@pytest.mark.parametrize('url', [
+    'ftp://93.184.216.34/hook',
+    'file:///etc/passwd',
+    'http:///hook',
+    'http://127.0.0.1:5001/api/scrape',
+    'http://localhost/hook',
+    'http://10.0.0.5/hook',
+    'http://192.168.1.1/hook',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://[::1]/hook',
+    'http://0.0.0.0/hook',
+])
+def test_non_public_webhooks_are_rejected(tmp_path, url):
+    with pytest.raises(ValueError):
+        store(tmp_path).add_search('bad', webhook_url=url)
+
+
+def test_public_webhook_is_accepted(tmp_path):
+    check_webhook_url('https://93.184.216.34/hook')
+    assert store(tmp_path).add_search('ok', webhook_url='http://93.184.216.34/hook')
+
+
+def test_delivery_rechecks_the_host(tmp_path, monkeypatch, caplog):
+    alert_store = store(tmp_path)
+    search_id = alert_store.add_search('rebound', webhook_url='http://93.184.216.34/hook')
+    assert alert_store.evaluate([{'change': 'new', 'unit_id': 'u1', 'unit': {'id': 'u1'}, 'previous': None}])
+
+    # The host now resolves to the metadata address; nothing may be posted
+    monkeypatch.setattr(alerts.socket, 'getaddrinfo', lambda *args, **kwargs: [(2, 1, 6, '', ('169.254.169.254', 0))])
+    monkeypatch.setattr(alerts.socket, 'create_connection', lambda *args, **kwargs: pytest.fail('connected'))
+    assert alert_store.deliver() == (0, 1)
+    assert 'non-public' in caplog.text
+    alert = alert_store.recent(search_id)[0]
+    assert not alert['delivered'] and alert['attempts'] == 1
+
+
+def test_webhook_is_posted_to_the_checked_address(tmp_path, monkeypatch):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.headers['Host'], json.loads(self.rfile.read(int(self.headers['Content-Length'])))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # hooks.example.com resolves to a public address once; the test routes that address to the local server
+    connected = []
+    create_connection = socket.create_connection
+    getaddrinfo = socket.getaddrinfo
+    monkeypatch.setattr(alerts.socket, 'getaddrinfo', lambda host, *args, **kwargs: (
+        [(2, 1, 6, '', ('93.184.216.34', 0))] if host == 'hooks.example.com' else getaddrinfo(host, *args, **kwargs)))
+    monkeypatch.setattr(alerts.socket, 'create_connection', lambda address, *args: (
+        connected.append(address), create_connection(server.server_address, *args))[1])
+    try:
+        alert_store = store(tmp_path)
+        alert_store.add_search('hooked', webhook_url='http://hooks.example.com:8080/alerts')
+        alert_store.evaluate([{'change': 'new', 'unit_id': 'u1', 'unit': {'id': 'u1'}, 'previous': None}])
+        assert alert_store.deliver() == (1, 0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert connected == [('93.184.216.34', 8080)]
+    assert received[0][0] == 'hooks.example.com:8080'
+
+
+def test_add_search_validates_ranges_and_changes(tmp_path):
+    alert_store = store(tmp_path)
+    with pytest.raises(ValueError, match='Empty range'):
+        alert_store.add_search('bad', min_sf=5000, max_sf=1000)
+    with pytest.raises(ValueError, match='Unknown change types: removed'):
+        alert_store.add_search('bad', changes=('new', 'removed'))
+    with pytest.raises(ValueError, match='keywords must be a string'):
+        alert_store.add_search('bad', keywords={'loft': True})
+    with pytest.raises(ValueError, match='changes must be a list'):
+        alert_store.add_search('bad', changes='new')
+    assert alert_store.searches() == []
+
+
+def test_evaluate_uses_searches_added_and_deleted_since_the_last_crawl(tmp_path):
+    alert_store = store(tmp_path)
+    unit = {'id': 'u1', 'broker': 'jll', 'location': 'Brooklyn, NY', 'property_name': 'Dock 72',
+            'size_sf': 4000.0, 'annual_psf': 55.0}
+    change = {'change': 'repriced', 'unit_id': 'u1', 'unit': unit, 'previous': {'price': '$60.00 SF/yr'}}
+
+    cheap = alert_store.add_search('cheap brooklyn', city='brooklyn', max_psf=60)
+    assert alert_store.evaluate([change]) == 1
+    alert_store.add_search('jll docks', broker='jll', keywords='dock', changes=('repriced',))
+    alert_store.add_search('default changes', city='brooklyn')    # new and repriced
+    alert_store.add_search('updates', city='brooklyn', changes=('updated',))
+    assert alert_store.evaluate([change]) == 3
+
+    alert_store.delete_search(cheap)
+    assert alert_store.evaluate([change]) == 2
+    assert alert_store.evaluate([dict(change, change='removed')]) == 0
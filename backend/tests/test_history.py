@@ -0,0 +1,75 @@
+import json
+import logging
+
+from alerts import AlertStore
+from history import HistoryStore, backfill
+
+
+def row(suite, price, url='https://lee/1', space='2,500 SF'):
+    return {'listing_url': url, 'floor_suite': suite, 'price': price, 'space_available': space}
+
+
+def ingest(store, tmp_path, stamp, rows):
+    return store.ingest('lee', str(tmp_path / f'lee_properties_{stamp}.json'), rows)
+
+
+def test_versions_open_and_close_per_unit(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    first = ingest(store, tmp_path, '20250101_000000', [row('Suite 1', '$30.00 SF/yr'), row('Suite 2', '$40.00 SF/yr')])
+    assert first.baseline and first.opened == 2
+
+    second = ingest(store, tmp_path, '20250102_000000', [row('Suite 1', '$32.00 SF/yr')])
+    assert not second.baseline
+    assert sorted(change['change'] for change in second.changes) == ['removed', 'repriced']
+
+    repriced = {change['change']: change['unit_id'] for change in second.changes}['repriced']
+    timeline = store.timeline(repriced)
+    assert [version['price'] for version in timeline['history']] == ['$30.00 SF/yr', '$32.00 SF/yr']
+    assert timeline['history'][0]['valid_to'] is not None and timeline['history'][1]['valid_to'] is None
+
+
+def test_units_sharing_a_suite_each_keep_their_history(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    rows = [row('', '$30.00 SF/yr', space='1,000 SF'), row('', '$25.00 SF/yr', space='5,000 SF')]
+    assert ingest(store, tmp_path, '20250101_000000', rows).opened == 2
+
+    rows = [row('', '$30.00 SF/yr', space='1,000 SF'), row('', '$27.00 SF/yr', space='5,000 SF')]
+    changes = ingest(store, tmp_path, '20250102_000000', rows).changes
+    assert [(change['change'], change['unit']['price']) for change in changes] == [('repriced', '$27.00 SF/yr')]
+
+
+def test_repeated_ids_are_logged(tmp_path, caplog):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    rows = [dict(row('Suite 1', '$30.00 SF/yr'), id='a'), dict(row('Suite 1', '$30.00 SF/yr'), id='a')]
+    with caplog.at_level(logging.WARNING):
+        assert ingest(store, tmp_path, '20250101_000000', rows).opened == 1
+    assert '1 rows repeat an earlier unit id' in caplog.text
+
+
+def test_backfill_applies_files_once_in_crawl_order(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    paths = []
+    for stamp, price in (('20250102_000000', '$32.00 SF/yr'), ('20250101_000000', '$30.00 SF/yr')):
+        path = tmp_path / f'lee_properties_{stamp}.json'
+        path.write_text(json.dumps([row('Suite 1', price)]))
+        paths.append(str(path))
+    assert backfill(store, paths) == 2
+    assert backfill(store, paths) == 0
+
+
+def test_backfill_queues_alerts_for_what_a_published_file_changed(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    alerts = AlertStore(str(tmp_path / 'alerts.db'), str(tmp_path / 'outbox.jsonl'))
+    search_id = alerts.add_search('lee repricings', broker='lee', changes=('repriced',))
+    paths = []
+    for stamp, price in (('20250101_000000', '$30.00 SF/yr'), ('20250102_000000', '$32.00 SF/yr')):
+        path = tmp_path / f'lee_properties_{stamp}.json'
+        path.write_text(json.dumps([row('Suite 1', price)]))
+        paths.append(str(path))
+
+    backfill(store, paths[:1], alerts)
+    assert alerts.recent(search_id) == []     # the first file is only a baseline
+    backfill(store, paths, alerts)
+    assert len(alerts.recent(search_id)) == 1
+    # Loading the same file again, as the ListingStore would, changes nothing
+    assert store.ingest('lee', paths[1], [row('Suite 1', '$32.00 SF/yr')]).changes == []
@@ -0,0 +1,49 @@
+import glob
+import json
+import os
+
+from listings import ListingStore, assign_unit_ids, unit_id
+
+
+def write_broker(data_dir, broker, stamp, rows):
+    path = os.path.join(data_dir, f'{broker}_properties_{stamp}.json')
+    with open(path, 'w') as f:
+        json.dump(rows, f)
+    return path
+
+
+def row(url, suite, name='Madison Tower'):
+    return {'listing_url': url, 'floor_suite': suite, 'property_name': name, 'lat': 40.75, 'lon': -73.98}
+
+
+def test_refresh_publishes_a_new_snapshot_and_keeps_the_old_one_intact(tmp_path):
+    write_broker(tmp_path, 'lee', '20250101_000000', [row('https://lee/1', 'Suite 100')])
+    store = ListingStore(data_dir=str(tmp_path))
+    first = store.refresh()
+    assert store.refresh() is first
+    assert [unit['broker'] for unit in first.units] == ['lee']
+
+    write_broker(tmp_path, 'cbre', '20250102_000000', [row('https://cbre/1', 'Floor 2', 'Park Plaza')])
+    second = store.refresh()
+    assert second is not first
+    assert len(first.units) == 1 and len(first.search) == 1 and first.search.search('park') == []
+    assert len(second.units) == 2 and len(second.by_id) == 2
+    assert [unit['broker'] for _, unit in second.search.search('park')] == ['cbre']
+    assert sorted(second.spatial.bbox(40, -75, 41, -73)) == [0, 1]
+
+
+def test_units_sharing_a_listing_and_suite_get_their_own_ids():
+    rows = [row('https://lee/1', ''), row('https://lee/1', ''), row('https://lee/1', 'Suite 2'), row('https://lee/1', '')]
+    assign_unit_ids(rows, 'lee')
+    assert len({r['id'] for r in rows}) == 4
+    # The first keeps the id it had before duplicates were numbered
+    assert rows[0]['id'] == unit_id(rows[0]) and rows[2]['id'] == unit_id(rows[2])
+    assert [r['id'] for r in assign_unit_ids([dict(r) for r in rows])] == [r['id'] for r in rows]
+
+
+def test_real_broker_files_have_unique_ids():
+    repo = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for path in glob.glob(os.path.join(repo, '*_properties_*.json')):
+        with open(path) as f:
+            rows = json.load(f)
+        assert len({r['id'] for r in assign_unit_ids(rows)}) == len(rows), path
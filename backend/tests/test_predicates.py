@@ -0,0 +1,58 @@
+import math
+import random
+
+from alerts import DEFAULT_CHANGES, matches, random_searches
+from predicates import IntervalTree, PredicateIndex
+
+CITIES = ('New York, NY', 'Brooklyn, NY', 'Jersey City, NJ', 'Stamford, CT')
+WORDS = ('tower', 'loft', 'plaza', 'madison', 'broadway', 'park', 'suite')
+
+
+def random_units(count, seed=0):
+    rng = random.Random(seed)
+    units = []
+    for n in range(count):
+        units.append({
+            'id': str(n),
+            'broker': rng.choice(('lee', 'cbre', 'jll')),
+            'location': rng.choice(CITIES),
+            'borough': rng.choice((None, 'Manhattan', 'Brooklyn')),
+            'property_name': ' '.join(rng.sample(WORDS, 2)),
+            'address': f'{rng.randrange(1, 500)} {rng.choice(WORDS)} Ave',
+            'floor_suite': f'Suite {rng.randrange(100, 900)}',
+            'size_sf': rng.choice((None, float(rng.randrange(500, 60000, 250)))),
+            'annual_psf': rng.choice((None, float(rng.randrange(10, 140)))),
+        })
+    return units
+
+
+def test_interval_tree_stab_matches_brute_force():
+    rng = random.Random(3)
+    intervals = []
+    for n in range(300):
+        low = rng.choice((-math.inf, float(rng.randrange(0, 100))))
+        high = rng.choice((math.inf, low + rng.randrange(0, 40) if math.isfinite(low) else float(rng.randrange(0, 100))))
+        intervals.append((low, high, n))
+    tree = IntervalTree(intervals)
+    for point in [x / 2 for x in range(-10, 300)]:
+        assert sorted(tree.stab(point)) == sorted(n for low, high, n in intervals if low <= point <= high)
+    assert IntervalTree([]).stab(1.0) == []
+
+
+def test_index_agrees_with_checking_every_search():
+    units = random_units(400)
+    searches = random_searches(units, 2000)
+    # Also searches with every kind of anchor and with no predicate at all
+    searches += [
+        {'id': 5001, 'name': 'all', 'broker': None, 'city': None, 'min_sf': None, 'max_sf': None,
+         'min_psf': None, 'max_psf': None, 'keywords': None, 'changes': DEFAULT_CHANGES},
+        {'id': 5002, 'name': 'psf only', 'broker': None, 'city': None, 'min_sf': None, 'max_sf': None,
+         'min_psf': 40, 'max_psf': 60, 'keywords': None, 'changes': DEFAULT_CHANGES},
+        {'id': 5003, 'name': 'borough', 'broker': 'lee', 'city': 'MANHATTAN', 'min_sf': 1000, 'max_sf': None,
+         'min_psf': None, 'max_psf': 90, 'keywords': 'Madison Av', 'changes': DEFAULT_CHANGES},
+    ]
+    index = PredicateIndex(searches)
+    assert len(index) == len(searches)
+    for unit in units:
+        change = {'change': 'new', 'unit': unit}
+        assert sorted(index.match(unit)) == [search['id'] for search in searches if matches(search, change)]
@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip('firecrawl')
+
+from scraper import listing_key, normalize_listing
+
+
+def test_listings_with_a_url_merge_on_it():
+    assert listing_key({'url': 'https://jll.com/a/', 'price': '$1'}) == listing_key({'url': 'HTTPS://jll.com/a', 'price': '$2'})
+
+
+def test_listings_without_a_url_stay_apart_unless_identical():
+    a = normalize_listing({'location': '1 Main St', 'square_footage': '2,000 SF', 'price': 'N/A'})
+    b = normalize_listing({'location': '1 Main St', 'square_footage': '5,000 SF', 'price': 'N/A'})
+    empty = {'address': '', 'square_footage': '900 SF'}
+    assert len({listing_key(a), listing_key(b), listing_key(empty), listing_key({})}) == 4
+    assert listing_key(a) == listing_key({'address': ' 1  MAIN st', 'square_footage': '2,000 sf', 'price': 'n/a'})
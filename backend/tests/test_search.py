@@ -0,0 +1,70 @@
+import threading
+
+from search import SearchIndex
+
+
+def unit(doc_id, name, address='', broker='lee'):
+    return {'id': doc_id, 'broker': broker, 'property_name': name, 'address': address}
+
+
+def test_prefix_synonyms_and_ranking():
+    index = SearchIndex()
+    index.add('lee', [unit('a', 'Madison Tower', '1 Madison Ave'), unit('b', 'Park Plaza', '10 Madison Ave')])
+    index.add('cbre', [unit('c', 'Broadway Lofts', '5 Broadway', broker='cbre')])
+
+    assert [u['id'] for _, u in index.search('madison av')] == ['a', 'b']
+    assert [u['id'] for _, u in index.search('broad')] == ['c']
+    assert index.search('madison broadway') == []
+    assert len(index) == 3
+
+
+def test_add_replaces_and_remove_drops_a_broker():
+    index = SearchIndex()
+    index.add('lee', [unit('a', 'Madison Tower')])
+    index.add('lee', [unit('b', 'Park Plaza')])
+    assert index.search('madison') == []
+    assert [u['id'] for _, u in index.search('park')] == ['b']
+
+    index.remove('lee')
+    assert len(index) == 0 and index.search('park') == []
+
+
+def test_copy_leaves_the_original_unchanged():
+    index = SearchIndex()
+    index.add('lee', [unit('a', 'Madison Tower')])
+    copy = index.copy()
+    copy.remove('lee')
+    copy.add('cbre', [unit('c', 'Broadway Lofts', broker='cbre')])
+    assert [u['id'] for _, u in index.search('madison')] == ['a']
+    assert index.search('broadway') == []
+
+
+def test_search_during_reindexing():
+    index = SearchIndex()
+    units = [unit(str(i), f'Tower {i}', f'{i} Madison Ave') for i in range(500)]
+    index.add('lee', units)
+    stop = threading.Event()
+    errors = []
+
+    def reindex():
+        while not stop.is_set():
+            index.remove('lee')
+            index.add('lee', units)
+
+    def search():
+        try:
+            for _ in range(200):
+                index.search('madison tow')
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=reindex)
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    writer.start()
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    stop.set()
+    writer.join()
+    assert errors == []
@@ -0,0 +1,23 @@
+import state
+from state import StateStore
+
+
+def test_a_dead_job_reads_as_failed_and_frees_the_scraper(tmp_path, monkeypatch):
+    store = StateStore(str(tmp_path / 'state.db'))
+    job_id = store.start_job()
+    assert store.start_job() is None
+    assert store.latest_job()['status'] == 'running'
+
+    monkeypatch.setattr(state, 'JOB_TIMEOUT', -1)
+    job = store.latest_job()
+    assert (job['id'], job['status'], job['error']) == (job_id, 'failed', 'Job timed out')
+    assert store.start_job() is not None
+
+
+def test_finished_jobs_are_reported_as_is(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    job_id = store.start_job()
+    store.finish_job(job_id, snapshot='raw_data_20250101_000000.json')
+    assert store.latest_job()['status'] == 'completed'
+    store.set('latest_snapshot', 'raw_data_20250101_000000.json')
+    assert store.get('latest_snapshot') == 'raw_data_20250101_000000.json'
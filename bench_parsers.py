@@ -0,0 +1,260 @@
+"""Offline benchmark and regression check for the broker detail parsers.
+
+Fixtures live under html_dumps/<broker>/: one .html file per detail page
+plus fixtures.json, which lists each page's URL, fetch time and golden units.
+The committed fixtures are small pages covering each parser's layouts, with
+golden units produced by the crawlers' inline parsing code from before
+parse_property() was extracted (commit 19608ad), so a parser is checked
+against the old code rather than its own output (`baseline` recomputes
+them, e.g. after adding a page). `record` adds real pages from the page
+cache, with golden units from the crawl output files.
+
+Examples:
+    python bench_parsers.py record --per-broker 25   # page cache -> fixtures
+    python bench_parsers.py baseline                 # golden units of the committed pages from 19608ad
+    python bench_parsers.py run                      # time + check every broker
+    python bench_parsers.py run lee --repeat 5
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+import tracemalloc
+import types
+from collections import Counter
+from datetime import datetime
+
+
+from brokers import BROKERS
+from page_cache import CACHE_DIR, PageCache
+from units import Unit, to_epoch
+
+FIXTURES_DIR = 'html_dumps'
+
+# The last commit where each crawler parsed detail pages inline, before
+# parse_property() was extracted; committed fixtures are checked against it
+BASELINE_COMMIT = '19608ad'
+BASELINE_SOURCE = f'baseline parser ({BASELINE_COMMIT})'
+
+# Fields compared against the golden output. fetched_at and run_id are
+# crawl-time values, so they can never match between runs.
+COMPARED_FIELDS = ("property_name", "address", "location", "listing_url", "floor_suite", "space_available", "price")
+
+
+def unit_key(unit):
+    if isinstance(unit, Unit):
+        unit = unit.to_dict()
+    return tuple(unit.get(field) for field in COMPARED_FIELDS)
+
+
+def latest_properties_file(broker, data_dir='.'):
+    files = sorted(glob.glob(os.path.join(data_dir, f"{broker}_properties_*.json")))
+    return files[-1] if files else None
+
+
+def load_fixtures(broker, fixtures_dir=FIXTURES_DIR):
+    path = os.path.join(fixtures_dir, broker, 'fixtures.json')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def record(brokers, per_broker, cache_root, fixtures_dir, data_dir):
+    """Copy cached detail pages into fixtures, with golden units from the property files."""
+    cache = PageCache(cache_root)
+    for broker in brokers:
+        properties_file = latest_properties_file(broker, data_dir)
+        if not properties_file:
+            print(f"{broker}: no {broker}_properties_*.json to derive golden output from, skipping")
+            continue
+        with open(properties_file) as f:
+            golden_by_url = {}
+            for unit in json.load(f):
+                golden_by_url.setdefault(unit["listing_url"], []).append(unit)
+
+        parse_property = importlib.import_module(BROKERS[broker]).parse_property
+        broker_dir = os.path.join(fixtures_dir, broker)
+        os.makedirs(broker_dir, exist_ok=True)
+        fixtures = {fixture['file']: fixture for fixture in load_fixtures(broker, fixtures_dir)}
+
+        recorded = 0
+        for cache_record in reversed(cache.records(broker)):
+            if recorded >= per_broker:
+                break
+            html = cache.get(cache_record['sha256'])
+            # The parser tells us which listing_url the page maps to; the
+            # expected rows themselves come from the crawl output file.
+            parsed = parse_property(html, cache_record['url'])
+            listing_url = parsed[0].property.listing_url if parsed else cache_record['url']
+            golden = golden_by_url.get(listing_url)
+            if not golden:
+                continue
+
+            filename = f"{cache_record['sha256'][:16]}.html"
+            with open(os.path.join(broker_dir, filename), 'w') as f:
+                f.write(html)
+            fixtures[filename] = {
+                "file": filename,
+                "url": cache_record['url'],
+                "fetched_at": cache_record['fetched_at'],
+                "golden_source": os.path.basename(properties_file),
+                "expected": [{field: unit.get(field) for field in COMPARED_FIELDS if field in unit} for unit in golden]
+            }
+            recorded += 1
+
+        with open(os.path.join(broker_dir, 'fixtures.json'), 'w') as f:
+            json.dump(sorted(fixtures.values(), key=lambda fixture: fixture['file']), f, indent=2)
+        print(f"{broker}: recorded {recorded} fixtures ({len(fixtures)} total) from {properties_file}")
+
+
+def baseline_loop(broker):
+    """The body of the baseline crawler's `async for result in stream:` loop, as plain code."""
+    source = subprocess.check_output(['git', 'show', f'{BASELINE_COMMIT}:{BROKERS[broker]}.py'], text=True)
+    lines = source.split('\n')
+    start = max(i for i, line in enumerate(lines) if line.strip() == 'async for result in stream:')
+    indent = len(lines[start]) - len(lines[start].lstrip())
+    end = start + 1
+    while end < len(lines) and (not lines[end].strip() or len(lines[end]) - len(lines[end].lstrip()) > indent):
+        end += 1
+    return textwrap.dedent('\n'.join([lines[start].replace('async for', 'for', 1)] + lines[start + 1:end]))
+
+
+def baseline(brokers, fixtures_dir):
+    """Recompute the golden units of the committed fixtures with the baseline crawlers' inline parsing."""
+    import arrow
+    from bs4 import BeautifulSoup
+
+    for broker in brokers:
+        fixtures = load_fixtures(broker, fixtures_dir)
+        committed = [fixture for fixture in fixtures if fixture.get('golden_source') == BASELINE_SOURCE]
+        if not committed:
+            continue
+        loop = compile(baseline_loop(broker), f'{BASELINE_COMMIT}:{BROKERS[broker]}.py', 'exec')
+        for fixture in committed:
+            with open(os.path.join(fixtures_dir, broker, fixture['file'])) as f:
+                html = f.read()
+            scope = {'stream': [types.SimpleNamespace(success=True, html=html, url=fixture['url'])],
+                     'all_property_details': [], 'url_mapping': {}, 'BeautifulSoup': BeautifulSoup,
+                     'arrow': arrow, 'datetime': datetime, 'print': lambda *args, **kwargs: None}
+            exec(loop, scope)
+            fixture['expected'] = [{field: unit.get(field) for field in COMPARED_FIELDS if field in unit}
+                                   for unit in scope['all_property_details']]
+        with open(os.path.join(fixtures_dir, broker, 'fixtures.json'), 'w') as f:
+            json.dump(fixtures, f, indent=2)
+        print(f"{broker}: {len(committed)} fixtures from {BASELINE_COMMIT}")
+
+
+def bench_broker(broker, repeat, fixtures_dir):
+    """Time and check one broker's parser over its fixtures. Returns (stats, failures)."""
+    fixtures = load_fixtures(broker, fixtures_dir)
+    if not fixtures:
+        return None, []
+
+    parse_property = importlib.import_module(BROKERS[broker]).parse_property
+    pages = []
+    for fixture in fixtures:
+        with open(os.path.join(fixtures_dir, broker, fixture['file'])) as f:
+            pages.append((fixture, f.read(), to_epoch(fixture['fetched_at'])))
+
+    # Correctness and allocations in one traced pass, timing in untraced passes
+    failures = []
+    tracemalloc.start()
+    peak_bytes = 0
+    retained_bytes = 0
+    for fixture, html, fetched_at in pages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        units = parse_property(html, fixture['url'], fetched_at)
+        current, peak = tracemalloc.get_traced_memory()
+        peak_bytes = max(peak_bytes, peak - before)
+        retained_bytes += current - before
+
+        got = Counter(unit_key(unit) for unit in units)
+        expected = Counter(unit_key(unit) for unit in fixture['expected'])
+        if got != expected:
+            failures.append((fixture['file'], expected - got, got - expected))
+    tracemalloc.stop()
+
+    wall = 0.0
+    cpu = 0.0
+    for _ in range(repeat):
+        for fixture, html, fetched_at in pages:
+            wall_started = time.perf_counter()
+            cpu_started = time.process_time()
+            parse_property(html, fixture['url'], fetched_at)
+            cpu += time.process_time() - cpu_started
+            wall += time.perf_counter() - wall_started
+
+    parsed_pages = len(pages) * repeat
+    stats = {
+        "pages": len(pages),
+        "pages_per_sec": parsed_pages / wall if wall else 0.0,
+        "cpu_ms_per_page": cpu / parsed_pages * 1000,
+        "peak_kib_per_page": peak_bytes / 1024,
+        "retained_kib_per_page": retained_bytes / len(pages) / 1024,
+    }
+    return stats, failures
+
+
+def run(brokers, repeat, fixtures_dir):
+    print(f"{'broker':<18}{'pages':>6}{'pages/s':>10}{'cpu ms/page':>13}{'peak KiB':>10}{'kept KiB':>10}  golden")
+    all_ok = True
+    for broker in brokers:
+        stats, failures = bench_broker(broker, repeat, fixtures_dir)
+        if stats is None:
+            print(f"{broker:<18}{'-':>6}  no fixtures (run: python bench_parsers.py record {broker})")
+            continue
+        status = "OK" if not failures else f"FAIL ({len(failures)} pages)"
+        print(f"{broker:<18}{stats['pages']:>6}{stats['pages_per_sec']:>10.1f}{stats['cpu_ms_per_page']:>13.2f}"
+              f"{stats['peak_kib_per_page']:>10.0f}{stats['retained_kib_per_page']:>10.1f}  {status}")
+        for filename, missing, unexpected in failures:
+            all_ok = False
+            print(f"  {broker}/{filename}:")
+            for unit in missing.elements():
+                print(f"    missing:    {dict(zip(COMPARED_FIELDS, unit))}")
+            for unit in unexpected.elements():
+                print(f"    unexpected: {dict(zip(COMPARED_FIELDS, unit))}")
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and regression-check the broker parsers offline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="Record fixtures from the page cache")
+    record_parser.add_argument('brokers', nargs='*')
+    record_parser.add_argument('--per-broker', type=int, default=25)
+    record_parser.add_argument('--cache-dir', default=CACHE_DIR)
+    record_parser.add_argument('--data-dir', default='.', help="Where the *_properties_*.json files are")
+
+    baseline_parser = subparsers.add_parser('baseline', help=f"Recompute committed fixtures' golden units from {BASELINE_COMMIT}")
+    baseline_parser.add_argument('brokers', nargs='*')
+
+    run_parser = subparsers.add_parser('run', help="Time the parsers and check golden output")
+    run_parser.add_argument('brokers', nargs='*')
+    run_parser.add_argument('--repeat', type=int, default=3)
+
+    parser.add_argument('--fixtures-dir', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    brokers = args.brokers or sorted(BROKERS)
+    unknown = [broker for broker in brokers if broker not in BROKERS]
+    if unknown:
+        parser.error(f"unknown broker(s): {', '.join(unknown)}")
+
+    if args.command == 'record':
+        record(brokers, args.per_broker, args.cache_dir, args.fixtures_dir, args.data_dir)
+    elif args.command == 'baseline':
+        baseline(brokers, args.fixtures_dir)
+    elif not run(brokers, args.repeat, args.fixtures_dir):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
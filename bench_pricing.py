@@ -0,0 +1,88 @@
+"""Benchmark and coverage check for pricing.py over the real property files.
+
+Examples:
+    python bench_pricing.py                 # every *_properties_*.json here
+    python bench_pricing.py --repeat 20 lee_properties_20250204_122321.json
+"""
+import argparse
+import glob
+import json
+import sys
+import time
+from collections import Counter
+
+import pricing
+
+STATUSES = ('quoted', 'negotiable', 'withheld', 'on_request', pricing.UNRECOGNIZED, pricing.IMPLAUSIBLE)
+
+
+def load_columns(paths):
+    """Read property files into (broker, price, space_available) columns."""
+    brokers, prices, spaces = [], [], []
+    for path in paths:
+        broker = path.split('/')[-1].split('_properties_')[0]
+        with open(path) as f:
+            for row in json.load(f):
+                brokers.append(broker)
+                prices.append(row.get('price', ''))
+                spaces.append(row.get('space_available', ''))
+    return brokers, prices, spaces
+
+
+def time_columns(prices, spaces, repeat, cold):
+    """Best-of-repeat seconds for one normalize_columns pass."""
+    best = None
+    for _ in range(repeat):
+        if cold:
+            pricing.parse_price.cache_clear()
+            pricing.parse_size.cache_clear()
+        started = time.perf_counter()
+        pricing.normalize_columns(prices, spaces)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark price normalization on the property files")
+    parser.add_argument('files', nargs='*', help="Property files (default: ./*_properties_*.json)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob('*_properties_*.json'))
+    if not paths:
+        parser.error("no *_properties_*.json files found")
+    brokers, prices, spaces = load_columns(paths)
+    rows = len(prices)
+
+    cold = time_columns(prices, spaces, args.repeat, cold=True)
+    warm = time_columns(prices, spaces, args.repeat, cold=False)
+    print(f"{rows} rows, {len(set(prices))} distinct prices, {len(set(spaces))} distinct sizes")
+    print(f"cold: {cold * 1000:.1f} ms ({rows / cold:,.0f} rows/s)   warm: {warm * 1000:.1f} ms ({rows / warm:,.0f} rows/s)")
+
+    results = pricing.normalize_columns(prices, spaces)
+    by_broker = {}
+    unparsed = Counter()
+    for broker, price, result in zip(brokers, prices, results):
+        by_broker.setdefault(broker, Counter())[result.status] += 1
+        if result.status in (pricing.UNRECOGNIZED, pricing.IMPLAUSIBLE):
+            unparsed[price] += 1
+        if result.status == 'quoted' and result.annual_psf is None:
+            by_broker[broker]['no_size'] += 1
+
+    columns = ('quoted', 'no_size') + STATUSES[1:]
+    print(f"\n{'broker':<18}{'rows':>7}" + ''.join(f"{column:>14}" for column in columns))
+    for broker in sorted(by_broker):
+        counts = by_broker[broker]
+        print(f"{broker:<18}{sum(counts[c] for c in STATUSES):>7}"
+              + ''.join(f"{counts[column]:>14}" for column in columns))
+
+    if unparsed:
+        print(f"\n{sum(unparsed.values())} prices were unrecognized or implausible:")
+        for price, count in unparsed.most_common(20):
+            print(f"  {count:>5}  {price!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
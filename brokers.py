@@ -0,0 +1,11 @@
+# Broker name -> crawler module. The broker name is the prefix of the crawler's
+# <broker>_properties_<timestamp>.json output and of its page cache index.
+BROKERS = {
+    "cbre": "crawl_cbre",
+    "cushmanwakefield": "crawl_cushman",
+    "jll": "crawl_jll_urls",
+    "landpark": "crawl_landpark",
+    "lee": "crawl_lee_urls",
+    "lincoln": "crawl_lincoln",
+    "trinity": "crawl_trinity",
+}
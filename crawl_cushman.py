@@ -1,16 +1,125 @@
 import asyncio
-import json
+import time
 import arrow
 from bs4 import BeautifulSoup
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher, CrawlerMonitor, DisplayMode
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl_engine import CrawlOptions
+from page_cache import PageCache
+from units import Property, Unit, new_run_id, save_units, to_epoch
 
-async def extract_property_urls():
+def parse_property(html, url, fetched_at=None, run_id=None):
+    """Parse a Cushman & Wakefield property detail page into unit rows."""
+    fetched_at = to_epoch(fetched_at)
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract property name and address
+    title_div = soup.find('div', {'class': 'updated-page-title'})
+    if title_div:
+        property_name = title_div.find('h1', {'class': 'updated-page-title-main'})
+        property_name = property_name.text.strip() if property_name else "N/A"
+
+        address = title_div.find('h5', {'class': 'updated-page-title-sub'})
+        address = address.text.strip() if address else "N/A"
+    else:
+        property_name = "N/A"
+        address = "N/A"
+
+    listing = Property.intern(property_name, address, url)
+    units = []
+
+    # Look for multiple availability containers
+    availability_containers = soup.find_all('div', {'class': 'availabilities-container-parent'})
+    if availability_containers:
+        for container in availability_containers:
+            # Extract floor/suite info
+            title_div = container.find('div', {'class': 'blue-color-title-div'})
+            if title_div:
+                floor = title_div.find('b', {'class': 'font-bold'})
+                floor = floor.text.strip() if floor else ""
+                suite = title_div.find('span', string=lambda x: x and 'Suite' in x)
+                suite = suite.text.strip() if suite else ""
+                floor_suite = f"{floor} {suite}".strip()
+            else:
+                floor_suite = "N/A"
+
+            # Extract space and price
+            desc_divs = container.find_all('div', {'class': 'availabilities-second-level-description'})
+            space_available = "Contact for Details"
+            price = "Contact for Details"
+
+            for div in desc_divs:
+                label = div.find('p', {'class': 'm-1'})
+                if not label:
+                    continue
+
+                value = div.find('b', {'class': 'bold-font'})
+                if not value:
+                    continue
+
+                label_text = label.text.strip()
+                value_text = value.text.strip()
+
+                if 'Available Space' in label_text:
+                    space_available = value_text
+                elif 'Rental Price' in label_text:
+                    price = value_text
+
+            unit = Unit(listing, floor_suite, space_available, price, fetched_at, run_id)
+            units.append(unit)
+
+    # If no availability containers found, try single space info
+    if not units:
+        # Extract details like price and space
+        details_div = soup.find('div', {'class': 'mix_propertyStatistics'})
+        price = "Contact for Details"
+        space_min = "N/A"
+        space_max = "N/A"
+        available_space = None
+
+        if details_div:
+            # Extract price and space
+            dt_elements = details_div.find_all('dt')
+            dd_elements = details_div.find_all('dd')
+
+            for dt, dd in zip(dt_elements, dd_elements):
+                dt_text = dt.text.strip()
+                dd_text = dd.text.strip()
+
+                if 'Rental Price' in dt_text:
+                    price = dd_text
+                elif 'Available Space' in dt_text:
+                    available_space = dd_text
+                elif 'Min Divisible' in dt_text:
+                    space_min = dd_text
+                elif 'Max Contiguous' in dt_text:
+                    space_max = dd_text
+
+        # Create space available text - prefer range if available, otherwise use single value
+        if space_min != "N/A" and space_max != "N/A":
+            space_available = f"{space_min} - {space_max}"
+        elif available_space:
+            space_available = available_space
+        else:
+            space_available = "Contact for Details"
+
+        unit = Unit(listing, "N/A", space_available, price, fetched_at, run_id)
+        units.append(unit)
+
+    return units
+
+
+async def extract_property_urls(options=None):
     start_time = arrow.now()
     
     def log_time(step_name):
         elapsed = arrow.now() - start_time
         print(f"\n[{step_name}] Time elapsed: {elapsed}")
     
+    run_id = new_run_id()
+    cache = PageCache(run_id=run_id)
+    options = options or CrawlOptions('cushmanwakefield')
+    metrics = options.metrics
+    
     browser_config = BrowserConfig(
         headless=True,
         verbose=True,
@@ -49,8 +158,9 @@ async def extract_property_urls():
     async with AsyncWebCrawler(config=browser_config) as crawler:
         try:
             print("\nStarting property URL extraction...")
+            metrics.stage('pagination')
             
-            session_id = "monte_cushmanwakefield"
+            session_id = options.session_id
             current_url = 'https://www.cushmanwakefield.com/en/united-states/properties/lease/lease-property-search#sort=%40propertylastupdateddate%20descending&f:PropertyType=[Office]&f:Country=[United%20States]'
             # Step 2: Extract URLs using BeautifulSoup
             print("Extracting property URLs...")
@@ -68,12 +178,14 @@ async def extract_property_urls():
                 remove_overlay_elements=True,
                 magic=True
             )
-            result1 = await crawler.arun(
-                url=current_url,
-                config=config_first,
-                session_id=session_id
-            )
+            with metrics.timer('pagination_page_seconds'):
+                result1 = await crawler.arun(
+                    url=current_url,
+                    config=config_first,
+                    session_id=session_id
+                )
             
+            await asyncio.to_thread(cache.put, 'cushmanwakefield', current_url, result1.html, kind='search')
             soup = BeautifulSoup(result1.html, 'html.parser')
             property_links = soup.find_all('a', href=lambda x: x and 'properties/for-lease/office' in x)
             current_page_urls = {f'{link["href"]}' for link in property_links}
@@ -81,7 +193,7 @@ async def extract_property_urls():
             print(f"Found {len(current_page_urls)} property URLs on page 1")
             
             page_num = 1
-            while True:
+            while options.more_pages(page_num):
                 # Store the current page URLs to compare with next page
                 last_page_urls = current_page_urls
                 
@@ -104,12 +216,14 @@ async def extract_property_urls():
                     override_navigator=True,
                     magic=True
                 )
-                result2 = await crawler.arun(
-                    url=f'https://www.cushmanwakefield.com/en/united-states/properties/lease/lease-property-search#first={page_num * 12}&sort=%40propertylastupdateddate%20ascending&f:PropertyType=[Office]&f:Country=[United%20States]',
-                    config=config_next,
-                    # session_id=session_id
-                )
+                with metrics.timer('pagination_page_seconds'):
+                    result2 = await crawler.arun(
+                        url=f'https://www.cushmanwakefield.com/en/united-states/properties/lease/lease-property-search#first={page_num * 12}&sort=%40propertylastupdateddate%20ascending&f:PropertyType=[Office]&f:Country=[United%20States]',
+                        config=config_next,
+                        # session_id=session_id
+                    )
                 
+                await asyncio.to_thread(cache.put, 'cushmanwakefield', result2.url, result2.html, kind='search')
                 soup = BeautifulSoup(result2.html, 'html.parser')
                 property_links = soup.find_all('a', href=lambda x: x and 'properties/for-lease/office' in x)
                 current_page_urls = {f'{link["href"]}' for link in property_links}
@@ -119,14 +233,16 @@ async def extract_property_urls():
                 print(f"Total unique URLs so far: {len(all_property_urls)}")
                 page_num += 1
             
-            # Save URLs to a JSON file
-            timestamp = arrow.now().format('YYYYMMDD_HHmmss')
-                        
             # Process all URLs using arun_many with memory adaptive dispatcher
             all_property_details = []
             urls_to_process = list(all_property_urls)
             
             log_time("URL Collection Complete")
+            if options.dry_run:
+                print(f"Dry run: {len(all_property_urls)} property URLs found, skipping detail pages")
+                metrics.finish()
+                return []
+            metrics.stage('detail_fetch')
             for link in all_property_urls:
                 print(link)
             # Create a run config for property details extraction with streaming enabled
@@ -136,151 +252,38 @@ async def extract_property_urls():
             )
             
             # Set up the memory adaptive dispatcher with more conservative memory settings
-            dispatcher = MemoryAdaptiveDispatcher(
-                memory_threshold_percent=60.0,  # Lower threshold to be more conservative
-                check_interval=0.5,  # Check more frequently
-                max_session_permit=25,  # Reduce concurrent sessions
-                monitor=CrawlerMonitor(
-                    display_mode=DisplayMode.DETAILED
-                )
-            )
+            dispatcher = options.dispatcher(max_session_permit=25)
             
             print("\nStarting streaming processing of URLs...")
             
             log_time("URL Collection Complete")
             
             # Process results as they stream in
+            metrics.enqueue(len(all_property_urls), dispatcher)
             stream = await crawler.arun_many(
                 urls=all_property_urls,
                 config=run_config,
                 dispatcher=dispatcher
             )
             async for result in stream:
+                metrics.record_fetch(result, dispatcher)
                 try:
-                    soup = BeautifulSoup(result.html, 'html.parser')
-                    
-                    # Extract property name and address
-                    title_div = soup.find('div', {'class': 'updated-page-title'})
-                    if title_div:
-                        property_name = title_div.find('h1', {'class': 'updated-page-title-main'})
-                        property_name = property_name.text.strip() if property_name else "N/A"
-                        
-                        address = title_div.find('h5', {'class': 'updated-page-title-sub'})
-                        address = address.text.strip() if address else "N/A"
-                    else:
-                        property_name = "N/A"
-                        address = "N/A"
-                    
-                    units = []
-                    
-                    # Look for multiple availability containers
-                    availability_containers = soup.find_all('div', {'class': 'availabilities-container-parent'})
-                    if availability_containers:
-                        for container in availability_containers:
-                            # Extract floor/suite info
-                            title_div = container.find('div', {'class': 'blue-color-title-div'})
-                            if title_div:
-                                floor = title_div.find('b', {'class': 'font-bold'})
-                                floor = floor.text.strip() if floor else ""
-                                suite = title_div.find('span', string=lambda x: x and 'Suite' in x)
-                                suite = suite.text.strip() if suite else ""
-                                floor_suite = f"{floor} {suite}".strip()
-                            else:
-                                floor_suite = "N/A"
-                            
-                            # Extract space and price
-                            desc_divs = container.find_all('div', {'class': 'availabilities-second-level-description'})
-                            space_available = "Contact for Details"
-                            price = "Contact for Details"
-                            
-                            for div in desc_divs:
-                                label = div.find('p', {'class': 'm-1'})
-                                if not label:
-                                    continue
-                                    
-                                value = div.find('b', {'class': 'bold-font'})
-                                if not value:
-                                    continue
-                                    
-                                label_text = label.text.strip()
-                                value_text = value.text.strip()
-                                
-                                if 'Available Space' in label_text:
-                                    space_available = value_text
-                                elif 'Rental Price' in label_text:
-                                    price = value_text
-                            
-                            unit = {
-                                "property_name": property_name,
-                                "address": address,
-                                "listing_url": result.url,
-                                "floor_suite": floor_suite,
-                                "space_available": space_available,
-                                "price": price,
-                                "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                            }
-                            units.append(unit)
-                    
-                    # If no availability containers found, try single space info
-                    if not units:
-                        # Extract details like price and space
-                        details_div = soup.find('div', {'class': 'mix_propertyStatistics'})
-                        price = "Contact for Details"
-                        space_min = "N/A"
-                        space_max = "N/A"
-                        available_space = None
-                        
-                        if details_div:
-                            # Extract price and space
-                            dt_elements = details_div.find_all('dt')
-                            dd_elements = details_div.find_all('dd')
-                            
-                            for dt, dd in zip(dt_elements, dd_elements):
-                                dt_text = dt.text.strip()
-                                dd_text = dd.text.strip()
-                                
-                                if 'Rental Price' in dt_text:
-                                    price = dd_text
-                                elif 'Available Space' in dt_text:
-                                    available_space = dd_text
-                                elif 'Min Divisible' in dt_text:
-                                    space_min = dd_text
-                                elif 'Max Contiguous' in dt_text:
-                                    space_max = dd_text
-                        
-                        # Create space available text - prefer range if available, otherwise use single value
-                        if space_min != "N/A" and space_max != "N/A":
-                            space_available = f"{space_min} - {space_max}"
-                        elif available_space:
-                            space_available = available_space
-                        else:
-                            space_available = "Contact for Details"
-                        
-                        unit = {
-                            "property_name": property_name,
-                            "address": address,
-                            "listing_url": result.url,
-                            "floor_suite": "N/A",
-                            "space_available": space_available,
-                            "price": price,
-                            "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                        }
-                        units.append(unit)
-                    
+                    fetched_at = time.time()
+                    await asyncio.to_thread(cache.put, 'cushmanwakefield', result.url, result.html, fetched_at=fetched_at)
+                    with metrics.cpu_timer('parse_cpu_seconds'):
+                        units = parse_property(result.html, result.url, fetched_at, run_id)
+                    metrics.inc('units_total', len(units))
                     all_property_details.extend(units)
-                    print(f"Processed: {property_name} - Found {len(units)} units")
+                    print(f"Processed: {units[0].property.property_name} - Found {len(units)} units")
                     
                 except Exception as e:
                     print(f"Error processing property: {str(e)}")
                     import traceback
                     print(traceback.format_exc())
             
+            metrics.stage('save')
             # Save all property details to a JSON file
-            timestamp = arrow.now().format('YYYYMMDD_HHmmss')
-            output_file = f"cushmanwakefield_properties_{timestamp}.json"
-            
-            with open(output_file, 'w') as f:
-                json.dump(all_property_details, f, indent=2)
+            output_file = save_units('cushmanwakefield', all_property_details)
             
             print(f"\nExtracted {len(all_property_details)} total units from {len(urls_to_process)} properties")
             print(f"Results saved to {output_file}")
@@ -297,6 +300,8 @@ async def extract_property_urls():
                 
         except Exception as e:
             print(f"Error during extraction: {e}")
+        finally:
+            metrics.finish()
 
 if __name__ == "__main__":
     # Run the full extraction
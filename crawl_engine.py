@@ -0,0 +1,43 @@
+from crawl4ai import MemoryAdaptiveDispatcher, CrawlerMonitor, DisplayMode
+
+from crawl_metrics import CrawlMetrics
+
+MEMORY_THRESHOLD = 60.0
+
+
+class CrawlOptions:
+    """Settings of one broker crawl, shared by every crawler.
+
+    The defaults reproduce what the crawl scripts used to hard-code, so
+    `python crawl_lee_urls.py` behaves as before; re_crawl.py overrides them
+    from the command line. Each crawl gets its own browser session id and
+    its own CrawlMetrics, which re_crawl.py reads back for stage timings.
+    """
+
+    def __init__(self, broker, max_pages=None, concurrency=None, memory_threshold=MEMORY_THRESHOLD,
+                 session_id=None, dry_run=False):
+        self.broker = broker
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.memory_threshold = memory_threshold
+        self.session_id = session_id or f"{broker}_crawl"
+        self.dry_run = dry_run
+        self.metrics = CrawlMetrics(broker)
+
+    def more_pages(self, pages_fetched):
+        """Whether pagination may load another search results page."""
+        if self.max_pages is not None and pages_fetched >= self.max_pages:
+            print(f"Stopping pagination after {pages_fetched} pages (max_pages={self.max_pages})")
+            return False
+        return True
+
+    def dispatcher(self, max_session_permit):
+        """The crawler's arun_many dispatcher; --concurrency replaces its own session limit."""
+        return MemoryAdaptiveDispatcher(
+            memory_threshold_percent=self.memory_threshold,
+            check_interval=0.5,
+            max_session_permit=self.concurrency or max_session_permit,
+            monitor=CrawlerMonitor(
+                display_mode=DisplayMode.DETAILED
+            )
+        )
@@ -1,16 +1,119 @@
 import asyncio
-import json
+import time
 import arrow
 from bs4 import BeautifulSoup
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher, CrawlerMonitor, DisplayMode
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl_engine import CrawlOptions
+from page_cache import PageCache
+from units import Property, Unit, new_run_id, save_units, to_epoch
 
-async def extract_property_urls():
+def parse_property(html, url, fetched_at=None, run_id=None):
+    """Parse a JLL property detail page into unit rows."""
+    fetched_at = to_epoch(fetched_at)
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract property name and price from header
+    header_div = soup.select_one('div.mb-6.flex.flex-col')
+
+    name_elem = header_div.select_one('h1.MuiTypography-root.jss6') if header_div else None
+    property_name = name_elem.text.strip() if name_elem else ""
+
+    # Extract price from header (more reliable location)
+    price = "Contact for pricing"
+    price_elem = header_div.select_one('div.flex.items-center.justify-end.text-bronze p.text-lg') if header_div else None
+    if price_elem:
+        price = price_elem.text.strip()
+
+    # Extract address components
+    address_div = soup.select_one('div.flex-col.text-doveGrey')
+    street_address = ""
+    city_state = ""
+    if address_div:
+        address_parts = [p.text.strip() for p in address_div.find_all('p', class_='text-lg')]
+        if len(address_parts) >= 1:
+            street_address = address_parts[0]
+        if len(address_parts) >= 2:
+            city_state = address_parts[1]
+
+    address = f"{street_address}, {city_state}" if street_address else city_state
+
+    # First get the top-level space info
+    space_text = None
+    space_li = soup.select_one('ul.flex.flex-wrap li span.text-lg.text-neutral-700 span')
+    if space_li:
+        space_text = space_li.text.strip()
+
+    listing = Property.intern(property_name, address, url)
+    units = []  # Initialize units list at the top
+    availability_div = soup.find('div', id='availability')
+    if availability_div:
+
+        # Try to find rows through multiple paths
+        rows = []
+
+        # Find all action arrow cells with the specific SVG pattern
+        action_cells = availability_div.find_all('div', {'class': 'action-arrow'})
+        if action_cells:
+            for cell in action_cells:
+                # Check for SVG with specific path pattern
+                svg = cell.find('svg', {'class': 'MuiSvgIcon-root MuiSvgIcon-colorPrimary'})
+                if svg:
+                    # Look for the path with the specific coordinates
+                    paths = svg.find_all('path')
+                    for path in paths:
+                        d_attr = path.get('d', '')
+                        if any(coord in d_attr for coord in ['14.9848 6.84933', 'M14.9848 6.84933']):
+                            parent_row = cell.find_parent('div', {'role': 'row', 'class': lambda x: x and 'MuiDataGrid-row' in x})
+                            if parent_row:
+                                if parent_row not in rows:
+                                    rows.append(parent_row)
+
+
+        if rows:
+            for row in rows:
+                # Find floor cell - try both class and data-field attributes
+                floor_cell = row.find('div', {'class': 'floor-name'}) or row.find('div', {'data-field': 'floorName'})
+                floor_text = None
+                if floor_cell:
+                    # First try the span inside group div
+                    span = floor_cell.select_one('div.max-w-full.overflow-hidden span')
+                    if span:
+                        floor_text = span.text.strip()
+                    else:
+                        # Fallback to any text content in the cell
+                        floor_text = floor_cell.get_text(strip=True)
+
+                # Find space cell using data-field="size"
+                space_cell = row.find('div', {'data-field': 'size'})
+                row_space_text = space_cell.get_text(strip=True) if space_cell else None
+
+                if floor_text and row_space_text:
+                    unit = Unit(listing, floor_text, row_space_text, price, fetched_at, run_id)
+                    units.append(unit)
+        else:
+            # Create a single entry with N/A for floor_suite
+            unit = Unit(listing, "N/A", space_text or "Contact for Details", price, fetched_at, run_id)
+            units.append(unit)
+    else:
+        # Create a single entry with N/A for floor_suite
+        unit = Unit(listing, "N/A", space_text or "Contact for Details", price, fetched_at, run_id)
+        units.append(unit)
+
+    return units
+
+
+async def extract_property_urls(options=None):
     start_time = arrow.now()
     
     def log_time(step_name):
         elapsed = arrow.now() - start_time
         print(f"\n[{step_name}] Time elapsed: {elapsed}")
     
+    run_id = new_run_id()
+    cache = PageCache(run_id=run_id)
+    options = options or CrawlOptions('jll')
+    metrics = options.metrics
+    
     browser_config = BrowserConfig(
         headless=True,
         verbose=True,
@@ -50,8 +153,9 @@ async def extract_property_urls():
     async with AsyncWebCrawler(config=browser_config) as crawler:
         try:
             print("\nStarting property URL extraction...")
+            metrics.stage('pagination')
             
-            session_id = "monte"
+            session_id = options.session_id
             current_url = 'https://property.jll.com/search?tenureType=rent&propertyTypes=office&orderBy=desc&sortBy=dateModified'
             # Step 2: Extract URLs using BeautifulSoup
             print("Extracting property URLs...")
@@ -68,12 +172,14 @@ async def extract_property_urls():
                 override_navigator=True,
                 magic=True
             )
-            result1 = await crawler.arun(
-                url=current_url,
-                config=config_first,
-                session_id=session_id
-            )
+            with metrics.timer('pagination_page_seconds'):
+                result1 = await crawler.arun(
+                    url=current_url,
+                    config=config_first,
+                    session_id=session_id
+                )
             
+            await asyncio.to_thread(cache.put, 'jll', current_url, result1.html, kind='search')
             soup = BeautifulSoup(result1.html, 'html.parser')
             property_links = soup.find_all('a', href=lambda x: x and 'listings/' in x)
             current_page_urls = {f'https://property.jll.com{link["href"]}' for link in property_links}
@@ -81,7 +187,7 @@ async def extract_property_urls():
             print(f"Found {len(current_page_urls)} property URLs on page 1")
             
             page_num = 2
-            while True:
+            while options.more_pages(page_num - 1):
                 # Store the current page URLs to compare with next page
                 last_page_urls = current_page_urls
                 
@@ -98,12 +204,14 @@ async def extract_property_urls():
                     override_navigator=True,
                     magic=True
                 )
-                result2 = await crawler.arun(
-                    url=current_url,
-                    config=config_next,
-                    session_id=session_id
-                )
+                with metrics.timer('pagination_page_seconds'):
+                    result2 = await crawler.arun(
+                        url=current_url,
+                        config=config_next,
+                        session_id=session_id
+                    )
                 
+                await asyncio.to_thread(cache.put, 'jll', current_url, result2.html, kind='search')
                 soup = BeautifulSoup(result2.html, 'html.parser')
                 property_links = soup.find_all('a', href=lambda x: x and 'listings/' in x)
                 current_page_urls = {f'https://property.jll.com{link["href"]}' for link in property_links}
@@ -121,14 +229,16 @@ async def extract_property_urls():
                     print("Next button not found - reached end of pagination")
                     break
             
-            # Save URLs to a JSON file
-            timestamp = arrow.now().format('YYYYMMDD_HHmmss')
-                        
             # Process all URLs using arun_many with memory adaptive dispatcher
             all_property_details = []
             urls_to_process = list(all_property_urls)
             
             log_time("URL Collection Complete")
+            if options.dry_run:
+                print(f"Dry run: {len(all_property_urls)} property URLs found, skipping detail pages")
+                metrics.finish()
+                return []
+            metrics.stage('detail_fetch')
             for link in all_property_urls:
                 print(link)
             
@@ -144,137 +254,26 @@ async def extract_property_urls():
             print(f"Processing {len(all_property_urls)} URLs...")
             
             # Set up the memory adaptive dispatcher with more conservative memory settings
-            dispatcher = MemoryAdaptiveDispatcher(
-                memory_threshold_percent=60.0,  # Lower threshold to be more conservative
-                check_interval=0.5,  # Check more frequently
-                max_session_permit=10,  # Reduce concurrent sessions
-                monitor=CrawlerMonitor(
-                    display_mode=DisplayMode.DETAILED
-                )
-            )
+            dispatcher = options.dispatcher(max_session_permit=10)
             
             # Process results as they stream in
+            metrics.enqueue(len(all_property_urls), dispatcher)
             stream = await crawler.arun_many(
                 urls=all_property_urls,
                 config=run_config,
                 dispatcher=dispatcher
             )
             async for result in stream:
+                metrics.record_fetch(result, dispatcher)
                 if result.success and result.html:
-                    soup = BeautifulSoup(result.html, 'html.parser')
+                    fetched_at = time.time()
+                    await asyncio.to_thread(cache.put, 'jll', result.url, result.html, fetched_at=fetched_at)
                     print(f"\nProcessing {result.url}")
-                    
-                    try:
-                        # Extract property name and price from header
-                        header_div = soup.select_one('div.mb-6.flex.flex-col')
-                        
-                        name_elem = header_div.select_one('h1.MuiTypography-root.jss6') if header_div else None
-                        property_name = name_elem.text.strip() if name_elem else ""
-                        
-                        # Extract price from header (more reliable location)
-                        price = "Contact for pricing"
-                        price_elem = header_div.select_one('div.flex.items-center.justify-end.text-bronze p.text-lg') if header_div else None
-                        if price_elem:
-                            price = price_elem.text.strip()
-                        
-                        # Extract address components
-                        address_div = soup.select_one('div.flex-col.text-doveGrey')
-                        street_address = ""
-                        city_state = ""
-                        if address_div:
-                            address_parts = [p.text.strip() for p in address_div.find_all('p', class_='text-lg')]
-                            if len(address_parts) >= 1:
-                                street_address = address_parts[0]
-                            if len(address_parts) >= 2:
-                                city_state = address_parts[1]
-                        
-                        address = f"{street_address}, {city_state}" if street_address else city_state
-                        
-                        # First get the top-level space info
-                        space_text = None
-                        space_li = soup.select_one('ul.flex.flex-wrap li span.text-lg.text-neutral-700 span')
-                        if space_li:
-                            space_text = space_li.text.strip()
 
-                        units = []  # Initialize units list at the top
-                        availability_div = soup.find('div', id='availability')
-                        if availability_div:
-                            
-                            # Try to find rows through multiple paths
-                            rows = []
-                            
-                            # Find all action arrow cells with the specific SVG pattern
-                            action_cells = availability_div.find_all('div', {'class': 'action-arrow'})
-                            if action_cells:
-                                for cell in action_cells:
-                                    # Check for SVG with specific path pattern
-                                    svg = cell.find('svg', {'class': 'MuiSvgIcon-root MuiSvgIcon-colorPrimary'})
-                                    if svg:
-                                        # Look for the path with the specific coordinates
-                                        paths = svg.find_all('path')
-                                        for path in paths:
-                                            d_attr = path.get('d', '')
-                                            if any(coord in d_attr for coord in ['14.9848 6.84933', 'M14.9848 6.84933']):
-                                                parent_row = cell.find_parent('div', {'role': 'row', 'class': lambda x: x and 'MuiDataGrid-row' in x})
-                                                if parent_row:
-                                                    if parent_row not in rows:
-                                                        rows.append(parent_row)
-                                                    
-                            
-                            if rows:
-                                for row in rows:
-                                    # Find floor cell - try both class and data-field attributes
-                                    floor_cell = row.find('div', {'class': 'floor-name'}) or row.find('div', {'data-field': 'floorName'})
-                                    floor_text = None
-                                    if floor_cell:
-                                        # First try the span inside group div
-                                        span = floor_cell.select_one('div.max-w-full.overflow-hidden span')
-                                        if span:
-                                            floor_text = span.text.strip()
-                                        else:
-                                            # Fallback to any text content in the cell
-                                            floor_text = floor_cell.get_text(strip=True)
-                                    
-                                    # Find space cell using data-field="size"
-                                    space_cell = row.find('div', {'data-field': 'size'})
-                                    row_space_text = space_cell.get_text(strip=True) if space_cell else None
-                                    
-                                    if floor_text and row_space_text:
-                                        unit = {
-                                            "property_name": property_name,
-                                            "address": address,
-                                            "listing_url": result.url,
-                                            "floor_suite": floor_text,
-                                            "space_available": row_space_text,
-                                            "price": price,
-                                            "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                                        }
-                                        units.append(unit)
-                            else:
-                                # Create a single entry with N/A for floor_suite
-                                unit = {
-                                    "property_name": property_name,
-                                    "address": address,
-                                    "listing_url": result.url,
-                                    "floor_suite": "N/A",
-                                    "space_available": space_text or "Contact for Details",
-                                    "price": price,
-                                    "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                                }
-                                units.append(unit)
-                        else:
-                            # Create a single entry with N/A for floor_suite
-                            unit = {
-                                "property_name": property_name,
-                                "address": address,
-                                "listing_url": result.url,
-                                "floor_suite": "N/A",
-                                "space_available": space_text or "Contact for Details",
-                                "price": price,
-                                "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                            }
-                            units.append(unit)
-                        
+                    try:
+                        with metrics.cpu_timer('parse_cpu_seconds'):
+                            units = parse_property(result.html, result.url, fetched_at, run_id)
+                        metrics.inc('units_total', len(units))
                         # Add all extracted units to the main list
                         if units:
                             print(f"Successfully extracted {len(units)} units")
@@ -288,12 +287,9 @@ async def extract_property_urls():
                 else:
                     print(f"Failed to process {result.url}: {result.error_message if hasattr(result, 'error_message') else 'Unknown error'}")
             
+            metrics.stage('save')
             # Save all property details to a JSON file
-            timestamp = arrow.now().format('YYYYMMDD_HHmmss')
-            output_file = f"jll_properties_{timestamp}.json"
-            
-            with open(output_file, 'w') as f:
-                json.dump(all_property_details, f, indent=2)
+            output_file = save_units('jll', all_property_details)
             
             print(f"\nExtracted {len(all_property_details)} total units from {len(urls_to_process)} properties")
             print(f"Results saved to {output_file}")
@@ -310,6 +306,8 @@ async def extract_property_urls():
                 
         except Exception as e:
             print(f"Error during extraction: {e}")
+        finally:
+            metrics.finish()
 
 if __name__ == "__main__":
     # Run the full extraction
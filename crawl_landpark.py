@@ -1,16 +1,74 @@
 import asyncio
-import json
+import time
 import arrow
 from bs4 import BeautifulSoup
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher, CrawlerMonitor, DisplayMode
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl_engine import CrawlOptions
+from page_cache import PageCache
+from units import Property, Unit, new_run_id, save_units, to_epoch
 
-async def extract_property_urls():
+def parse_property(html, url, fetched_at=None, run_id=None):
+    """Parse a Landpark property page into unit rows.
+
+    Landpark details are served from an iframe, so url is the original
+    listing URL the iframe was found on, not the iframe's own URL.
+    """
+    fetched_at = to_epoch(fetched_at)
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract property name and address from hero__text
+    hero_div = soup.select_one('div.hero__text')
+
+    name_elem = hero_div.select_one('h1.hero__title') if hero_div else None
+    property_name = name_elem.text.strip() if name_elem else ""
+
+    address_elem = hero_div.select_one('h2.hero__sub-title') if hero_div else None
+    address = address_elem.text.strip() if address_elem else ""
+
+    # If no property name is found, use the address as the name
+    if not property_name and address:
+        property_name = address
+
+    listing = Property.intern(property_name, address, url)
+    units = []
+
+    # Find all availability cards
+    availability_cards = soup.select('div.availability-card-v2')
+
+    for card in availability_cards:
+        unit_name_elem = card.select_one('div.availability-card-name h3')
+        unit_name = unit_name_elem.text.strip() if unit_name_elem else "N/A"
+
+        rent_elem = card.select_one('div.availability-card-rent h3')
+        price = rent_elem.text.strip() if rent_elem else "Contact for pricing"
+
+        # Find space size
+        space_elem = card.select_one('div.availability-card-info-item:has(span:contains("Total Size")) p.availability-card-info-item-value')
+        space_available = space_elem.text.strip() if space_elem else "Contact for Details"
+
+        unit = Unit(listing, unit_name, space_available, price, fetched_at, run_id)
+        units.append(unit)
+
+    if not units:
+        # Create a single entry with N/A for floor_suite if no availability cards found
+        unit = Unit(listing, "N/A", "Contact for Details", "Contact for pricing", fetched_at, run_id)
+        units.append(unit)
+
+    return units
+
+
+async def extract_property_urls(options=None):
     start_time = arrow.now()
     
     def log_time(step_name):
         elapsed = arrow.now() - start_time
         print(f"\n[{step_name}] Time elapsed: {elapsed}")
     
+    run_id = new_run_id()
+    cache = PageCache(run_id=run_id)
+    options = options or CrawlOptions('landpark')
+    metrics = options.metrics
+    
     browser_config = BrowserConfig(
         headless=False,
         verbose=True,
@@ -79,8 +137,9 @@ async def extract_property_urls():
     async with AsyncWebCrawler(config=browser_config) as crawler:
         try:
             print("\nStarting property URL extraction...")
+            metrics.stage('pagination')
             
-            session_id = "monte"
+            session_id = options.session_id
             current_url = 'https://properties.landparkco.com/'
 
 
@@ -99,12 +158,14 @@ async def extract_property_urls():
                 override_navigator=True,
                 magic=True
             )
-            result1 = await crawler.arun(
-                url=current_url,
-                config=config_first,
-                session_id=session_id
-            )
+            with metrics.timer('pagination_page_seconds'):
+                result1 = await crawler.arun(
+                    url=current_url,
+                    config=config_first,
+                    session_id=session_id
+                )
             
+            await asyncio.to_thread(cache.put, 'landpark', current_url, result1.html, kind='search')
             soup = BeautifulSoup(result1.html, 'html.parser')
             property_links = soup.find_all('a', href=lambda x: x and '/properties/' in x)
             current_page_urls = {f'{link["href"]}' for link in property_links}
@@ -112,9 +173,6 @@ async def extract_property_urls():
             print(f"Found {len(current_page_urls)} property URLs on page 1")
             
            
-            # Save URLs to a JSON file
-            timestamp = arrow.now().format('YYYYMMDD_HHmmss')
-            
             # Now extract iframes from each URL
             print("\nExtracting iframes from each property URL...")
             
@@ -123,6 +181,11 @@ async def extract_property_urls():
             urls_to_process = list(all_property_urls)
             
             log_time("URL Collection Complete")
+            if options.dry_run:
+                print(f"Dry run: {len(all_property_urls)} property URLs found, skipping detail pages")
+                metrics.finish()
+                return []
+            metrics.stage('iframe_resolution')
             
             # Get all iframe URLs in batches
             print("\nGetting iframe URLs...")
@@ -136,19 +199,13 @@ async def extract_property_urls():
             )
             
             # Set up dispatcher for iframe extraction with more conservative settings
-            iframe_dispatcher = MemoryAdaptiveDispatcher(
-                memory_threshold_percent=60.0,  # Lower threshold
-                check_interval=0.5,  # Check more frequently
-                max_session_permit=10,  # Reduce concurrent sessions
-                monitor=CrawlerMonitor(
-                    display_mode=DisplayMode.DETAILED
-                )
-            )
+            iframe_dispatcher = options.dispatcher(max_session_permit=10)
             
             print("\nStarting streaming processing of URLs for iframe extraction...")
             print(f"Processing {len(urls_to_process)} URLs...")
             
             # Get iframes using streaming
+            metrics.enqueue(len(urls_to_process), iframe_dispatcher)
             iframe_stream = await crawler.arun_many(
                 urls=urls_to_process,
                 config=iframe_config,
@@ -159,7 +216,9 @@ async def extract_property_urls():
             iframe_urls = []
             url_mapping = {}  # Map iframe URLs to original URLs
             async for result in iframe_stream:
+                metrics.record_fetch(result, iframe_dispatcher, 'iframe_fetch_seconds')
                 if result.success and result.html:
+                    await asyncio.to_thread(cache.put, 'landpark', result.url, result.html, kind='iframe')
                     soup = BeautifulSoup(result.html, 'html.parser')
                     iframe = soup.select_one('#iframe')
                     if iframe and iframe.get('src'):
@@ -188,93 +247,41 @@ async def extract_property_urls():
             print(f"Processing {len(all_property_urls)} URLs...")
             
             # Set up the memory adaptive dispatcher with more conservative memory settings
-            dispatcher = MemoryAdaptiveDispatcher(
-                memory_threshold_percent=60.0,  # Lower threshold to be more conservative
-                check_interval=0.5,  # Check more frequently
-                max_session_permit=10,  # Reduce concurrent sessions
-                monitor=CrawlerMonitor(
-                    display_mode=DisplayMode.DETAILED
-                )
-            )
+            dispatcher = options.dispatcher(max_session_permit=10)
             
             # Process results as they stream in
+            metrics.enqueue(len(iframe_urls), dispatcher)
             stream = await crawler.arun_many(
                 urls=iframe_urls,
                 config=run_config,
                 dispatcher=dispatcher
             )
             async for result in stream:
+                metrics.record_fetch(result, dispatcher)
                 if result.success and result.html:
-                    soup = BeautifulSoup(result.html, 'html.parser')
                     original_url = url_mapping.get(result.url, result.url)  # Get original URL from mapping
+                    fetched_at = time.time()
+                    await asyncio.to_thread(cache.put, 'landpark', original_url, result.html, fetched_at=fetched_at)
                     print(f"\nProcessing {original_url}")
                     
                     try:
-                        # Extract property name and address from hero__text
-                        hero_div = soup.select_one('div.hero__text')
-                        
-                        name_elem = hero_div.select_one('h1.hero__title') if hero_div else None
-                        property_name = name_elem.text.strip() if name_elem else ""
-                        
-                        address_elem = hero_div.select_one('h2.hero__sub-title') if hero_div else None
-                        address = address_elem.text.strip() if address_elem else ""
-                        
-                        # If no property name is found, use the address as the name
-                        if not property_name and address:
-                            property_name = address
-
-                        # Find all availability cards
-                        availability_cards = soup.select('div.availability-card-v2')
-                        
-                        if availability_cards:
-                            for card in availability_cards:
-                                unit_name_elem = card.select_one('div.availability-card-name h3')
-                                unit_name = unit_name_elem.text.strip() if unit_name_elem else "N/A"
-                                
-                                rent_elem = card.select_one('div.availability-card-rent h3')
-                                price = rent_elem.text.strip() if rent_elem else "Contact for pricing"
-                                
-                                # Find space size
-                                space_elem = card.select_one('div.availability-card-info-item:has(span:contains("Total Size")) p.availability-card-info-item-value')
-                                space_available = space_elem.text.strip() if space_elem else "Contact for Details"
-                                
-                                unit = {
-                                    "property_name": property_name,
-                                    "address": address,
-                                    "listing_url": original_url,  # Use the original URL here
-                                    "floor_suite": unit_name,
-                                    "space_available": space_available,
-                                    "price": price,
-                                    "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                                }
-                                all_property_details.append(unit)
-                            
-                            print(f"Successfully extracted {len(availability_cards)} units")
-                        else:
-                            # Create a single entry with N/A for floor_suite if no availability cards found
-                            unit = {
-                                "property_name": property_name,
-                                "address": address,
-                                "listing_url": original_url,  # Use the original URL here
-                                "floor_suite": "N/A",
-                                "space_available": "Contact for Details",
-                                "price": "Contact for pricing",
-                                "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                            }
-                            all_property_details.append(unit)
+                        with metrics.cpu_timer('parse_cpu_seconds'):
+                            units = parse_property(result.html, original_url, fetched_at, run_id)
+                        metrics.inc('units_total', len(units))
+                        all_property_details.extend(units)
+                        if units[0].floor_suite == "N/A":
                             print("WARNING: No units extracted from this property")
+                        else:
+                            print(f"Successfully extracted {len(units)} units")
                             
                     except Exception as e:
                         print(f"Error processing {result.url}: {str(e)}")
                 else:
                     print(f"Failed to process {result.url}: {result.error_message if hasattr(result, 'error_message') else 'Unknown error'}")
             
+            metrics.stage('save')
             # Save all property details to a JSON file
-            timestamp = arrow.now().format('YYYYMMDD_HHmmss')
-            output_file = f"landpark_properties_{timestamp}.json"
-            
-            with open(output_file, 'w') as f:
-                json.dump(all_property_details, f, indent=2)
+            output_file = save_units('landpark', all_property_details)
             
             print(f"\nExtracted {len(all_property_details)} total units from {len(urls_to_process)} properties")
             print(f"Results saved to {output_file}")
@@ -291,6 +298,8 @@ async def extract_property_urls():
                 
         except Exception as e:
             print(f"Error during extraction: {e}")
+        finally:
+            metrics.finish()
 
 if __name__ == "__main__":
     # Run the full extraction
@@ -0,0 +1,353 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+
+METRICS_DIR = os.environ.get('CRAWL_METRICS_DIR', 'metrics')
+
+# Upper bounds (seconds) of the histogram buckets. Page loads take seconds,
+# parsing a page takes milliseconds, so they get different ladders.
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+CPU_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HISTOGRAM_BUCKETS = {
+    'pagination_page_seconds': LATENCY_BUCKETS,
+    'iframe_fetch_seconds': LATENCY_BUCKETS,
+    'detail_fetch_seconds': LATENCY_BUCKETS,
+    'parse_cpu_seconds': CPU_BUCKETS,
+}
+
+HELP = {
+    'pagination_page_seconds': "Wall time to load one search results page",
+    'iframe_fetch_seconds': "Wall time to fetch a listing page and resolve its iframe",
+    'detail_fetch_seconds': "Wall time to fetch one property detail page",
+    'parse_cpu_seconds': "CPU time spent parsing one detail page",
+    'stage_seconds': "Wall time spent in each crawl stage",
+    'pages_fetched_total': "Pages fetched successfully",
+    'pages_failed_total': "Page fetches that failed",
+    'queued_total': "URLs handed to the dispatcher",
+    'units_total': "Units extracted",
+    'units_per_second': "Units extracted per second of crawl wall time",
+    'queue_depth': "URLs handed to the dispatcher and not yet returned",
+    'dispatcher_permits_in_use': "Browser sessions currently held by the dispatcher",
+    'dispatcher_permits_max': "Browser session limit of the dispatcher",
+    'memory_peak_bytes': "Peak RSS of the crawler and its browser processes",
+    'elapsed_seconds': "Wall time since the crawl started",
+}
+
+
+def render_families(families):
+    """Text exposition of (name, type, sample lines) families.
+
+    Families of the same name (the same metric of several brokers) are merged,
+    so each gets its HELP and TYPE once, followed by all of its samples, as
+    the format requires.
+    """
+    merged = {}
+    for name, kind, samples in families:
+        merged.setdefault(name, (kind, []))[1].extend(samples)
+    lines = []
+    for name, (kind, samples) in merged.items():
+        lines.append(f"# HELP crawl_{name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE crawl_{name} {kind}")
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class CrawlMetrics:
+    """Per-broker crawl metrics exported in the Prometheus text format.
+
+    Metrics are written to metrics/<broker>.prom (node_exporter textfile
+    collector layout) and, when CRAWL_METRICS_PORT is set, served live at
+    http://localhost:<port>/metrics (by the process's MetricsServer) while
+    the crawl runs.
+    """
+
+    def __init__(self, broker, metrics_dir=METRICS_DIR, write_interval=10.0):
+        self.broker = broker
+        self.metrics_dir = metrics_dir
+        self.write_interval = write_interval
+        self.started = time.monotonic()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.stage_seconds = {}
+        self.current_stage = None
+        self.stage_started = None
+        self.last_write = 0.0
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.server = None
+        self.owns_server = False
+        self.finished = False
+
+        port = os.environ.get('CRAWL_METRICS_PORT')
+        if port:
+            self.server, self.owns_server = start_server(int(port))
+            self.server.register(self)
+
+    # -- recording -------------------------------------------------------
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        """Observe the wall time of the block in histogram `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def cpu_timer(self, name):
+        """Observe the CPU time of the block (this thread only) in histogram `name`."""
+        started = time.thread_time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.thread_time() - started)
+
+    def stage(self, name):
+        """Close the current stage and start timing `name`."""
+        now = time.monotonic()
+        with self.lock:
+            if self.current_stage is not None:
+                self.stage_seconds[self.current_stage] = self.stage_seconds.get(self.current_stage, 0.0) + now - self.stage_started
+            self.current_stage = name
+            self.stage_started = now
+        self.sample_memory()
+        self.write()
+
+    def enqueue(self, count, dispatcher=None):
+        """Record `count` URLs handed to arun_many."""
+        self.inc('queued_total', count)
+        self.set_gauge('queue_depth', self.gauges.get('queue_depth', 0) + count)
+        if dispatcher is not None:
+            self.set_gauge('dispatcher_permits_max', getattr(dispatcher, 'max_session_permit', 0))
+
+    def record_fetch(self, result, dispatcher=None, histogram='detail_fetch_seconds'):
+        """Record one streamed arun_many result."""
+        self.inc('pages_fetched_total' if result.success else 'pages_failed_total')
+        self.set_gauge('queue_depth', max(0, self.gauges.get('queue_depth', 0) - 1))
+
+        dispatch = getattr(result, 'dispatch_result', None)
+        if dispatch is not None and dispatch.start_time and dispatch.end_time:
+            elapsed = dispatch.end_time - dispatch.start_time
+            if isinstance(elapsed, (int, float)):
+                self.observe(histogram, float(elapsed))
+            else:
+                self.observe(histogram, elapsed.total_seconds())
+
+        if dispatcher is not None:
+            self.set_gauge('dispatcher_permits_in_use', getattr(dispatcher, 'concurrent_sessions', 0))
+
+        self.sample_memory()
+        if time.monotonic() - self.last_write >= self.write_interval:
+            self.write()
+
+    def sample_memory(self):
+        """Track the peak RSS of this process plus its browser children."""
+        try:
+            rss = self.process.memory_info().rss
+            for child in self.process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            return
+        with self.lock:
+            self.gauges['memory_peak_bytes'] = max(self.gauges.get('memory_peak_bytes', 0), rss)
+
+    def stage_times(self):
+        """{stage: seconds} so far, including the stage still running."""
+        with self.lock:
+            stage_seconds = dict(self.stage_seconds)
+            if self.current_stage is not None:
+                stage_seconds[self.current_stage] = stage_seconds.get(self.current_stage, 0.0) + time.monotonic() - self.stage_started
+        return stage_seconds
+
+    def finish(self):
+        """Close the last stage, write the final metrics file and stop serving.
+
+        Crawlers call this from a finally block, so a failed crawl still
+        leaves its metrics behind; calling it again does nothing.
+        """
+        if self.finished:
+            return None
+        self.finished = True
+        self.stage(None)
+        path = self.write()
+        print(f"Metrics written to {path}")
+        if self.server is not None:
+            self.server.unregister(self)
+            # A standalone crawl started the server and stops it; under
+            # re_crawl.py it belongs to the run and outlives this broker
+            if self.owns_server:
+                stop_server()
+            self.server = None
+        return path
+
+    # -- export ----------------------------------------------------------
+
+    def families(self):
+        """[(name, type, sample lines)] of this crawl's metric families."""
+        label = f'broker="{self.broker}"'
+        elapsed = time.monotonic() - self.started
+        families = []
+
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {name: (h.bounds, list(h.counts), h.total, h.count) for name, h in self.histograms.items()}
+        stage_seconds = self.stage_times()
+
+        gauges['elapsed_seconds'] = elapsed
+        gauges['units_per_second'] = counters.get('units_total', 0) / elapsed if elapsed else 0.0
+
+        for name in sorted(counters):
+            families.append((name, 'counter', [f"crawl_{name}{{{label}}} {counters[name]}"]))
+
+        for name in sorted(gauges):
+            families.append((name, 'gauge', [f"crawl_{name}{{{label}}} {gauges[name]}"]))
+
+        if stage_seconds:
+            families.append(('stage_seconds', 'gauge', [
+                f'crawl_stage_seconds{{{label},stage="{stage}"}} {seconds:.3f}' for stage, seconds in stage_seconds.items()
+            ]))
+
+        for name in sorted(histograms):
+            bounds, counts, total, count = histograms[name]
+            samples = []
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                samples.append(f'crawl_{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            samples.append(f'crawl_{name}_bucket{{{label},le="+Inf"}} {count}')
+            samples.append(f"crawl_{name}_sum{{{label}}} {total:.6f}")
+            samples.append(f"crawl_{name}_count{{{label}}} {count}")
+            families.append((name, 'histogram', samples))
+
+        return families
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        return render_families(self.families())
+
+    def write(self):
+        """Atomically rewrite metrics/<broker>.prom."""
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"{self.broker}.prom")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(f"# Generated {datetime.now().isoformat()}\n")
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        self.last_write = time.monotonic()
+        return path
+
+
+class MetricsServer:
+    """The process's /metrics endpoint, serving every registered CrawlMetrics.
+
+    There is one per process (see start_server), so crawling several
+    brokers in one run shares CRAWL_METRICS_PORT instead of binding it again
+    for each broker.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.registered = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = server.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        print(f"Serving crawl metrics at http://localhost:{port}/metrics")
+
+    def register(self, metrics):
+        with self.lock:
+            self.registered.append(metrics)
+
+    def unregister(self, metrics):
+        with self.lock:
+            if metrics in self.registered:
+                self.registered.remove(metrics)
+
+    def render(self):
+        """Every registered crawl's metrics, one block per family across all of them."""
+        with self.lock:
+            registered = list(self.registered)
+        return render_families(family for metrics in registered for family in metrics.families())
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port):
+    """Start the process-wide metrics server on first use; returns (server, started now)."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server, False
+        _server = MetricsServer(port)
+        return _server, True
+
+
+def stop_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.close()
+            _server = None
@@ -1,9 +1,11 @@
 import asyncio
-import json
-import arrow
+import time
 from datetime import datetime
 from bs4 import BeautifulSoup
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher, CrawlerMonitor, DisplayMode
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl_engine import CrawlOptions
+from page_cache import PageCache
+from units import Property, Unit, new_run_id, save_units, to_epoch
 
 async def get_iframe_url(url=None):
     """Get the iframe URL from Lee Associates property page."""
@@ -38,13 +40,56 @@ async def get_iframe_url(url=None):
     
     return None
 
-async def extract_property_urls():
+def parse_property(html, url, fetched_at=None, run_id=None):
+    """Parse a Trinity Partners Buildout property page (the iframe URL) into unit rows."""
+    fetched_at = to_epoch(fetched_at)
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract property name
+    name_elem = soup.select_one('.pdt-header1 h1')
+    property_name = name_elem.text.strip() if name_elem else ""
+
+    # Extract address and location
+    addr_elem = soup.select_one('.pdt-header2 h2')
+    if addr_elem:
+        addr_text = addr_elem.text.strip()
+        if '|' in addr_text:
+            # Case 1: Property has a name, address contains street and city
+            addr_parts = addr_text.split('|')
+            address = addr_parts[0].strip()
+            location = addr_parts[1].strip()
+        else:
+            # Case 2: Property name is the address, and h2 contains city/state
+            address = property_name
+            location = addr_text
+    else:
+        address = property_name
+        location = ""
+
+    # Extract unit details from table
+    units = []
+    for row in soup.select('.js-lease-space-row-toggle.spaces'):
+        cells = row.find_all(['th', 'td'])
+        if len(cells) >= 5:
+            listing = Property.intern(property_name, address, f"https://www.lpc.com/properties/properties-search/?propertyId={url.split('propertyId=')[1].split('&')[0]}&tab=spaces", location)
+            unit = Unit(listing, cells[0].text.strip(), cells[2].text.strip(), cells[3].text.strip(), fetched_at, run_id)
+            units.append(unit)
+
+    return units
+
+
+async def extract_property_urls(options=None):
     start_time = datetime.now()
     
     def log_time(step_name):
         elapsed = datetime.now() - start_time
         print(f"\n[{step_name}] Time elapsed: {elapsed}")
     
+    run_id = new_run_id()
+    cache = PageCache(run_id=run_id)
+    options = options or CrawlOptions('trinity')
+    metrics = options.metrics
+    
     browser_config = BrowserConfig(
         headless=True,
         verbose=True
@@ -127,6 +172,7 @@ async def extract_property_urls():
     async with AsyncWebCrawler(config=browser_config) as crawler:
         try:
             print("\nStarting property URL extraction...")
+            metrics.stage('pagination')
             
             # Get the iframe URL first
             iframe_url = await get_iframe_url()
@@ -136,7 +182,7 @@ async def extract_property_urls():
             
             print(f"Got iframe URL: {iframe_url}")
             
-            session_id = "monte"
+            session_id = options.session_id
             
             # Step 1: Initial load and office selection
             print("Loading page and selecting office type...")
@@ -148,11 +194,12 @@ async def extract_property_urls():
             )
             
             
-            result1 = await crawler.arun(
-                url=iframe_url,
-                config=config1,
-                session_id=session_id
-            )
+            with metrics.timer('pagination_page_seconds'):
+                result1 = await crawler.arun(
+                    url=iframe_url,
+                    config=config1,
+                    session_id=session_id
+                )
             
             # Step 2: Extract URLs using BeautifulSoup
             print("Extracting property URLs...")
@@ -160,6 +207,7 @@ async def extract_property_urls():
             last_page_urls = set()
             
             # Get URLs from first page
+            await asyncio.to_thread(cache.put, 'trinity', iframe_url, result1.html, kind='search')
             soup = BeautifulSoup(result1.html, 'html.parser')
             property_links = soup.find_all('a', href=lambda x: x and 'propertyId' in x)
             current_page_urls = {link['href'] for link in property_links}  # No need to add base URL, it's already there
@@ -167,7 +215,7 @@ async def extract_property_urls():
             print(f"Found {len(current_page_urls)} property URLs on page 1")
             
             page_num = 2
-            while True:
+            while options.more_pages(page_num - 1):
                 # Store the current page URLs to compare with next page
                 last_page_urls = current_page_urls
                 
@@ -180,12 +228,14 @@ async def extract_property_urls():
                         return document.querySelectorAll('div.result-list-item').length > 1;
                     }""",
                 )
-                result2 = await crawler.arun(
-                    url=iframe_url,
-                    config=config_next,
-                    session_id=session_id
-                )
+                with metrics.timer('pagination_page_seconds'):
+                    result2 = await crawler.arun(
+                        url=iframe_url,
+                        config=config_next,
+                        session_id=session_id
+                    )
                 
+                await asyncio.to_thread(cache.put, 'trinity', iframe_url, result2.html, kind='search')
                 soup = BeautifulSoup(result2.html, 'html.parser')
                 property_links = soup.find_all('a', href=lambda x: x and 'propertyId' in x)
                 current_page_urls = {link['href'] for link in property_links}
@@ -204,9 +254,6 @@ async def extract_property_urls():
                         print("Last page button is active - reached end of pagination")
                         break
             
-            # Save URLs to a JSON file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
             # Now extract iframes from each URL
             print("\nExtracting iframes from each property URL...")
             
@@ -215,6 +262,11 @@ async def extract_property_urls():
             urls_to_process = list(all_property_urls)
             
             log_time("URL Collection Complete")
+            if options.dry_run:
+                print(f"Dry run: {len(all_property_urls)} property URLs found, skipping detail pages")
+                metrics.finish()
+                return []
+            metrics.stage('iframe_resolution')
             
             # Get all iframe URLs in batches
             print("\nGetting iframe URLs...")
@@ -228,19 +280,13 @@ async def extract_property_urls():
             )
             
             # Set up dispatcher for iframe extraction with more conservative settings
-            iframe_dispatcher = MemoryAdaptiveDispatcher(
-                memory_threshold_percent=60.0,  # Lower threshold
-                check_interval=0.5,  # Check more frequently
-                max_session_permit=10,  # Reduce concurrent sessions
-                monitor=CrawlerMonitor(
-                    display_mode=DisplayMode.DETAILED
-                )
-            )
+            iframe_dispatcher = options.dispatcher(max_session_permit=10)
             
             print("\nStarting streaming processing of URLs for iframe extraction...")
             print(f"Processing {len(urls_to_process)} URLs...")
             
             # Get iframes using streaming
+            metrics.enqueue(len(urls_to_process), iframe_dispatcher)
             iframe_stream = await crawler.arun_many(
                 urls=urls_to_process,
                 config=iframe_config,
@@ -250,7 +296,9 @@ async def extract_property_urls():
             # Process iframe results as they come in
             iframe_urls = []
             async for result in iframe_stream:
+                metrics.record_fetch(result, iframe_dispatcher, 'iframe_fetch_seconds')
                 if result.success and result.html:
+                    await asyncio.to_thread(cache.put, 'trinity', result.url, result.html, kind='iframe')
                     soup = BeautifulSoup(result.html, 'html.parser')
                     iframe = soup.select_one('#buildout iframe')
                     if iframe and iframe.get('src'):
@@ -274,22 +322,17 @@ async def extract_property_urls():
             )
             
             # Set up the memory adaptive dispatcher with conservative settings
-            dispatcher = MemoryAdaptiveDispatcher(
-                memory_threshold_percent=60.0,  # Lower threshold
-                check_interval=0.5,  # Check more frequently
-                max_session_permit=10,  # Reduce concurrent sessions
-                monitor=CrawlerMonitor(
-                    display_mode=DisplayMode.DETAILED
-                )
-            )
+            dispatcher = options.dispatcher(max_session_permit=10)
             
             print("\nStarting streaming processing of iframe URLs...")
             print(f"Processing {len(iframe_urls)} URLs...")
             
             log_time("Iframe Collection Complete")
+            metrics.stage('detail_fetch')
             
             # Process results as they stream in
             all_property_details = []
+            metrics.enqueue(len(iframe_urls), dispatcher)
             stream = await crawler.arun_many(
                 urls=iframe_urls,
                 config=run_config,
@@ -297,58 +340,22 @@ async def extract_property_urls():
             )
             
             async for result in stream:
+                metrics.record_fetch(result, dispatcher)
                 if result.success and result.html:
-                    soup = BeautifulSoup(result.html, 'html.parser')
+                    fetched_at = time.time()
+                    await asyncio.to_thread(cache.put, 'trinity', result.url, result.html, fetched_at=fetched_at)
                     print(f"\nProcessing {result.url}")
-                    
-                    # Extract property name
-                    name_elem = soup.select_one('.pdt-header1 h1')
-                    property_name = name_elem.text.strip() if name_elem else ""
-                    
-                    # Extract address and location
-                    addr_elem = soup.select_one('.pdt-header2 h2')
-                    if addr_elem:
-                        addr_text = addr_elem.text.strip()
-                        if '|' in addr_text:
-                            # Case 1: Property has a name, address contains street and city
-                            addr_parts = addr_text.split('|')
-                            address = addr_parts[0].strip()
-                            location = addr_parts[1].strip()
-                        else:
-                            # Case 2: Property name is the address, and h2 contains city/state
-                            address = property_name
-                            location = addr_text
-                    else:
-                        address = property_name
-                        location = ""
-                    
-                    # Extract unit details from table
-                    units = []
-                    for row in soup.select('.js-lease-space-row-toggle.spaces'):
-                        cells = row.find_all(['th', 'td'])
-                        if len(cells) >= 5:
-                            unit = {
-                                "property_name": property_name,
-                                "address": address,
-                                "location": location,
-                                "listing_url": f"https://www.lpc.com/properties/properties-search/?propertyId={result.url.split('propertyId=')[1].split('&')[0]}&tab=spaces",
-                                "floor_suite": cells[0].text.strip(),
-                                "space_available": cells[2].text.strip(),
-                                "price": cells[3].text.strip(),
-                                "updated_at": arrow.now().format('h:mm:ssA M/D/YY')
-                            }
-                            units.append(unit)
-                    
+
+                    with metrics.cpu_timer('parse_cpu_seconds'):
+                        units = parse_property(result.html, result.url, fetched_at, run_id)
+                    metrics.inc('units_total', len(units))
                     all_property_details.extend(units)
                 else:
                     print(f"Failed to process {result.url}: {result.error_message if hasattr(result, 'error_message') else 'Unknown error'}")
             
+            metrics.stage('save')
             # Save all property details to a JSON file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"trinity_properties_{timestamp}.json"
-            
-            with open(output_file, 'w') as f:
-                json.dump(all_property_details, f, indent=2)
+            output_file = save_units('trinity', all_property_details)
             
             print(f"\nExtracted {len(all_property_details)} total units from {len(urls_to_process)} properties")
             print(f"Results saved to {output_file}")
@@ -366,6 +373,8 @@ async def extract_property_urls():
                 
         except Exception as e:
             print(f"Error during extraction: {e}")
+        finally:
+            metrics.finish()
 
 if __name__ == "__main__":
     # Run the full extraction
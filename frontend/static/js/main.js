@@ -1,88 +1,6 @@
 let dataTable = null;
-
-function extractNumber(str) {
-    if (!str || str === 'N/A' || str === 'RENT WITHHELD') return -1;
-    const match = str.match(/(\d+([,.]\d+)?)/);
-    if (!match) return -1;
-    return parseFloat(match[1].replace(/,/g, ''));
-}
-
-function extractPriceValue(priceStr) {
-    if (!priceStr || priceStr === 'N/A') return -1;
-    
-    // Remove any 'per month' or 'SF/YR' suffixes
-    priceStr = priceStr.replace(/(per month|SF\/YR)/g, '').trim();
-    
-    // If there's a range (e.g., "$375.00 - $112,500"), take the first number
-    if (priceStr.includes('-')) {
-        priceStr = priceStr.split('-')[0].trim();
-    }
-    
-    // Extract the number, handling commas
-    const match = priceStr.match(/\$?([\d,]+(?:\.\d+)?)/); 
-    if (!match) return -1;
-    
-    // Convert to number, removing commas
-    return parseFloat(match[1].replace(/,/g, ''));
-}
-
-// Custom sorting function for price
-jQuery.extend(jQuery.fn.dataTableExt.oSort, {
-    'price-pre': function(a) {
-        return extractPriceValue(a);
-    },
-    'price-asc': function(a, b) {
-        if (a === -1 && b === -1) return 0;  // Both are N/A
-        if (a === -1) return 1;  // a is N/A, should be last
-        if (b === -1) return -1; // b is N/A, should be last
-        return ((a < b) ? -1 : ((a > b) ? 1 : 0));
-    },
-    'price-desc': function(a, b) {
-        if (a === -1 && b === -1) return 0;  // Both are N/A
-        if (a === -1) return 1;  // a is N/A, should be last
-        if (b === -1) return -1; // b is N/A, should be last
-        return ((a < b) ? 1 : ((a > b) ? -1 : 0));
-    }
-});
-
-// Custom sorting function for square footage
-jQuery.extend(jQuery.fn.dataTableExt.oSort, {
-    'square-footage-pre': function(a) {
-        return extractNumber(a);
-    },
-    'square-footage-asc': function(a, b) {
-        return ((a < b) ? -1 : ((a > b) ? 1 : 0));
-    },
-    'square-footage-desc': function(a, b) {
-        return ((a < b) ? 1 : ((a > b) ? -1 : 0));
-    }
-});
-
-// Custom sorting function for price
-jQuery.extend(jQuery.fn.dataTableExt.oSort, {
-    'price-pre': function(a) {
-        return extractPriceValue(a);
-    },
-    'price-asc': function(a, b) {
-        return ((a < b) ? -1 : ((a > b) ? 1 : 0));
-    },
-    'price-desc': function(a, b) {
-        return ((a < b) ? 1 : ((a > b) ? -1 : 0));
-    }
-});
-
-// Custom sorting function for suites
-jQuery.extend(jQuery.fn.dataTableExt.oSort, {
-    'suites-pre': function(a) {
-        return extractNumber(a);
-    },
-    'suites-asc': function(a, b) {
-        return ((a < b) ? -1 : ((a > b) ? 1 : 0));
-    },
-    'suites-desc': function(a, b) {
-        return ((a < b) ? 1 : ((a > b) ? -1 : 0));
-    }
-});
+// Bumped on every table rebuild so lazily loaded shards never land in a newer table
+let tableGeneration = 0;
 
 function formatPrice(price) {
     if (!price || price === 'N/A') return 'N/A';
@@ -90,6 +8,18 @@ function formatPrice(price) {
     return price;  // Keep the original format for display
 }
 
+// Sorting reads the numeric keys rows.js precomputed (in the worker) instead
+// of parsing the display strings on every sort
+function renderPrice(data, type, row) {
+    if (type === 'sort' || type === 'type') return row._price;
+    return formatPrice(data);
+}
+
+function renderSquareFootage(data, type, row) {
+    if (type === 'sort' || type === 'type') return row._sqft;
+    return data || 'N/A';
+}
+
 function updateRecordCount(table) {
     const info = table.page.info();
     const totalRecords = info.recordsDisplay;
@@ -99,6 +29,7 @@ function updateRecordCount(table) {
 }
 
 function initializeDataTable(data) {
+    tableGeneration++;
     if (dataTable) {
         dataTable.destroy();
         $('#propertyTable').empty();
@@ -128,19 +59,14 @@ function initializeDataTable(data) {
             { 
                 data: 'price', 
                 title: 'Price',
-                render: function(data) {
-                    return formatPrice(data);
-                },
-                type: 'price',
-                orderData: [1]  // Sort by the price column
+                render: renderPrice,
+                type: 'num'
             },
             { 
                 data: 'square_footage', 
                 title: 'Square Footage',
-                render: function(data) {
-                    return data || 'N/A';
-                },
-                type: 'square-footage'
+                render: renderSquareFootage,
+                type: 'num'
             },
             { 
                 data: 'number_of_units', 
@@ -167,6 +93,7 @@ function initializeDataTable(data) {
         ],
         order: [[1, 'asc']],  // Default sort by price ascending
         pageLength: 25,
+        deferRender: true,  // Only build <tr> nodes for rows that are drawn
         responsive: true,
         dom: 'Bfrtip',
         buttons: [
@@ -182,9 +109,124 @@ function initializeDataTable(data) {
 const isDevelopment = window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1';
 const API_BASE_URL = isDevelopment ? 'http://localhost:5001' : 'https://shark-app-l8hmq.ondigitalocean.app';
 
+// Static shards published to GitHub Pages next to this page (src/publish_data.py)
+const STATIC_DATA_URL = 'data';
+const SHARD_CONCURRENCY = 2;
+
+// Fetching and parsing happen in a Web Worker; without one (or if it fails
+// to start or dies later) the same rows.js code runs on the main thread
+let parseWorker = null;
+let workerRequests = 0;
+const pendingRequests = {};
+
+try {
+    parseWorker = window.Worker ? new Worker('./static/js/parse-worker.js') : null;
+} catch (error) {
+    console.log('Parsing on the main thread:', error.message);
+}
+
+if (parseWorker) {
+    parseWorker.onmessage = function(event) {
+        const { id, result, error } = event.data;
+        const pending = pendingRequests[id];
+        delete pendingRequests[id];
+        if (error) {
+            pending.reject(new Error(error));
+        } else {
+            pending.resolve(result);
+        }
+    };
+    // A worker that fails to load or crashes never answers, so settle its
+    // pending requests on the main thread and stop using it
+    parseWorker.onerror = function(event) {
+        console.log('Parse worker failed, parsing on the main thread:', event.message);
+        event.preventDefault();
+        parseWorker.terminate();
+        parseWorker = null;
+        for (const id of Object.keys(pendingRequests)) {
+            const pending = pendingRequests[id];
+            delete pendingRequests[id];
+            fetchRows(pending.url).then(pending.resolve, pending.reject);
+        }
+    };
+}
+
+function loadRows(url) {
+    // The worker resolves relative URLs against its own script, so send absolute ones
+    const absoluteUrl = new URL(url, window.location.href).href;
+    if (!parseWorker) {
+        return fetchRows(absoluteUrl);
+    }
+    return new Promise((resolve, reject) => {
+        const id = ++workerRequests;
+        pendingRequests[id] = { url: absoluteUrl, resolve, reject };
+        parseWorker.postMessage({ id, url: absoluteUrl });
+    });
+}
+
+function fetchLatestData() {
+    return loadRows(`${API_BASE_URL}/api/latest-data?format=columnar`)
+        .then(result => result.success ? { success: true, data: { properties: result.properties } } : result);
+}
+
+function fetchShard(shard) {
+    // Shard names carry their content hash, so the browser cache can serve repeats
+    return loadRows(`${STATIC_DATA_URL}/${shard.file}`)
+        .then(result => {
+            if (!result.success) throw new Error(result.error);
+            return result.properties;
+        });
+}
+
+function loadRemainingShards(shards, generation) {
+    let next = 0;
+    function worker() {
+        if (next >= shards.length || generation !== tableGeneration) return Promise.resolve();
+        const shard = shards[next++];
+        return fetchShard(shard)
+            .then(rows => {
+                if (generation === tableGeneration) {
+                    dataTable.rows.add(rows).draw(false);
+                }
+            })
+            .catch(error => console.error('Shard error:', error))
+            .then(worker);
+    }
+    const workers = [];
+    for (let i = 0; i < SHARD_CONCURRENCY; i++) {
+        workers.push(worker());
+    }
+    return Promise.all(workers);
+}
+
+// First paint from the CDN: the manifest plus its first shard, then the rest in the background
+function loadStaticData() {
+    return fetch(`${STATIC_DATA_URL}/manifest.json`, { cache: 'no-cache' })
+        .then(response => {
+            if (!response.ok) throw new Error(`Manifest: HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(manifest => {
+            if (!manifest.shards || !manifest.shards.length) throw new Error('No published shards');
+            return fetchShard(manifest.shards[0]).then(rows => {
+                initializeDataTable(rows);
+                $('#lastUpdate').text(manifest.generated_at);
+                $('#tableContainer').addClass('has-data');
+                $('.dataTables_wrapper').show();
+                loadRemainingShards(manifest.shards.slice(1), tableGeneration);
+            });
+        });
+}
+
 function loadLatestData() {
-    fetch(`${API_BASE_URL}/api/latest-data`)
-        .then(response => response.json())
+    loadStaticData().catch(error => {
+        console.log('Static data unavailable, asking the API:', error.message);
+        loadLatestDataFromApi();
+    });
+}
+
+function loadLatestDataFromApi() {
+    fetchLatestData()
         .then(result => {
             if (result.success && result.data && result.data.properties) {
                 if (result.data.properties.length > 0) {
@@ -209,6 +251,68 @@ function loadLatestData() {
         });
 }
 
+// Type-ahead search against the server-side index (/api/search)
+const SEARCH_DEBOUNCE_MS = 150;
+let searchTimer = null;
+let searchSequence = 0;
+
+function escapeHtml(text) {
+    return String(text == null ? '' : text).replace(/[&<>"']/g, function(c) {
+        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+    });
+}
+
+function renderSearchResults(properties) {
+    const $results = $('#searchResults');
+    if (!properties.length) {
+        $results.html('<div class="list-group-item text-muted">No matches</div>');
+        return;
+    }
+    $results.html(properties.map(function(unit) {
+        const place = [unit.address, unit.location].filter(Boolean).join(', ');
+        const details = [unit.floor_suite, unit.space_available, unit.price].filter(Boolean).join(' · ');
+        return `<a class="list-group-item list-group-item-action" href="${escapeHtml(unit.listing_url)}" target="_blank" rel="noopener noreferrer">
+                    <div><strong>${escapeHtml(unit.property_name || unit.address)}</strong> <span class="search-meta">${escapeHtml(unit.broker)}</span></div>
+                    <div class="search-meta">${escapeHtml(place)}</div>
+                    <div class="search-meta">${escapeHtml(details)}</div>
+                </a>`;
+    }).join(''));
+}
+
+function runSearch(query) {
+    // Responses can arrive out of order; only render the latest one
+    const sequence = ++searchSequence;
+    fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}&limit=10`)
+        .then(response => response.json())
+        .then(result => {
+            if (sequence !== searchSequence) return;
+            if (result.success) {
+                renderSearchResults(result.data.properties);
+            } else {
+                $('#searchResults').empty();
+            }
+        })
+        .catch(error => console.error('Search error:', error));
+}
+
+function setupSearch() {
+    $('#searchInput').on('input', function() {
+        const query = $(this).val().trim();
+        clearTimeout(searchTimer);
+        if (!query) {
+            searchSequence++;
+            $('#searchResults').empty();
+            return;
+        }
+        searchTimer = setTimeout(() => runSearch(query), SEARCH_DEBOUNCE_MS);
+    });
+    $('#searchInput').on('keydown', function(event) {
+        if (event.key === 'Escape') {
+            $('#searchResults').empty();
+        }
+    });
+}
+
 function generateReport(event) {
     // Prevent default form submission if event exists
     if (event) {
@@ -263,8 +367,7 @@ const RETRY_INTERVAL = 30000; // 30 seconds
 
 function checkForData() {
     // Get the latest data file from the data directory
-    fetch(`${API_BASE_URL}/api/latest-data`)
-        .then(response => response.json())
+    fetchLatestData()
         .then(result => {
             if (result.success && result.data && result.data.properties) {
                 initializeDataTable(result.data.properties);
@@ -300,6 +403,7 @@ function handleRetry(message) {
 }
 
 function initializeEmptyDataTable() {
+    tableGeneration++;
     if (dataTable) {
         dataTable.destroy();
         $('#propertyTable').empty();
@@ -318,18 +422,14 @@ function initializeEmptyDataTable() {
             { 
                 data: 'price', 
                 title: 'Price',
-                render: function(data) {
-                    return formatPrice(data);
-                },
-                type: 'price'
+                render: renderPrice,
+                type: 'num'
             },
             { 
                 data: 'square_footage', 
                 title: 'Square Footage',
-                render: function(data) {
-                    return data || 'N/A';
-                },
-                type: 'square-footage'
+                render: renderSquareFootage,
+                type: 'num'
             },
             { 
                 data: 'number_of_units', 
@@ -354,6 +454,7 @@ function initializeEmptyDataTable() {
                 }
             }
         ],
+        deferRender: true,
         dom: 'Bfrtip',
         buttons: ['copy', 'csv', 'excel', 'pdf', 'print']
     });
@@ -399,4 +500,7 @@ $(document).ready(function() {
     
     // Set up event handlers
     $('#generateBtn').click(generateReport);
+    setupSearch();
+
+    loadLatestData();
 });
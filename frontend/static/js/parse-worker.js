@@ -0,0 +1,9 @@
+// Fetches and parses table data off the main thread (see rows.js)
+importScripts('rows.js');
+
+self.onmessage = function(event) {
+    const { id, url } = event.data;
+    fetchRows(url)
+        .then(result => self.postMessage({ id, result }))
+        .catch(error => self.postMessage({ id, error: error.message }));
+};
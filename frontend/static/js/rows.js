@@ -0,0 +1,89 @@
+// Row parsing shared by main.js and parse-worker.js: loads columnar data and
+// precomputes numeric sort keys once, so sorting never runs regexes per row
+
+function extractNumber(str) {
+    if (str == null) return -1;
+    str = String(str);
+    if (!str || str === 'N/A' || str === 'RENT WITHHELD') return -1;
+    const match = str.match(/(\d+([,.]\d+)?)/);
+    if (!match) return -1;
+    return parseFloat(match[1].replace(/,/g, ''));
+}
+
+// Mirrors pricing.py: each row maps the text after an amount to a basis
+// ('sf', 'total' or 'auto') and the months in its quoted period
+const MAX_ANNUAL_PSF = 500;
+const SF = '(?:sf|psf|sq\\.?\\s*ft|sqft|sqf|square\\s+feet)';
+const PRICE_UNITS = [
+    [`/?\\s*${SF}\\s*/\\s*(?:mo|mos|month|monthly)\\b`, 'sf', 12],
+    [`/?\\s*${SF}\\s*/\\s*(?:yr|year|annum|annual)\\b`, 'sf', 1],
+    [`/?\\s*${SF}\\b`, 'sf', 1],
+    ['(?:per|/)\\s*(?:mo|month)\\b|monthly\\b', 'total', 12],
+    ['(?:per|/)\\s*(?:yr|year|annum)\\b|annually\\b', 'auto', 1],
+    ['\\(\\s*annual\\s*\\)', 'sf', 1],
+    // bare "$25.00", "$24.50 NNN"; only with a "$"
+    ['(?=\\s*(?:$|[+,;(]|nnn\\b|fs\\b|mg\\b|gross\\b|net\\b|full\\s+service\\b|modified\\b))', 'sf', 1]
+].map(([pattern, basis, months]) => [new RegExp(`^(?:(?:usd|cad)\\b\\s*)?(?:${pattern})`, 'i'), basis, months]);
+const BARE_UNIT = PRICE_UNITS.length - 1;
+const AMOUNT_RE = /(\$)?\s*(\d[\d,]*(?:\.\d+)?)(?:\s*(?:-|–|to)\s*\$?\s*\d[\d,]*(?:\.\d+)?)?/g;
+
+// Annualized $/SF of a price string (-1 when it has none), so "$2.25 SF/month"
+// sorts next to "$27.00 SF/yr" and "$3,408 per month" by its rent per foot
+function extractPriceValue(priceStr, squareFootage) {
+    if (!priceStr) return -1;
+    priceStr = String(priceStr);
+    for (const match of priceStr.matchAll(AMOUNT_RE)) {
+        const rest = priceStr.slice(match.index + match[0].length).replace(/^[ ,]+/, '');
+        const unit = PRICE_UNITS.findIndex(([re]) => re.test(rest));
+        if (unit === -1 || (unit === BARE_UNIT && !match[1])) continue;
+
+        const amount = parseFloat(match[2].replace(/,/g, ''));
+        let [, basis, months] = PRICE_UNITS[unit];
+        if (basis === 'auto') basis = amount * months <= MAX_ANNUAL_PSF ? 'sf' : 'total';
+        let psf = amount * months;
+        if (basis === 'total') {
+            const size = extractNumber(squareFootage);
+            psf = size > 0 ? psf / size : -1;
+        }
+        return psf > 0 && psf <= MAX_ANNUAL_PSF ? psf : -1;
+    }
+    return -1;
+}
+
+function columnarToObjects(columns, rows) {
+    return rows.map(function(values) {
+        const row = {};
+        for (let i = 0; i < columns.length; i++) {
+            row[columns[i]] = values[i];
+        }
+        return row;
+    });
+}
+
+function addSortKeys(rows) {
+    for (const row of rows) {
+        row._price = extractPriceValue(row.price, row.square_footage);
+        row._sqft = extractNumber(row.square_footage);
+    }
+    return rows;
+}
+
+// Fetch a static shard or a columnar /api/latest-data response as
+// {success, properties} (or {success: false, error})
+function fetchRows(url) {
+    return fetch(url)
+        .then(response => {
+            if (!response.ok) throw new Error(`${url}: HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(payload => {
+            if (payload.success === false) {
+                return { success: false, error: payload.error };
+            }
+            const table = payload.data && Array.isArray(payload.data.columns) ? payload.data : payload;
+            if (!Array.isArray(table.columns) || !Array.isArray(table.rows)) {
+                return { success: false, error: 'Invalid data format received' };
+            }
+            return { success: true, properties: addSortKeys(columnarToObjects(table.columns, table.rows)) };
+        });
+}
@@ -0,0 +1,221 @@
+"""Offline geocoding of unit addresses to lat/lon and NYC borough.
+
+Addresses are resolved from their ZIP code: the Census ZCTA gazetteer gives
+a centroid for every US ZIP, and NYC ZIPs map to a borough through
+NYC_ZIP_RANGES. Without the gazetteer, NYC addresses still get their borough
+and the borough's centroid. Every normalized address is resolved once and
+kept in geocode_cache.json, so later crawls only resolve new addresses.
+
+Examples:
+    python geocode.py fetch                 # download the ZCTA gazetteer (once)
+    python geocode.py warm                  # resolve every *_properties_*.json address
+    python geocode.py resolve "600 11th Avenue" "New York, NY  10036"
+"""
+import argparse
+import bisect
+import glob
+import io
+import json
+import os
+import re
+import urllib.request
+import zipfile
+from functools import lru_cache
+
+CACHE_PATH = os.environ.get('GEOCODE_CACHE', 'geocode_cache.json')
+GAZETTEER_PATH = os.environ.get('GEOCODE_GAZETTEER', os.path.join('data', '2020_Gaz_zcta_national.txt'))
+GAZETTEER_URL = 'https://www2.census.gov/geo/docs/maps-data/data/gazetteer/2020_Gazetteer/2020_Gaz_zcta_national.zip'
+
+# (first ZIP, last ZIP, borough), sorted by first ZIP
+NYC_ZIP_RANGES = (
+    (10001, 10282, 'Manhattan'),
+    (10301, 10314, 'Staten Island'),
+    (10451, 10475, 'Bronx'),
+    (11004, 11005, 'Queens'),
+    (11101, 11109, 'Queens'),
+    (11201, 11256, 'Brooklyn'),
+    (11351, 11499, 'Queens'),
+    (11691, 11697, 'Queens'),
+)
+_NYC_ZIP_STARTS = [start for start, _, _ in NYC_ZIP_RANGES]
+
+# City names that put a ZIP-less "..., NY" address in a borough
+NYC_CITIES = {
+    'new york': 'Manhattan',
+    'manhattan': 'Manhattan',
+    'brooklyn': 'Brooklyn',
+    'bronx': 'Bronx',
+    'the bronx': 'Bronx',
+    'staten island': 'Staten Island',
+    'queens': 'Queens',
+    'long island city': 'Queens',
+    'astoria': 'Queens',
+    'flushing': 'Queens',
+    'jamaica': 'Queens',
+}
+
+BOROUGH_CENTROIDS = {
+    'Manhattan': (40.7831, -73.9712),
+    'Brooklyn': (40.6782, -73.9442),
+    'Queens': (40.7282, -73.7949),
+    'Bronx': (40.8448, -73.8648),
+    'Staten Island': (40.5795, -74.1502),
+}
+
+_ZIP_RE = re.compile(r'\b([A-Z]{2})\s+(\d{5})(?:-\d{4})?\b')
+_TRAILING_ZIP_RE = re.compile(r'\b(\d{5})(?:-\d{4})?[\s,]*(?:United States)?\s*$')
+_CITY_RE = re.compile(r'([A-Za-z .\'-]+?),?\s+NY\b')
+_PUNCT_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_address(address, location=None):
+    """Cache key for an address: lowercase words, no punctuation or country suffix."""
+    text = f"{address or ''} {location or ''}".lower()
+    text = _PUNCT_RE.sub(' ', text).strip()
+    if text.endswith(' united states'):
+        text = text[:-len(' united states')]
+    return text
+
+
+def borough_for_zip(zip_code):
+    index = bisect.bisect_right(_NYC_ZIP_STARTS, int(zip_code)) - 1
+    if index >= 0:
+        start, end, borough = NYC_ZIP_RANGES[index]
+        if start <= int(zip_code) <= end:
+            return borough
+    return None
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path=GAZETTEER_PATH):
+    """ZIP -> (lat, lon) from the Census ZCTA gazetteer, or {} when it is not downloaded."""
+    if not os.path.exists(path):
+        return {}
+    centroids = {}
+    with open(path) as f:
+        next(f)  # GEOID ALAND AWATER ALAND_SQMI AWATER_SQMI INTPTLAT INTPTLONG
+        for line in f:
+            fields = line.split('\t')
+            centroids[fields[0]] = (float(fields[5]), float(fields[6]))
+    return centroids
+
+
+class Geocoder:
+    """Resolves addresses through a persistent cache in front of the gazetteer."""
+
+    def __init__(self, cache_path=CACHE_PATH, gazetteer_path=GAZETTEER_PATH):
+        self.cache_path = cache_path
+        self.gazetteer_path = gazetteer_path
+        self.cache = {}
+        self.dirty = False
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.cache = json.load(f)
+
+    def _lookup(self, text):
+        """Resolve one address from its text alone."""
+        gazetteer = load_gazetteer(self.gazetteer_path)
+        result = {"lat": None, "lon": None, "borough": None, "zip": None, "source": None, "gazetteer": bool(gazetteer)}
+        matches = _ZIP_RE.findall(text)
+        if matches:
+            state, zip_code = matches[-1]
+        else:
+            # "... Houston 77042": a ZIP with no state in front of it
+            trailing = _TRAILING_ZIP_RE.search(text)
+            state, zip_code = (None, trailing.group(1)) if trailing else (None, None)
+
+        if zip_code:
+            result["zip"] = zip_code
+            if state in ('NY', None):
+                result["borough"] = borough_for_zip(zip_code)
+            centroid = gazetteer.get(zip_code)
+            if centroid:
+                result["lat"], result["lon"] = centroid
+                result["source"] = 'zcta'
+        else:
+            city = _CITY_RE.search(text)
+            if city:
+                result["borough"] = NYC_CITIES.get(city.group(1).strip().lower())
+
+        if result["source"] is None and result["borough"]:
+            result["lat"], result["lon"] = BOROUGH_CENTROIDS[result["borough"]]
+            result["source"] = 'borough'
+        return result
+
+    def resolve(self, address, location=None):
+        """{lat, lon, borough, zip, source, gazetteer} for an address, resolved at most once."""
+        key = normalize_address(address, location)
+        result = self.cache.get(key)
+        # Addresses resolved before the gazetteer was downloaded get one more try
+        if result is None or (result["zip"] and not result["gazetteer"] and load_gazetteer(self.gazetteer_path)):
+            result = self._lookup(f"{address or ''}, {location or ''}")
+            self.cache[key] = result
+            self.dirty = True
+        return result
+
+    def resolve_units(self, units):
+        """One result per unit; units sharing a Property are resolved together."""
+        by_property = {}
+        results = []
+        for unit in units:
+            record = unit.property
+            result = by_property.get(id(record))
+            if result is None:
+                result = by_property[id(record)] = self.resolve(record.address, record.location)
+            results.append(result)
+        return results
+
+    def save(self):
+        """Write the cache back if anything new was resolved."""
+        if not self.dirty:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.cache, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+
+def fetch_gazetteer(path=GAZETTEER_PATH, url=GAZETTEER_URL):
+    """Download and unpack the ZCTA gazetteer to `path`."""
+    with urllib.request.urlopen(url) as response:
+        archive = zipfile.ZipFile(io.BytesIO(response.read()))
+    name = next(name for name in archive.namelist() if name.endswith('.txt'))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(archive.read(name))
+    load_gazetteer.cache_clear()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline address geocoding")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('fetch', help="Download the Census ZCTA gazetteer")
+    warm_parser = subparsers.add_parser('warm', help="Resolve every address in property files")
+    warm_parser.add_argument('files', nargs='*', help="Property files (default: ./*_properties_*.json)")
+    resolve_parser = subparsers.add_parser('resolve', help="Resolve one address")
+    resolve_parser.add_argument('address')
+    resolve_parser.add_argument('location', nargs='?')
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        print(f"Gazetteer saved to {fetch_gazetteer()}")
+        return
+
+    geocoder = Geocoder()
+    if args.command == 'resolve':
+        print(json.dumps(geocoder.resolve(args.address, args.location), indent=2))
+    else:
+        known = len(geocoder.cache)
+        for path in args.files or sorted(glob.glob('*_properties_*.json')):
+            with open(path) as f:
+                for row in json.load(f):
+                    geocoder.resolve(row["address"], row.get("location"))
+        located = sum(1 for result in geocoder.cache.values() if result["lat"] is not None)
+        print(f"{len(geocoder.cache) - known} new addresses resolved, {located}/{len(geocoder.cache)} located")
+    geocoder.save()
+
+
+if __name__ == "__main__":
+    main()
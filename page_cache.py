@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import arrow
+
+CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', 'html_cache')
+
+
+class PageCache:
+    """Content-addressed store of every page the crawlers fetch.
+
+    Page bodies are gzipped under objects/<sha256[:2]>/<sha256>.html.gz, so a
+    page that has not changed between crawls is stored once. Each fetch is
+    recorded as one JSON line in index/<broker>.jsonl with the URL, fetch time,
+    page kind and content hash, which is what reparse.py walks. A cache opened
+    with a run_id tags every record with the crawl run that fetched it.
+    """
+
+    def __init__(self, root=CACHE_DIR, run_id=None):
+        self.root = root
+        self.run_id = run_id
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_dir = os.path.join(root, 'index')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.html.gz")
+
+    def put(self, broker, url, html, kind='detail', fetched_at=None):
+        """Store a fetched page and record the fetch in the broker's index.
+
+        fetched_at may be epoch seconds or anything arrow.get accepts; it is
+        recorded as an ISO-8601 UTC string.
+        """
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Per thread too: crawlers of several brokers may store the same page at once
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(body, compresslevel=6))
+            os.replace(tmp_path, path)
+
+        record = {
+            "broker": broker,
+            "kind": kind,
+            "url": url,
+            "fetched_at": (arrow.get(fetched_at) if fetched_at is not None else arrow.utcnow()).isoformat(),
+            "sha256": digest
+        }
+        if self.run_id:
+            record["run_id"] = self.run_id
+        with open(os.path.join(self.index_dir, f"{broker}.jsonl"), 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        return record
+
+    def get(self, digest):
+        """Return the HTML stored under a content hash."""
+        with open(self._object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+    def records(self, broker, kind='detail', since=None, until=None, latest_only=True):
+        """List index records for a broker, oldest first.
+
+        With latest_only, only the most recent fetch of each URL inside the
+        [since, until] window is returned.
+        """
+        index_path = os.path.join(self.index_dir, f"{broker}.jsonl")
+        if not os.path.exists(index_path):
+            return []
+
+        since = arrow.get(since) if since else None
+        until = arrow.get(until) if until else None
+        selected = []
+        with open(index_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if kind and record['kind'] != kind:
+                    continue
+                fetched_at = arrow.get(record['fetched_at'])
+                if since and fetched_at < since:
+                    continue
+                if until and fetched_at > until:
+                    continue
+                selected.append(record)
+
+        if latest_only:
+            latest = {}
+            for record in selected:
+                latest[record['url']] = record
+            selected = list(latest.values())
+        return sorted(selected, key=lambda r: r['fetched_at'])
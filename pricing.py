@@ -0,0 +1,153 @@
+"""Normalize broker price and size strings into annualized $/SF and annual rent.
+
+Brokers quote rent in many shapes: "$2.25 SF/month", "$45.00 SF/yr",
+"$15.25/SF/Year", "$3,408 per month", "$27.00 - $30.00  (Annual)",
+"Negotiable", "Call For Info". Each shape is one row of PRICE_UNITS (how the
+text after the amount maps to a basis and a period), and the rows are
+compiled into a single regex at import time. An amount counts as a price only
+with a "$" or a unit after it, so "Floor 3" or a phone number is
+'unrecognized' rather than a rent, and a $/SF outside (0, MAX_ANNUAL_PSF] is
+'implausible'. Results are cached per distinct
+string, and a snapshot has only a few hundred distinct prices, so
+normalize_columns() does the parsing work once per string, not once per unit.
+
+    >>> normalize("$2.25 SF/month", "2,500 SF")
+    NormalizedPrice(annual_psf=27.0, annual_rent=67500.0, size_sf=2500.0, status='quoted')
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+NormalizedPrice = namedtuple('NormalizedPrice', ['annual_psf', 'annual_rent', 'size_sf', 'status'])
+
+SQFT_PER_ACRE = 43560.0
+
+# An "auto" amount quoted per year above this is a total rent, below it $/SF
+# ("$72 per year" on 17,800 SF vs "$120,000 per year" on 0.74 acres). Any
+# annual $/SF above it is rejected as implausible.
+MAX_ANNUAL_PSF = 500.0
+
+_NUMBER = r'(\d[\d,]*(?:\.\d+)?)'
+_SF = r'(?:sf|psf|sq\.?\s*ft|sqft|sqf|square\s+feet)'
+
+# Currency codes allowed between the amount and its unit ("$12.00 CAD SF/yr")
+_CURRENCY = r'(?:(?:usd|cad)\b\s*)?'
+
+# (suffix pattern, basis, months per quoted period). Matched in order against
+# the text following the amount; basis is 'sf' ($ per square foot),
+# 'total' (rent for the whole space) or 'auto' (decided by MAX_ANNUAL_PSF).
+PRICE_UNITS = (
+    (rf'/?\s*{_SF}\s*/\s*(?:mo|mos|month|monthly)\b', 'sf', 12),       # "$2.25 SF/month", "$1.10/SF/Month"
+    (rf'/?\s*{_SF}\s*/\s*(?:yr|year|annum|annual)\b', 'sf', 1),        # "$45.00 SF/YR", "$15.25/SF/Year"
+    (rf'/?\s*{_SF}\b', 'sf', 1),                                       # "$14 PSF", "$28.50 psf, FS"
+    (r'(?:per|/)\s*(?:mo|month)\b|monthly\b', 'total', 12),            # "$3,408 per month"
+    (r'(?:per|/)\s*(?:yr|year|annum)\b|annually\b', 'auto', 1),        # "$72 per year", "$120,000 per year"
+    (r'\(\s*annual\s*\)', 'sf', 1),                                    # Cushman: "$57.00  (Annual)"
+    # bare "$25.00", "$24.50 NNN", "$6.75 + Utilities" ($/SF/yr); only with a "$"
+    (r'(?=\s*(?:$|[+,;(]|nnn\b|fs\b|mg\b|gross\b|net\b|full\s+service\b|modified\b))', 'sf', 1),
+)
+_BARE_UNIT = f'u{len(PRICE_UNITS) - 1}'
+
+# (pattern, status) for prices without an amount, first match wins
+PRICE_STATUSES = (
+    (r'negotiable|terms acceptable', 'negotiable'),
+    (r'withheld|undisclosed|confidential', 'withheld'),
+)
+
+_UNIT_RE = re.compile(_CURRENCY + '(?:' + '|'.join(f'(?P<u{i}>{pattern})' for i, (pattern, _, _) in enumerate(PRICE_UNITS)) + ')', re.I)
+_STATUS_RE = re.compile('|'.join(f'(?P<s{i}>{pattern})' for i, (pattern, _) in enumerate(PRICE_STATUSES)), re.I)
+_AMOUNT_RE = re.compile(rf'(\$)?\s*{_NUMBER}(?:\s*(?:-|–|to)\s*\$?\s*{_NUMBER})?')
+_SIZE_RE = re.compile(rf'{_NUMBER}(?:\s*{_SF})?(?:\s*(?:-|–|to)\s*{_NUMBER})?\s*({_SF}|acres?)\b', re.I)
+_DIGIT_RE = re.compile(r'\d')
+
+# Statuses of prices that have digits but no usable rent
+UNRECOGNIZED = 'unrecognized'   # "Floor 3", "Call 212-555-1234", "$1,500 / Unit / Month"
+IMPLAUSIBLE = 'implausible'     # a $/SF outside (0, MAX_ANNUAL_PSF], e.g. "$850/SF/Month"
+
+
+def _to_float(text):
+    return float(text.replace(',', ''))
+
+
+@lru_cache(maxsize=8192)
+def parse_price(price):
+    """Parse a price string into (amount, basis, months) or (None, status, None).
+
+    The first amount with a unit after it, or a "$" and nothing but lease
+    terms after it, is the price.
+    """
+    price = price or ''
+    for match in _AMOUNT_RE.finditer(price):
+        unit = _UNIT_RE.match(price[match.end():].lstrip(' ,'))
+        if unit is None or (unit.lastgroup == _BARE_UNIT and not match.group(1)):
+            continue
+        # The low end of a range is the asking rent a search should match
+        amount = _to_float(match.group(2))
+        _, basis, months = PRICE_UNITS[int(unit.lastgroup[1:])]
+        if basis == 'auto':
+            basis = 'sf' if amount * months <= MAX_ANNUAL_PSF else 'total'
+        return amount, basis, months
+
+    status = _STATUS_RE.search(price)
+    if status:
+        return None, PRICE_STATUSES[int(status.lastgroup[1:])][1], None
+    return None, UNRECOGNIZED if _DIGIT_RE.search(price) else 'on_request', None
+
+
+@lru_cache(maxsize=8192)
+def parse_size(space_available):
+    """Parse a size string ("2,500 SF", "1,565 - 9,072 SF", "0.74 Acres") into square feet.
+
+    Ranges resolve to their low end, the smallest space a tenant can take.
+    """
+    match = _SIZE_RE.search(space_available or '')
+    if match is None:
+        return None
+    size = _to_float(match.group(1))
+    if match.group(3).lower().startswith('acre'):
+        size *= SQFT_PER_ACRE
+    return round(size, 2) or None
+
+
+def normalize(price, space_available):
+    """Annualized $/SF and total annual rent for one unit."""
+    amount, basis, months = parse_price(price)
+    size_sf = parse_size(space_available)
+    if amount is None:
+        return NormalizedPrice(None, None, size_sf, basis)
+
+    if basis == 'sf':
+        annual_psf = amount * months
+        annual_rent = annual_psf * size_sf if size_sf else None
+    else:
+        annual_rent = amount * months
+        annual_psf = annual_rent / size_sf if size_sf else None
+    if annual_psf is not None and not 0 < annual_psf <= MAX_ANNUAL_PSF:
+        return NormalizedPrice(None, None, size_sf, IMPLAUSIBLE)
+    return NormalizedPrice(
+        round(annual_psf, 2) if annual_psf is not None else None,
+        round(annual_rent, 2) if annual_rent is not None else None,
+        size_sf,
+        'quoted'
+    )
+
+
+def normalize_columns(prices, spaces):
+    """Normalize parallel price / space_available columns of a whole snapshot.
+
+    Returns a list of NormalizedPrice, one per row. Each distinct
+    (price, space) pair is normalized once.
+    """
+    seen = {}
+    results = []
+    for pair in zip(prices, spaces):
+        result = seen.get(pair)
+        if result is None:
+            result = seen[pair] = normalize(*pair)
+        results.append(result)
+    return results
+
+
+def normalize_units(units):
+    """normalize_columns over a list of units.Unit."""
+    return normalize_columns([unit.price for unit in units], [unit.space_available for unit in units])
@@ -0,0 +1,130 @@
+"""One entry point for the broker crawlers.
+
+Each broker's crawler module (see brokers.py) runs with a CrawlOptions built
+from the command line instead of the settings hard-coded in its script.
+
+Examples:
+    python re_crawl.py list
+    python re_crawl.py run --brokers lee,cbre --max-pages 5 --concurrency 20
+    python re_crawl.py run --all --dry-run              # pagination only, nothing saved
+    python re_crawl.py run --brokers lee --profile      # profiles/lee_<timestamp>.prof + .stages.json
+
+--profile writes cProfile output (open it with `python -m pstats`, snakeviz
+or gprof2dot) plus the crawl's per-stage wall times. For a sampling profile
+that also covers native frames, run the same command under py-spy:
+    py-spy record -o lee.svg -- python re_crawl.py run --brokers lee
+"""
+import argparse
+import asyncio
+import cProfile
+import importlib
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from datetime import datetime
+
+from brokers import BROKERS
+from crawl_engine import MEMORY_THRESHOLD, CrawlOptions
+from crawl_metrics import start_server, stop_server
+
+PROFILE_DIR = 'profiles'
+
+
+def crawl(broker, options, profile_dir=None):
+    """Run one broker's crawler; returns its units (None when the crawl failed)."""
+    extract_property_urls = importlib.import_module(BROKERS[broker]).extract_property_urls
+    if profile_dir is None:
+        try:
+            return asyncio.run(extract_property_urls(options))
+        finally:
+            # Also when the crawler failed before its own finally block (e.g. the browser did not start)
+            options.metrics.finish()
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return asyncio.run(extract_property_urls(options))
+    finally:
+        profiler.disable()
+        options.metrics.finish()
+        write_profile(broker, profiler, options.metrics.stage_times(), profile_dir)
+
+
+def write_profile(broker, profiler, stage_seconds, profile_dir):
+    os.makedirs(profile_dir, exist_ok=True)
+    stem = os.path.join(profile_dir, f"{broker}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    profiler.dump_stats(f"{stem}.prof")
+    with open(f"{stem}.stages.json", 'w') as f:
+        json.dump({'broker': broker, 'stage_seconds': stage_seconds}, f, indent=2)
+
+    print(f"\n=== {broker} stages ===")
+    for stage, seconds in stage_seconds.items():
+        print(f"{stage or 'setup':<20} {seconds:9.2f}s")
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(15)
+    print(out.getvalue())
+    print(f"Profile written to {stem}.prof and {stem}.stages.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the broker crawlers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="Show the available brokers")
+    run_parser = subparsers.add_parser('run', help="Crawl one or more brokers, one after the other")
+    run_parser.add_argument('--brokers', help=f"Comma-separated: {', '.join(sorted(BROKERS))}")
+    run_parser.add_argument('--all', action='store_true', help="Crawl every broker")
+    run_parser.add_argument('--max-pages', type=int, help="Stop pagination after this many search results pages")
+    run_parser.add_argument('--concurrency', type=int, help="Browser sessions per dispatcher (default: each crawler's own)")
+    run_parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD,
+                            help="Memory percent at which the dispatcher holds back new sessions")
+    run_parser.add_argument('--dry-run', action='store_true', help="Collect property URLs only; fetch and save nothing else")
+    run_parser.add_argument('--profile', action='store_true', help=f"Write cProfile output and stage timings to {PROFILE_DIR}/")
+    run_parser.add_argument('--profile-dir', default=PROFILE_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for broker in sorted(BROKERS):
+            print(f"{broker:<20} {BROKERS[broker]}.py")
+        return
+
+    brokers = sorted(BROKERS) if args.all else [broker.strip() for broker in (args.brokers or '').split(',') if broker.strip()]
+    if not brokers:
+        run_parser.error("pass --brokers or --all")
+    unknown = [broker for broker in brokers if broker not in BROKERS]
+    if unknown:
+        run_parser.error(f"unknown broker(s): {', '.join(unknown)}")
+
+    # One /metrics server for the whole run; each broker's metrics register with it
+    port = os.environ.get('CRAWL_METRICS_PORT')
+    if port:
+        start_server(int(port))
+
+    results = []
+    try:
+        for broker in brokers:
+            print(f"\n=== Crawling {broker} ===")
+            started = time.monotonic()
+            try:
+                options = CrawlOptions(broker, max_pages=args.max_pages, concurrency=args.concurrency,
+                                       memory_threshold=args.memory_threshold, dry_run=args.dry_run)
+                units = crawl(broker, options, args.profile_dir if args.profile else None)
+            except Exception as e:
+                print(f"Error crawling {broker}: {e}")
+                units = None
+            results.append((broker, units, time.monotonic() - started))
+    finally:
+        stop_server()
+
+    print("\n=== Summary ===")
+    for broker, units, elapsed in results:
+        status = 'failed' if units is None else f"{len(units)} units"
+        print(f"{broker:<20} {status:<14} {elapsed:8.1f}s")
+    if any(units is None for _, units, _ in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Re-run broker parsers over cached HTML without launching a browser.
+
+Examples:
+    python reparse.py cbre
+    python reparse.py lee lincoln --until 2025-02-04T23:59:59
+    python reparse.py --all --workers 8
+"""
+import argparse
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import arrow
+
+from brokers import BROKERS
+from page_cache import CACHE_DIR, PageCache
+from units import save_units, to_epoch
+
+
+def parse_records(broker, records, cache_root=CACHE_DIR):
+    """Parse a batch of cached detail pages for one broker (runs in a worker process)."""
+    parse_property = importlib.import_module(BROKERS[broker]).parse_property
+    cache = PageCache(cache_root)
+    units = []
+    for record in records:
+        html = cache.get(record['sha256'])
+        # Keep the original fetch time and run, so reparsed units compare
+        # equal to the ones the crawl produced
+        units.extend(parse_property(html, record['url'], to_epoch(record['fetched_at']), record.get('run_id')))
+    return units
+
+
+def reparse_broker(broker, executor, workers, since=None, until=None, cache_root=CACHE_DIR):
+    records = PageCache(cache_root).records(broker, since=since, until=until)
+    if not records:
+        return []
+
+    # A few chunks per worker keeps every core busy without paying
+    # the pickling overhead of one task per page.
+    chunk_size = max(1, len(records) // (workers * 4))
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    units = []
+    for chunk_units in executor.map(parse_records, [broker] * len(chunks), chunks, [cache_root] * len(chunks)):
+        units.extend(chunk_units)
+    return units
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate broker property files from the page cache")
+    parser.add_argument('brokers', nargs='*', help=f"Brokers to reparse: {', '.join(sorted(BROKERS))}")
+    parser.add_argument('--all', action='store_true', help="Reparse every broker")
+    parser.add_argument('--since', help="Only use pages fetched at or after this ISO time")
+    parser.add_argument('--until', help="Only use pages fetched at or before this ISO time")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Parser processes (default: all cores)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--output-dir', default='.')
+    args = parser.parse_args()
+
+    brokers = sorted(BROKERS) if args.all else args.brokers
+    if not brokers:
+        parser.error("name at least one broker or pass --all")
+    unknown = [broker for broker in brokers if broker not in BROKERS]
+    if unknown:
+        parser.error(f"unknown broker(s): {', '.join(unknown)}")
+
+    start_time = arrow.now()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for broker in brokers:
+            units = reparse_broker(broker, executor, args.workers, args.since, args.until, args.cache_dir)
+            if not units:
+                print(f"No cached pages for {broker}")
+                continue
+
+            output_file = save_units(broker, units, args.output_dir)
+            print(f"Reparsed {len(units)} units for {broker} -> {output_file}")
+
+    print(f"Total Time: {arrow.now() - start_time}")
+
+
+if __name__ == "__main__":
+    main()
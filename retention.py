@@ -0,0 +1,393 @@
+"""Retention for JSON snapshots: recent ones stay hot, older ones are archived as deltas.
+
+A snapshot is any <series>_<YYYYMMDD_HHMMSS>.json file: the crawlers'
+<broker>_properties_*.json and the backend's data/raw_data_*.json. The newest
+snapshots of each series stay as plain JSON. Older ones are compacted into one
+archive per series and month, archive/<series>_<YYYYMM>.jsonl.zst. An archive
+holds one full keyframe (the month's first snapshot); every later snapshot is
+stored only as its changes against the previous one. Rows are matched by
+listing URL plus floor/suite (or URL plus address), and a row that changed
+stores just its changed fields. Any archived snapshot can be rebuilt on demand
+by replaying its month from the keyframe. Archives use zstd when the
+zstandard package is installed and gzip otherwise.
+
+Examples:
+    python retention.py compact                      # ./*_properties_*.json, keep 14 days hot
+    python retention.py --dir backend/src/data compact --keep 3 --keep-days 7
+    python retention.py list
+    python retention.py restore lee_properties 20250204 -o lee_20250204.json
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:  # optional: without it archives are gzip
+    zstandard = None
+
+ARCHIVE_DIRNAME = 'archive'
+KEEP_SNAPSHOTS = 7     # newest snapshots per series that always stay hot
+KEEP_DAYS = 14         # snapshots younger than this also stay hot
+ZSTD_LEVEL = 19
+GZIP_LEVEL = 9
+
+# The backend names a second snapshot within the same second raw_data_<stamp>_2.json
+SNAPSHOT_RE = re.compile(r'^(?P<series>.+)_(?P<stamp>\d{8}_\d{6})(?:_(?P<seq>\d+))?\.json$')
+ARCHIVE_RE = re.compile(r'^(?P<series>.+)_(?P<month>\d{6})\.jsonl\.(?P<codec>zst|gz)$')
+
+# Fields identifying the same row across snapshots, tried in order
+ROW_KEYS = (('listing_url', 'floor_suite'), ('url', 'address'))
+
+_MISSING = object()
+
+
+def snapshot_digest(doc):
+    """SHA-256 of the canonical JSON of a snapshot (independent of indentation)."""
+    body = json.dumps(doc, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def snapshot_order(name):
+    """Sort key of a snapshot filename: its timestamp, then its same-second number.
+
+    Plain string order would put raw_data_<stamp>_10.json before _2.json.
+    """
+    match = SNAPSHOT_RE.match(name)
+    return match.group('stamp'), int(match.group('seq') or 1)
+
+
+def find_snapshots(directory):
+    """{series: [filename, ...]} of the hot snapshot files, oldest first."""
+    series = {}
+    for name in os.listdir(directory):
+        match = SNAPSHOT_RE.match(name)
+        if match:
+            series.setdefault(match.group('series'), []).append(name)
+    for names in series.values():
+        names.sort(key=snapshot_order)
+    return series
+
+
+def find_archives(archive_dir):
+    """{(series, month): filename} of the existing archives."""
+    archives = {}
+    if os.path.isdir(archive_dir):
+        for name in sorted(os.listdir(archive_dir)):
+            match = ARCHIVE_RE.match(name)
+            if match:
+                archives[(match.group('series'), match.group('month'))] = name
+    return archives
+
+
+def split_rows(doc):
+    """(rows, envelope): the snapshot's row list and everything around it."""
+    if isinstance(doc, list):
+        return doc, None
+    listings = doc.get('data', {}).get('listings') if isinstance(doc.get('data'), dict) else None
+    if isinstance(listings, list):
+        envelope = dict(doc, data=dict(doc['data'], listings=None))
+        return listings, envelope
+    return [], doc
+
+
+def join_rows(rows, envelope):
+    if envelope is None:
+        return rows
+    if isinstance(envelope.get('data'), dict) and 'listings' in envelope['data']:
+        return dict(envelope, data=dict(envelope['data'], listings=rows))
+    return envelope
+
+
+def row_keys(rows):
+    """A key per row, unique within the snapshot (repeats get an occurrence suffix)."""
+    keys = []
+    seen = {}
+    for row in rows:
+        key = None
+        if isinstance(row, dict):
+            for fields in ROW_KEYS:
+                if fields[0] in row:
+                    key = '|'.join(str(row.get(field, '')) for field in fields)
+                    break
+        if key is None:
+            key = json.dumps(row, sort_keys=True)
+        count = seen[key] = seen.get(key, 0) + 1
+        keys.append(f'{key}#{count}')
+    return keys
+
+
+def encode_delta(previous, rows):
+    """Rows as references into the previous snapshot's rows.
+
+    Each entry is an int (identical to previous[i]), [i, changed, removed]
+    (previous[i] with fields set and removed), or a full row that is new.
+    """
+    previous_index = {key: index for index, key in enumerate(row_keys(previous))}
+    encoded = []
+    for key, row in zip(row_keys(rows), rows):
+        index = previous_index.get(key)
+        if index is None or not isinstance(row, dict):
+            encoded.append(row if index is None or row != previous[index] else index)
+            continue
+        base = previous[index]
+        changed = {field: value for field, value in row.items() if base.get(field, _MISSING) != value}
+        removed = [field for field in base if field not in row]
+        encoded.append([index, changed, removed] if changed or removed else index)
+    return encoded
+
+
+def decode_delta(previous, encoded):
+    rows = []
+    for entry in encoded:
+        if isinstance(entry, int):
+            rows.append(previous[entry])
+        elif isinstance(entry, list) and len(entry) == 3 and isinstance(entry[0], int):
+            row = dict(previous[entry[0]])
+            for field in entry[2]:
+                del row[field]
+            row.update(entry[1])
+            rows.append(row)
+        else:
+            rows.append(entry)
+    return rows
+
+
+def open_archive(path, mode):
+    """Text stream over an archive, (de)compressed according to its extension."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=GZIP_LEVEL)
+    if zstandard is None:
+        raise RuntimeError(f"{path} is zstd-compressed; install the zstandard package to read it")
+    raw = open(path, mode + 'b')
+    if mode == 'w':
+        stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=True)
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def read_archive(path):
+    """Yield (filename, record, snapshot) for every snapshot in an archive, in order."""
+    rows = None
+    with open_archive(path, 'r') as f:
+        for line in f:
+            record = json.loads(line)
+            rows = record['rows'] if record['base'] else decode_delta(rows, record['rows'])
+            yield record['file'], record, join_rows(rows, record['envelope'])
+
+
+def write_archive(path, snapshots):
+    """Write (filename, snapshot) pairs as one keyframe plus deltas; returns {filename: digest}.
+
+    The archive is written to a temp file, read back and checked against the
+    digests, and only then renamed over the previous archive.
+    """
+    digests = {}
+    # Same extension as the archive, so open_archive picks the same codec
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.getpid()}.{os.path.basename(path)}")
+    previous = None
+    with open_archive(tmp_path, 'w') as f:
+        for name, doc in snapshots:
+            rows, envelope = split_rows(doc)
+            digests[name] = snapshot_digest(doc)
+            record = {
+                'file': name,
+                'sha256': digests[name],
+                'base': previous is None,
+                'envelope': envelope,
+                'rows': rows if previous is None else encode_delta(previous, rows)
+            }
+            f.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n')
+            previous = rows
+    try:
+        restored = {name: snapshot_digest(doc) for name, _, doc in read_archive(tmp_path)}
+        if restored != digests:
+            raise RuntimeError(f"{path}: archive does not reproduce its snapshots")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return digests
+
+
+def unique_names(snapshots):
+    """Drop repeats of a filename (archived by a run that died before deleting the file)."""
+    last = None
+    for name, doc in snapshots:
+        if name != last:
+            yield name, doc
+        last = name
+
+
+def load_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def cold_snapshots(names, keep, keep_days, now, protected=()):
+    """The names (oldest first) that fall outside the retention window.
+
+    The newest snapshot and the protected names (the manifest's latest)
+    always stay hot, whatever keep and keep_days say.
+    """
+    cutoff = (now - timedelta(days=keep_days)).strftime('%Y%m%d_%H%M%S')
+    hot_tail = set(names[-max(keep, 1):])
+    return [name for name in names
+            if name not in hot_tail and name not in protected and SNAPSHOT_RE.match(name).group('stamp') < cutoff]
+
+
+def manifest_latest(directory):
+    """The snapshot the backend's manifest serves as latest, or None."""
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f).get('latest')
+
+
+def mark_archived(directory, archived):
+    """Record {filename: archive} in the backend's snapshot manifest, if there is one."""
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not archived or not os.path.exists(manifest_path):
+        return
+    with open(os.path.join(directory, '.manifest.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        for entry in manifest['snapshots']:
+            if entry['file'] in archived:
+                entry['archive'] = archived[entry['file']]
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+
+
+def compact(directory='.', keep=KEEP_SNAPSHOTS, keep_days=KEEP_DAYS, dry_run=False, now=None):
+    """Move snapshots outside the retention window into their monthly archives.
+
+    Returns [(series, month, archive filename, snapshots added, bytes freed)].
+    """
+    now = now or datetime.now()
+    archive_dir = os.path.join(directory, ARCHIVE_DIRNAME)
+    archives = find_archives(archive_dir)
+    codec = 'zst' if zstandard is not None else 'gz'
+    results = []
+    archived = {}
+    protected = {manifest_latest(directory)}
+
+    for series, names in find_snapshots(directory).items():
+        by_month = {}
+        for name in cold_snapshots(names, keep, keep_days, now, protected):
+            by_month.setdefault(SNAPSHOT_RE.match(name).group('stamp')[:6], []).append(name)
+
+        for month, cold in sorted(by_month.items()):
+            freed = sum(os.path.getsize(os.path.join(directory, name)) for name in cold)
+            existing = archives.get((series, month))
+            archive_name = existing or f"{series}_{month}.jsonl.{codec}"
+            results.append((series, month, archive_name, len(cold), freed))
+            if dry_run:
+                continue
+
+            os.makedirs(archive_dir, exist_ok=True)
+            # Merge what is already archived with the new files, oldest first;
+            # only the snapshot being encoded and the one before it are in memory
+            sources = [((name, doc) for name, _, doc in read_archive(os.path.join(archive_dir, existing)))] if existing else []
+            sources.append((name, load_snapshot(os.path.join(directory, name))) for name in cold)
+            merged = heapq.merge(*sources, key=lambda item: snapshot_order(item[0]))
+            write_archive(os.path.join(archive_dir, archive_name), unique_names(merged))
+
+            for name in cold:
+                os.unlink(os.path.join(directory, name))
+                archived[name] = os.path.join(ARCHIVE_DIRNAME, archive_name)
+
+    if not dry_run:
+        mark_archived(directory, archived)
+    return results
+
+
+def restore(directory, series, when):
+    """(filename, snapshot) for a series at `when`: a filename, a timestamp or a YYYYMMDD day.
+
+    A day resolves to that day's last snapshot. Hot files are read directly;
+    archived ones are replayed from their month's keyframe.
+    """
+    if SNAPSHOT_RE.match(when):
+        stamp = SNAPSHOT_RE.match(when).group('stamp')
+        matches = lambda name: name == when
+    else:
+        stamp = when
+        matches = lambda name: SNAPSHOT_RE.match(name).group('stamp').startswith(stamp)
+    hot = [name for name in find_snapshots(directory).get(series, []) if matches(name)]
+    if hot:
+        return hot[-1], load_snapshot(os.path.join(directory, hot[-1]))
+
+    archive_name = find_archives(os.path.join(directory, ARCHIVE_DIRNAME)).get((series, stamp[:6]))
+    found = None
+    if archive_name:
+        for name, _, doc in read_archive(os.path.join(directory, ARCHIVE_DIRNAME, archive_name)):
+            if matches(name):
+                found = (name, doc)
+            elif found:
+                break
+    if found is None:
+        raise KeyError(f"no {series} snapshot matching {when}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot retention and archive")
+    parser.add_argument('--dir', default='.', help="Directory holding the snapshots (default: .)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact_parser = subparsers.add_parser('compact', help="Archive snapshots outside the retention window")
+    compact_parser.add_argument('--keep', type=int, default=KEEP_SNAPSHOTS, help="Newest snapshots per series kept hot")
+    compact_parser.add_argument('--keep-days', type=int, default=KEEP_DAYS, help="Snapshots younger than this are kept hot")
+    compact_parser.add_argument('--dry-run', action='store_true')
+    subparsers.add_parser('list', help="Show hot snapshots and archives per series")
+    restore_parser = subparsers.add_parser('restore', help="Rebuild one snapshot")
+    restore_parser.add_argument('series', help="e.g. lee_properties or raw_data")
+    restore_parser.add_argument('when', help="Filename, YYYYMMDD_HHMMSS or YYYYMMDD")
+    restore_parser.add_argument('-o', '--output', help="Write here instead of stdout")
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        started = time.perf_counter()
+        results = compact(args.dir, args.keep, args.keep_days, args.dry_run)
+        for series, month, archive_name, count, freed in results:
+            action = "would archive" if args.dry_run else "archived"
+            print(f"{series} {month}: {action} {count} snapshots ({freed / 1e6:.1f} MB) into {archive_name}")
+        if not results:
+            print("Nothing outside the retention window")
+        print(f"Done in {time.perf_counter() - started:.1f}s")
+    elif args.command == 'list':
+        archive_dir = os.path.join(args.dir, ARCHIVE_DIRNAME)
+        archives = find_archives(archive_dir)
+        for series, names in sorted(find_snapshots(args.dir).items()):
+            size = sum(os.path.getsize(os.path.join(args.dir, name)) for name in names)
+            print(f"{series}: {len(names)} hot ({size / 1e6:.1f} MB), newest {names[-1]}")
+        for (series, month), name in sorted(archives.items()):
+            count = sum(1 for _ in open_archive(os.path.join(archive_dir, name), 'r'))
+            print(f"{series} {month}: {count} archived in {name} ({os.path.getsize(os.path.join(archive_dir, name)) / 1e6:.2f} MB)")
+    else:
+        name, doc = restore(args.dir, args.series, args.when)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(doc, f, indent=2)
+            print(f"{name} restored to {args.output}")
+        else:
+            print(json.dumps(doc, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""Refresh service: runs each broker's crawl on its own cadence.
+
+A broker's cadence follows how fast its listings change. The newest few
+<broker>_properties_*.json files are diffed pairwise (rows added, removed or
+changed, per hour between the two crawls), and the broker is crawled again
+about when TARGET_CHANGE of its listings should have changed, within
+[MIN_INTERVAL, MAX_INTERVAL]. Crawls are staggered: at most --max-running at
+once and at least STAGGER apart, so browsers and memory do not all peak
+together. When several brokers are due, the one most overdue relative to its
+own cadence goes first, which puts the fast-changing brokers ahead. While the
+host's load average or memory use is above the limits, new crawls wait.
+
+Each crawl runs `python re_crawl.py run --brokers <broker>` in its own
+process, logging to crawl_logs/. With --publish-dir, the files it writes are
+copied there (e.g. the backend's data/brokers) as soon as it finishes, and
+with --history they are then recorded in the backend's unit history and
+matched against its saved searches (backend/src/history.py ingest), rather
+than waiting for the next API request to load them.
+
+Examples:
+    python scheduler.py plan                                   # change rates, cadences, next runs
+    python scheduler.py run --publish-dir backend/src/data/brokers --history
+    python scheduler.py run --brokers lee,cbre --max-running 2
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import psutil
+
+from brokers import BROKERS
+from retention import SNAPSHOT_RE, find_snapshots, load_snapshot, row_keys, split_rows
+
+STATE_FILE = 'scheduler_state.json'
+LOG_DIR = 'crawl_logs'
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'src')
+
+HOUR = 3600
+DEFAULT_INTERVAL = 24 * HOUR   # brokers without two crawls to compare yet
+MIN_INTERVAL = 6 * HOUR
+MAX_INTERVAL = 7 * 24 * HOUR
+TARGET_CHANGE = 0.05           # crawl again once ~5% of a broker's listings should have changed
+RATE_PAIRS = 3                 # consecutive crawls compared for the change rate
+
+STAGGER = 20 * 60              # minimum gap between two crawl starts
+MAX_RUNNING = 1
+MAX_LOAD = 0.8                 # 1-minute load average per core
+MAX_MEMORY_PERCENT = 70.0
+FAILURE_RETRY = HOUR
+CRAWL_TIMEOUT = 4 * HOUR
+INGEST_TIMEOUT = 15 * 60
+POLL_SECONDS = 30
+
+# Fields that differ on every crawl, even when the listing did not change
+VOLATILE_FIELDS = ('fetched_at', 'run_id', 'updated_at')
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def snapshot_time(name):
+    return datetime.strptime(SNAPSHOT_RE.match(name).group('stamp'), '%Y%m%d_%H%M%S').timestamp()
+
+
+def stable_rows(path):
+    """{row key: row without its per-crawl fields} of one snapshot."""
+    rows, _ = split_rows(load_snapshot(path))
+    return {
+        key: {field: value for field, value in row.items() if field not in VOLATILE_FIELDS} if isinstance(row, dict) else row
+        for key, row in zip(row_keys(rows), rows)
+    }
+
+
+def diff_fraction(previous, current):
+    """Share of listings added, removed or changed between two snapshots."""
+    changed = len(previous.keys() ^ current.keys())
+    changed += sum(1 for key in previous.keys() & current.keys() if previous[key] != current[key])
+    return changed / max(len(previous), len(current), 1)
+
+
+def change_rate(directory, names):
+    """Fraction of listings changing per hour over the newest RATE_PAIRS crawls, or None."""
+    names = names[-(RATE_PAIRS + 1):]
+    if len(names) < 2:
+        return None
+    fractions = hours = 0.0
+    current = stable_rows(os.path.join(directory, names[0]))
+    for previous_name, name in zip(names, names[1:]):
+        previous, current = current, stable_rows(os.path.join(directory, name))
+        fractions += diff_fraction(previous, current)
+        hours += max(snapshot_time(name) - snapshot_time(previous_name), 60) / HOUR
+    return fractions / hours
+
+
+def cadence(rate):
+    """Seconds between crawls for a broker whose listings change at `rate` per hour."""
+    if rate is None:
+        return DEFAULT_INTERVAL
+    if rate <= 0:
+        return MAX_INTERVAL
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, TARGET_CHANGE / rate * HOUR))
+
+
+def host_load():
+    """(1-minute load average per core, memory percent in use)."""
+    return os.getloadavg()[0] / (os.cpu_count() or 1), psutil.virtual_memory().percent
+
+
+class Scheduler:
+    """Starts due crawls one tick at a time and records their outcome in STATE_FILE."""
+
+    def __init__(self, brokers, directory='.', state_path=STATE_FILE, publish_dir=None, max_running=MAX_RUNNING,
+                 stagger=STAGGER, max_load=MAX_LOAD, max_memory=MAX_MEMORY_PERCENT, history=False):
+        self.brokers = brokers
+        self.directory = directory
+        self.state_path = state_path
+        self.publish_dir = publish_dir
+        self.history = history
+        self.max_running = max_running
+        self.stagger = stagger
+        self.max_load = max_load
+        self.max_memory = max_memory
+        self.running = {}      # broker -> (process, log file, started, snapshot names before)
+        self.rates = {}        # broker -> (snapshot names, rate)
+        self.last_start = 0.0
+        self.deferred_at = 0.0
+        try:
+            with open(state_path) as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+
+    def save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def snapshots(self, broker):
+        return find_snapshots(self.directory).get(f'{broker}_properties', [])
+
+    def rate(self, broker, names):
+        """Change rate, recomputed only when the broker has new snapshots."""
+        cached = self.rates.get(broker)
+        if cached is None or cached[0] != names:
+            self.rates[broker] = (names, change_rate(self.directory, names))
+        return self.rates[broker][1]
+
+    def plan(self, now):
+        """One entry per broker, most urgent first."""
+        plan = []
+        for broker in self.brokers:
+            names = tuple(self.snapshots(broker))
+            rate = self.rate(broker, names)
+            interval = cadence(rate)
+            state = self.state.get(broker, {})
+            if names:
+                last_run = max(snapshot_time(names[-1]), state.get('last_success', 0))
+            else:
+                last_run = state.get('last_success', 0)
+            due_at = last_run + interval
+            if state.get('status') not in (None, 'ok'):
+                due_at = max(due_at, state.get('last_finished', 0) + FAILURE_RETRY)
+            plan.append({
+                'broker': broker,
+                'rate': rate,
+                'interval': interval,
+                'last_run': last_run or None,
+                'due_at': due_at,
+                'urgency': (now - last_run) / interval,
+                'status': state.get('status')
+            })
+        return sorted(plan, key=lambda entry: (entry['due_at'] > now, -entry['urgency']))
+
+    def start(self, broker, now):
+        os.makedirs(LOG_DIR, exist_ok=True)
+        log_path = os.path.join(LOG_DIR, f"{broker}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        log_file = open(log_path, 'w')
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 're_crawl.py')
+        process = subprocess.Popen([sys.executable, script, 'run', '--brokers', broker],
+                                   cwd=self.directory, stdout=log_file, stderr=subprocess.STDOUT)
+        self.running[broker] = (process, log_file, now, set(self.snapshots(broker)))
+        self.last_start = now
+        self.state.setdefault(broker, {})['last_started'] = now
+        self.save_state()
+        log(f"Started {broker} (pid {process.pid}), logging to {log_path}")
+
+    def reap(self, now):
+        """Record crawls that finished (or ran past CRAWL_TIMEOUT) and publish their output."""
+        for broker, (process, log_file, started, before) in list(self.running.items()):
+            returncode = process.poll()
+            if returncode is None and now - started > CRAWL_TIMEOUT:
+                log(f"{broker} ran for over {CRAWL_TIMEOUT // HOUR}h, stopping it")
+                process.terminate()
+                try:
+                    returncode = process.wait(timeout=60)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    returncode = process.wait()
+                status = 'timeout'
+            elif returncode is None:
+                continue
+            else:
+                status = 'ok' if returncode == 0 else 'failed'
+            del self.running[broker]
+
+            new_files = [name for name in self.snapshots(broker) if name not in before]
+            if status == 'ok' and not new_files:
+                status = 'failed'   # a crawl that saved nothing is retried like a failure
+            state = self.state.setdefault(broker, {})
+            state['last_finished'] = now
+            state['status'] = status
+            if status == 'ok':
+                state['last_success'] = now
+                self.publish(new_files, log_file)
+            log_file.close()
+            self.save_state()
+            log(f"{broker} finished: {status} after {(now - started) / 60:.1f} min, {len(new_files)} new files")
+
+    def publish(self, names, log_file):
+        if not self.publish_dir:
+            return
+        os.makedirs(self.publish_dir, exist_ok=True)
+        published = []
+        for name in names:
+            tmp_path = os.path.join(self.publish_dir, f".{name}.tmp")
+            shutil.copyfile(os.path.join(self.directory, name), tmp_path)
+            os.replace(tmp_path, os.path.join(self.publish_dir, name))
+            published.append(os.path.abspath(os.path.join(self.publish_dir, name)))
+            log(f"Published {name} to {self.publish_dir}")
+        if self.history and published:
+            self.record_history(published, log_file)
+
+    def record_history(self, paths, log_file):
+        """Ingest published files into the backend's history and alerts; the API's next load is the fallback."""
+        try:
+            subprocess.run([sys.executable, 'history.py', 'ingest', *paths], cwd=BACKEND_DIR,
+                           stdout=log_file, stderr=subprocess.STDOUT, timeout=INGEST_TIMEOUT, check=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            log(f"Could not record history for {len(paths)} files ({e}), the backend will on its next load")
+
+    def tick(self, now=None):
+        """Reap finished crawls, then start the most urgent due broker if the host allows it."""
+        now = now or time.time()
+        self.reap(now)
+        if len(self.running) >= self.max_running or now - self.last_start < self.stagger:
+            return None
+        due = [entry for entry in self.plan(now) if entry['due_at'] <= now and entry['broker'] not in self.running]
+        if not due:
+            return None
+        load, memory = host_load()
+        if load > self.max_load or memory > self.max_memory:
+            if now - self.deferred_at >= 5 * 60:
+                log(f"Host busy (load {load:.2f}/core, memory {memory:.0f}%), deferring {len(due)} due crawls")
+                self.deferred_at = now
+            return None
+        self.start(due[0]['broker'], now)
+        return due[0]['broker']
+
+    def run_forever(self):
+        log(f"Scheduling {', '.join(self.brokers)}")
+        try:
+            while True:
+                self.tick()
+                time.sleep(POLL_SECONDS)
+        except KeyboardInterrupt:
+            for broker, (process, _, _, _) in self.running.items():
+                log(f"Stopping {broker}")
+                process.terminate()
+
+
+def format_duration(seconds):
+    return f"{seconds / HOUR:.1f}h" if abs(seconds) < 2 * 24 * HOUR else f"{seconds / (24 * HOUR):.1f}d"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the broker crawls on change-driven, staggered schedules")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, help in (('plan', "Show each broker's change rate, cadence and next run"), ('run', "Run the scheduler")):
+        command = subparsers.add_parser(name, help=help)
+        command.add_argument('--brokers', help=f"Comma-separated (default: all of {', '.join(sorted(BROKERS))})")
+        command.add_argument('--dir', default='.', help="Where the crawlers write their property files")
+    run_parser = subparsers.choices['run']
+    run_parser.add_argument('--publish-dir', help="Copy each new property file here, e.g. backend/src/data/brokers")
+    run_parser.add_argument('--history', action='store_true',
+                            help="Record published files in the backend's history and alerts right away")
+    run_parser.add_argument('--max-running', type=int, default=MAX_RUNNING, help="Crawls allowed at the same time")
+    run_parser.add_argument('--stagger', type=float, default=STAGGER / 60, help="Minutes between two crawl starts")
+    run_parser.add_argument('--max-load', type=float, default=MAX_LOAD, help="Defer crawls above this load average per core")
+    run_parser.add_argument('--max-memory', type=float, default=MAX_MEMORY_PERCENT, help="Defer crawls above this memory percent")
+    args = parser.parse_args()
+
+    brokers = [broker.strip() for broker in args.brokers.split(',')] if args.brokers else sorted(BROKERS)
+    unknown = [broker for broker in brokers if broker not in BROKERS]
+    if unknown:
+        parser.error(f"unknown broker(s): {', '.join(unknown)}")
+
+    if args.command == 'plan':
+        scheduler = Scheduler(brokers, args.dir)
+        now = time.time()
+        print(f"{'broker':<18} {'changes/day':>11} {'cadence':>8} {'last run':>17} {'next run':>17}  status")
+        for entry in scheduler.plan(now):
+            rate = f"{entry['rate'] * 24:.1%}" if entry['rate'] is not None else 'n/a'
+            last_run = datetime.fromtimestamp(entry['last_run']).strftime('%Y-%m-%d %H:%M') if entry['last_run'] else 'never'
+            next_run = 'now' if entry['due_at'] <= now else datetime.fromtimestamp(entry['due_at']).strftime('%Y-%m-%d %H:%M')
+            print(f"{entry['broker']:<18} {rate:>11} {format_duration(entry['interval']):>8} {last_run:>17} {next_run:>17}  {entry['status'] or ''}")
+        return
+
+    Scheduler(brokers, args.dir, publish_dir=args.publish_dir, max_running=args.max_running, stagger=args.stagger * 60,
+              max_load=args.max_load, max_memory=args.max_memory, history=args.history).run_forever()
+
+
+if __name__ == '__main__':
+    main()
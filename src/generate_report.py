@@ -1,38 +1,233 @@
+import argparse
+import hashlib
 import json
 from datetime import datetime
+from functools import lru_cache
 import os
-from jinja2 import Environment, FileSystemLoader
-
-def generate_report(data):
-    # Setup Jinja2 environment
-    env = Environment(loader=FileSystemLoader('templates'))
-    template = env.get_template('report_template.html')
-    
-    # Prepare data for the template
-    properties = data.get('data', {}).get('properties', []) if isinstance(data, dict) else []
-    context = {
-        'properties': properties,
-        'generated_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'total_properties': len(properties)
+import re
+import sys
+import tempfile
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+# Snapshots are read through the backend's SnapshotStore (manifest and checksums)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'src'))
+from snapshots import SnapshotStore
+
+# Where the backend writes its snapshots (SNAPSHOT_DIR, relative to the repo root here)
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join('backend', 'src', 'data'))
+TEMPLATE_DIR = 'templates'
+OUTPUT_DIR = 'docs'
+PAGE_SIZE = 60
+
+# Last address part: a state code, optionally followed by a ZIP
+STATE_RE = re.compile(r'^[A-Z]{2}(\s+\d{5}(-\d{4})?)?$')
+
+# Which units each page was rendered from, so unchanged pages are skipped
+MANIFEST_NAME = 'report_manifest.json'
+
+
+@lru_cache(maxsize=None)
+def get_environment(template_dir=TEMPLATE_DIR):
+    """One Jinja2 environment per template directory, reused across reports.
+
+    Compiled templates are kept in memory and in a bytecode cache on disk,
+    so later runs skip parsing and compiling them.
+    """
+    cache_dir = os.path.join(tempfile.gettempdir(), 'report_template_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        autoescape=select_autoescape(['html']),
+        auto_reload=False
+    )
+
+
+@lru_cache(maxsize=None)
+def templates_hash(template_dir=TEMPLATE_DIR):
+    """Hash of every template source: a template edit re-renders every page."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(template_dir)):
+        with open(os.path.join(template_dir, name), 'rb') as f:
+            digest.update(name.encode('utf-8') + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or 'unknown'
+
+
+def broker_of(property):
+    """Broker name from the listing URL's domain (property.jll.com -> jll)."""
+    url = property.get('url') or ''
+    host = url.split('/')[2].split(':')[0].lower() if '://' in url else ''
+    labels = host.split('.')
+    return labels[-2] if len(labels) >= 2 else 'unknown'
+
+
+def city_of(property):
+    """City from an address like '184-10 Jamaica Ave, Jamaica, NY'."""
+    parts = [part.strip() for part in (property.get('address') or '').split(',')]
+    if len(parts) >= 3 and parts[-2] and STATE_RE.match(parts[-1]):
+        return parts[-2]
+    return 'Unknown'
+
+
+def read_latest_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """(path, data) of the snapshot the backend's manifest names as latest, or None if there is none.
+
+    Raises ValueError when the file does not match its manifest checksum.
+    """
+    if not os.path.isdir(snapshot_dir):
+        return None
+    store = SnapshotStore(snapshot_dir)
+    path = store.latest_path()
+    if path is None:
+        return None
+    return path, store.read(path)
+
+
+def load_properties(data):
+    """Properties of a raw_data snapshot, with location renamed to address."""
+    section = data.get('data', {}) if isinstance(data, dict) else {}
+    properties = section.get('properties') or section.get('listings') or []
+    for property in properties:
+        if 'address' not in property and 'location' in property:
+            property['address'] = property['location']
+    # A stable order keeps page contents stable between runs
+    return sorted(properties, key=lambda property: (property.get('address') or '', property.get('url') or ''))
+
+
+def paginated(prefix, heading, properties, root, page_size):
+    """(path, context) of each page of one listing section (one page if page_size <= 0)."""
+    if page_size <= 0:
+        page_size = max(1, len(properties))
+    pages = max(1, -(-len(properties) // page_size))
+    for page in range(1, pages + 1):
+        yield f'{prefix}/page-{page}.html', {
+            'heading': heading,
+            'root': root,
+            'total': len(properties),
+            'page': page,
+            'pages': pages,
+            'prev_url': f'page-{page - 1}.html' if page > 1 else None,
+            'next_url': f'page-{page + 1}.html' if page < pages else None,
+            'properties': properties[(page - 1) * page_size:page * page_size]
+        }
+
+
+def build_pages(properties, page_size=PAGE_SIZE):
+    """Index sections plus a generator of (path, context) for every listing page.
+
+    Pages are produced one at a time, so only the page being rendered has a
+    context in memory.
+    """
+    by_broker = {}
+    by_city = {}
+    for property in properties:
+        by_broker.setdefault(broker_of(property), []).append(property)
+        by_city.setdefault(city_of(property), []).append(property)
+
+    sections = {'brokers': [], 'cities': []}
+    groups = [('all', 'All properties', properties, '../')]
+    for key, grouped, directory in (('brokers', by_broker, 'broker'), ('cities', by_city, 'city')):
+        for name in sorted(grouped, key=lambda name: (-len(grouped[name]), name)):
+            prefix = f'{directory}/{slugify(name)}'
+            sections[key].append({'name': name, 'count': len(grouped[name]), 'url': f'{prefix}/page-1.html'})
+            groups.append((prefix, name, grouped[name], '../../'))
+
+    def pages():
+        for prefix, heading, members, root in groups:
+            yield from paginated(prefix, heading, members, root, page_size)
+    return sections, pages()
+
+
+def write_atomic(path, chunks):
+    """Write text (a str, or chunks from e.g. Template.generate) to a temp file, then rename it over path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        # writelines() over a str would write it one character at a time
+        if isinstance(chunks, str):
+            f.write(chunks)
+        else:
+            f.writelines(chunks)
+    os.replace(tmp_path, path)
+
+
+def generate_report(data, output_dir=OUTPUT_DIR, template_dir=TEMPLATE_DIR, page_size=PAGE_SIZE):
+    """Render the report into output_dir; returns (pages rendered, pages unchanged, pages removed).
+
+    Listing pages are only re-rendered when their properties (or the
+    templates) changed since the last run; pages that no longer exist are
+    deleted. The overview page is small and always rewritten. Pages are
+    streamed to disk with Template.generate(), so even an unpaginated
+    page (page_size <= 0) is never held in memory as one string.
+    """
+    env = get_environment(template_dir)
+    version = templates_hash(template_dir)
+    properties = load_properties(data)
+    sections, pages = build_pages(properties, page_size)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    # Each property appears on up to three pages; hash it once
+    property_hashes = {
+        id(property): hashlib.sha256(json.dumps(property, sort_keys=True, default=str).encode('utf-8')).digest()
+        for property in properties
     }
-    
-    # Generate HTML
-    html_content = template.render(context)
-    
-    # Save the report
-    os.makedirs('docs', exist_ok=True)
-    with open('docs/index.html', 'w') as f:
-        f.write(html_content)
+
+    page_template = env.get_template('report_page.html')
+    hashes = {}
+    rendered = 0
+    count = 0
+    for path, context in pages:
+        count += 1
+        digest = hashlib.sha256(version.encode('utf-8'))
+        digest.update(json.dumps({key: value for key, value in context.items() if key != 'properties'}, sort_keys=True).encode('utf-8'))
+        for property in context['properties']:
+            digest.update(property_hashes[id(property)])
+        hashes[path] = digest.hexdigest()
+        if previous.get(path) == hashes[path] and os.path.exists(os.path.join(output_dir, path)):
+            continue
+        write_atomic(os.path.join(output_dir, path), page_template.generate(context))
+        rendered += 1
+
+    removed = 0
+    for path in previous:
+        if path not in hashes and os.path.exists(os.path.join(output_dir, path)):
+            os.remove(os.path.join(output_dir, path))
+            removed += 1
+            # Drop the section's directory once its last page is gone
+            directory = os.path.dirname(os.path.join(output_dir, path))
+            if not os.listdir(directory):
+                os.rmdir(directory)
+
+    write_atomic(os.path.join(output_dir, 'index.html'), env.get_template('report_template.html').generate({
+        'generated_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'total_properties': len(properties),
+        'all_url': 'all/page-1.html' if properties else None,
+        **sections
+    }))
+    write_atomic(manifest_path, json.dumps(hashes, indent=1, sort_keys=True))
+    return rendered, count - rendered, removed
 
 if __name__ == "__main__":
-    # Read the latest data file
-    data_files = sorted([f for f in os.listdir('data') if f.startswith('raw_data_')])
-    if not data_files:
-        print("No data files found!")
-        exit(1)
-        
-    latest_file = data_files[-1]
-    with open(f'data/{latest_file}', 'r') as f:
-        data = json.load(f)
-    
-    generate_report(data)
+    parser = argparse.ArgumentParser(description="Render the static report into docs/")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help="Properties per page (0: one page per section)")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help=f"The backend's snapshot directory (default: {SNAPSHOT_DIR})")
+    args = parser.parse_args()
+
+    latest = read_latest_snapshot(args.snapshot_dir)
+    if latest is None:
+        print(f"No snapshots found in {args.snapshot_dir}!")
+        sys.exit(1)
+
+    latest_file, data = latest
+    rendered, unchanged, removed = generate_report(data, page_size=args.page_size)
+    print(f"Report from {latest_file}: {rendered} pages rendered, {unchanged} unchanged, {removed} removed")
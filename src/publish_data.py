@@ -0,0 +1,91 @@
+import argparse
+import hashlib
+import json
+from datetime import datetime
+import os
+import sys
+
+from generate_report import SNAPSHOT_DIR, broker_of, load_properties, read_latest_snapshot, write_atomic
+
+# The dashboard loads data/manifest.json relative to its own index.html, so
+# the shards go into the deployed frontend/ directory (PUBLISH_DATA_DIR or
+# --output to publish elsewhere)
+DATA_DIR = os.environ.get('PUBLISH_DATA_DIR', os.path.join('frontend', 'data'))
+SHARD_SIZE = 500
+
+# Columns the dashboard table shows, in the order shards store them
+COLUMNS = ('address', 'price', 'square_footage', 'number_of_units', 'url', 'contact_info')
+
+
+def shard_rows(properties):
+    return [[property.get(column) for column in COLUMNS] for property in properties]
+
+
+def publish_shards(data, output_dir=DATA_DIR, shard_size=SHARD_SIZE):
+    """Write the snapshot as static JSON shards plus manifest.json; returns the manifest.
+
+    Shards hold up to shard_size rows of one broker in the columnar shape
+    ({'columns': [...], 'rows': [[...], ...]}) and are named after their
+    content hash, so the CDN and browsers can cache them indefinitely and a
+    re-publish only changes the files whose rows changed. manifest.json is
+    the one small file that has to be re-fetched; its shards are listed
+    largest broker first, so the first one fills the table right away.
+    """
+    properties = load_properties(data)
+    by_broker = {}
+    for property in properties:
+        by_broker.setdefault(broker_of(property), []).append(property)
+
+    shard_dir = os.path.join(output_dir, 'shards')
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = []
+    for broker in sorted(by_broker, key=lambda broker: (-len(by_broker[broker]), broker)):
+        members = by_broker[broker]
+        for start in range(0, len(members), shard_size):
+            rows = shard_rows(members[start:start + shard_size])
+            body = json.dumps({'columns': COLUMNS, 'rows': rows}, separators=(',', ':'), ensure_ascii=False)
+            digest = hashlib.sha256(body.encode('utf-8')).hexdigest()[:12]
+            name = f'{broker}-{start // shard_size + 1}.{digest}.json'
+            path = os.path.join(shard_dir, name)
+            if not os.path.exists(path):
+                write_atomic(path, body)
+            shards.append({'broker': broker, 'file': f'shards/{name}', 'rows': len(rows)})
+
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {'shards': []}
+
+    manifest = {
+        'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'total': len(properties),
+        'columns': COLUMNS,
+        'shards': shards
+    }
+    write_atomic(manifest_path, json.dumps(manifest, indent=1))
+
+    # Keep the previous generation's shards: a page that loaded the old
+    # manifest a moment ago may still be fetching them
+    keep = {shard['file'] for shard in shards + previous['shards']}
+    for name in os.listdir(shard_dir):
+        if f'shards/{name}' not in keep:
+            os.remove(os.path.join(shard_dir, name))
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the latest snapshot as static JSON shards")
+    parser.add_argument('--output', default=DATA_DIR, help=f"Directory next to the dashboard's index.html (default: {DATA_DIR})")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help=f"The backend's snapshot directory (default: {SNAPSHOT_DIR})")
+    args = parser.parse_args()
+
+    latest = read_latest_snapshot(args.snapshot_dir)
+    if latest is None:
+        print(f"No snapshots found in {args.snapshot_dir}!")
+        sys.exit(1)
+
+    _, data = latest
+    manifest = publish_shards(data, args.output, args.shard_size)
+    print(f"{manifest['total']} properties in {len(manifest['shards'])} shards under {args.output}")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The crawler-side modules are flat scripts at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# So are the report and publishing scripts under src/
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
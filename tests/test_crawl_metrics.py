@@ -0,0 +1,63 @@
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from crawl_metrics import CrawlMetrics, MetricsServer
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_finish_writes_metrics_and_stops_serving(tmp_path, monkeypatch):
+    port = free_port()
+    monkeypatch.setenv('CRAWL_METRICS_PORT', str(port))
+    metrics = CrawlMetrics('lee', metrics_dir=str(tmp_path))
+    metrics.stage('pagination')
+    metrics.inc('units_total', 3)
+
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        assert 'crawl_units_total{broker="lee"} 3' in response.read().decode('utf-8')
+
+    path = metrics.finish()
+    assert 'crawl_stage_seconds{broker="lee",stage="pagination"}' in open(path).read()
+    with pytest.raises(urllib.error.URLError):
+        urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5)
+
+    # The port is free again for the next crawl (HTTPServer binds with SO_REUSEADDR too)
+    with socket.socket() as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('0.0.0.0', port))
+
+
+def test_finish_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.delenv('CRAWL_METRICS_PORT', raising=False)
+    metrics = CrawlMetrics('lee', metrics_dir=str(tmp_path))
+    assert metrics.finish() is not None
+    assert metrics.finish() is None
+
+
+def test_server_merges_each_family_across_brokers(tmp_path, monkeypatch):
+    parser = pytest.importorskip('prometheus_client.parser')
+    monkeypatch.delenv('CRAWL_METRICS_PORT', raising=False)
+    server = MetricsServer(free_port())
+    try:
+        for broker in ('lee', 'cbre'):
+            metrics = CrawlMetrics(broker, metrics_dir=str(tmp_path))
+            metrics.stage('pagination')
+            metrics.inc('units_total', 3)
+            metrics.observe('detail_fetch_seconds', 1.5)
+            server.register(metrics)
+        text = server.render()
+    finally:
+        server.close()
+
+    assert text.count('# TYPE crawl_units_total counter') == 1
+    # The parser names counter families without their _total suffix
+    families = {family.name: family for family in parser.text_string_to_metric_families(text)}
+    assert {sample.labels['broker'] for sample in families['crawl_units'].samples} == {'lee', 'cbre'}
+    assert len([sample for sample in families['crawl_detail_fetch_seconds'].samples if sample.name.endswith('_count')]) == 2
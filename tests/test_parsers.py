@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+pytest.importorskip('crawl4ai')
+
+import bench_parsers
+from brokers import BROKERS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), bench_parsers.FIXTURES_DIR)
+
+
+@pytest.mark.parametrize('broker', sorted(BROKERS))
+def test_parser_matches_golden_fixtures(broker):
+    stats, failures = bench_parsers.bench_broker(broker, 1, FIXTURES_DIR)
+    assert stats is not None, f"no fixtures for {broker}"
+    assert failures == []
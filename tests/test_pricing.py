@@ -0,0 +1,59 @@
+import pytest
+
+from pricing import IMPLAUSIBLE, UNRECOGNIZED, normalize, normalize_columns, parse_price
+
+
+@pytest.mark.parametrize('price, annual_psf', [
+    ('$2.25 SF/month', 27.0),
+    ('$45.00 SF/yr', 45.0),
+    ('$15.25/SF/Year', 15.25),
+    ('$28.50 psf, FS', 28.5),
+    ('$6.00 - 7.00 SF/yr', 6.0),
+    ('$57.00  (Annual)', 57.0),
+    ('$12.00 CAD SF/yr', 12.0),
+    ('$25.00', 25.0),
+    ('$33.00 USD', 33.0),
+    ('$24.50 NNN', 24.5),
+    ('$6.75 + Utilities', 6.75),
+    ('$72 per year', 72.0),
+    ('$3,408 per month', 16.36),
+    ('$120,000 per year', 48.0),
+])
+def test_quoted_prices(price, annual_psf):
+    result = normalize(price, '2,500 SF')
+    assert result.status == 'quoted'
+    assert result.annual_psf == annual_psf
+
+
+@pytest.mark.parametrize('price', ['Floor 3', 'Call 212-555-1234', '$1,500 / Unit / Month', '0'])
+def test_digits_without_a_price_are_unrecognized(price):
+    assert parse_price(price) == (None, UNRECOGNIZED, None)
+    assert normalize(price, '2,500 SF').annual_psf is None
+
+
+@pytest.mark.parametrize('price', ['$850/SF/Month', '$6,840.00 SF/yr', '$0.00 SF/yr', '$1,000 per month'])
+def test_implausible_psf_is_rejected(price):
+    result = normalize(price, '1 SF')
+    assert result == (None, None, 1.0, IMPLAUSIBLE)
+
+
+@pytest.mark.parametrize('price, status', [
+    ('Negotiable', 'negotiable'),
+    ('Rent Withheld', 'withheld'),
+    ('Call For Info', 'on_request'),
+    ('$ SF/yr', 'on_request'),
+    ('', 'on_request'),
+    (None, 'on_request'),
+])
+def test_prices_without_an_amount(price, status):
+    assert normalize(price, '2,500 SF').status == status
+
+
+def test_total_rent_needs_a_size_for_psf():
+    assert normalize('$3,408 per month', '') == (None, 40896.0, None, 'quoted')
+
+
+def test_normalize_columns_matches_normalize():
+    prices = ['$2.25 SF/month', 'Floor 3', '$2.25 SF/month']
+    spaces = ['2,500 SF', '2,500 SF', '1,000 SF']
+    assert normalize_columns(prices, spaces) == [normalize(*pair) for pair in zip(prices, spaces)]
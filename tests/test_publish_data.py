@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from generate_report import read_latest_snapshot, write_atomic
+from snapshots import SnapshotStore
+from publish_data import COLUMNS, publish_shards
+
+
+def test_write_atomic_accepts_a_str_or_chunks(tmp_path):
+    write_atomic(str(tmp_path / 'a.json'), '{"a": 1}')
+    write_atomic(str(tmp_path / 'b.html'), (chunk for chunk in ('<p>', 'x', '</p>')))
+    assert (tmp_path / 'a.json').read_text() == '{"a": 1}'
+    assert (tmp_path / 'b.html').read_text() == '<p>x</p>'
+
+
+def test_shards_round_trip_and_old_generations_are_pruned(tmp_path):
+    def snapshot(price):
+        return {'data': {'listings': [
+            {'location': f'{n} Main St', 'price': price, 'url': f'https://www.{broker}.com/{n}'}
+            for broker in ('jll', 'cbre') for n in range(3)
+        ]}}
+
+    first = publish_shards(snapshot('$1'), str(tmp_path), shard_size=2)
+    assert first['total'] == 6 and [shard['rows'] for shard in first['shards']] == [2, 1, 2, 1]
+    shard = json.loads((tmp_path / first['shards'][0]['file']).read_text())
+    assert shard['columns'] == list(COLUMNS) and shard['rows'][0][:2] == ['0 Main St', '$1']
+
+    second = publish_shards(snapshot('$2'), str(tmp_path), shard_size=2)
+    publish_shards(snapshot('$3'), str(tmp_path), shard_size=2)
+    on_disk = {f'shards/{path.name}' for path in (tmp_path / 'shards').iterdir()}
+    # The current and the previous generation stay, the one before is gone
+    assert not on_disk & {shard['file'] for shard in first['shards']}
+    assert {shard['file'] for shard in second['shards']} <= on_disk
+
+
+def test_latest_snapshot_follows_the_backend_manifest(tmp_path):
+    assert read_latest_snapshot(str(tmp_path / 'missing')) is None
+    store = SnapshotStore(str(tmp_path))
+    store.write({'data': {'listings': [{'n': 1}]}})
+    path = store.write({'data': {'listings': [{'n': 2}]}})
+    # A name that sorts last but is not in the manifest is not the latest
+    (tmp_path / 'raw_data_99991231_000000.json').write_text('{}')
+    assert read_latest_snapshot(str(tmp_path)) == (path, {'data': {'listings': [{'n': 2}]}})
+
+    with open(path, 'w') as f:
+        f.write('{"data": {"listings": []}}')
+    with pytest.raises(ValueError, match='checksum'):
+        read_latest_snapshot(str(tmp_path))
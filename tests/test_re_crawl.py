@@ -0,0 +1,63 @@
+import socket
+import sys
+import types
+import urllib.request
+
+import pytest
+
+try:
+    import crawl4ai  # noqa: F401
+except ImportError:
+    # crawl_engine only needs crawl4ai to build dispatchers, which these fake crawlers never do
+    sys.modules['crawl4ai'] = types.SimpleNamespace(MemoryAdaptiveDispatcher=None, CrawlerMonitor=None, DisplayMode=None)
+
+import brokers
+import re_crawl
+
+FAKE_CRAWLER = '''
+import urllib.request
+
+async def extract_property_urls(options=None):
+    options.metrics.stage('pagination')
+    options.metrics.inc('units_total', 2)
+    with urllib.request.urlopen('http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        SEEN.append(response.read().decode('utf-8'))
+    if options.broker == 'broken':
+        raise RuntimeError('browser did not start')
+    return [1, 2]
+
+SEEN = []
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_run_shares_one_metrics_server_across_brokers(tmp_path, monkeypatch):
+    port = free_port()
+    for name in ('alpha', 'beta', 'broken'):
+        (tmp_path / f'crawl_fake_{name}.py').write_text(FAKE_CRAWLER.format(port=port))
+        monkeypatch.setitem(brokers.BROKERS, name, f'crawl_fake_{name}')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('CRAWL_METRICS_PORT', str(port))
+    monkeypatch.setattr(sys, 'argv', ['re_crawl.py', 'run', '--brokers', 'alpha,broken,beta'])
+
+    with pytest.raises(SystemExit) as exit_info:
+        re_crawl.main()
+    assert exit_info.value.code == 1   # 'broken' failed, the others still ran
+
+    for name in ('alpha', 'beta', 'broken'):
+        seen = sys.modules[f'crawl_fake_{name}'].SEEN
+        assert len(seen) == 1
+        assert f'crawl_units_total{{broker="{name}"}} 2' in seen[0]
+        # Finished brokers are no longer served
+        assert 'broker="alpha"' not in seen[0] or name == 'alpha'
+        assert (tmp_path / 'metrics' / f'{name}.prom').exists()
+
+    # The server is stopped once the run is over
+    with pytest.raises(OSError):
+        urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5)
@@ -0,0 +1,45 @@
+import json
+from datetime import datetime
+
+import retention
+from retention import cold_snapshots, compact, find_snapshots, restore
+
+NOW = datetime(2025, 3, 1)
+
+
+def write(directory, name, rows):
+    (directory / name).write_text(json.dumps(rows))
+
+
+def test_keep_zero_never_archives_the_newest_snapshot():
+    names = ['lee_properties_20250101_000000.json', 'lee_properties_20250102_000000.json']
+    assert cold_snapshots(names, 0, 0, NOW) == names[:1]
+    assert cold_snapshots(names[1:], 0, 0, NOW) == []
+
+
+def test_manifest_latest_stays_hot(tmp_path):
+    for day in ('01', '02', '03'):
+        write(tmp_path, f'raw_data_202501{day}_000000.json', {'data': {'listings': [{'url': day, 'address': 'a'}]}})
+    # The manifest still serves an older snapshot, e.g. the newest one failed its checksum
+    (tmp_path / 'manifest.json').write_text(json.dumps({
+        'latest': 'raw_data_20250102_000000.json',
+        'snapshots': [{'file': f'raw_data_202501{day}_000000.json'} for day in ('01', '02', '03')]
+    }))
+    compact(str(tmp_path), keep=0, keep_days=0, now=NOW)
+    assert find_snapshots(str(tmp_path)) == {'raw_data': ['raw_data_20250102_000000.json', 'raw_data_20250103_000000.json']}
+
+
+def test_same_second_snapshots_sort_by_number(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, 'zstandard', None)
+    names = ['raw_data_20250101_000000.json'] + [f'raw_data_20250101_000000_{n}.json' for n in (2, 10, 3)]
+    for n, name in enumerate(names):
+        write(tmp_path, name, [{'url': 'u', 'address': 'a', 'n': n}])
+    write(tmp_path, 'raw_data_20250102_000000.json', [])
+
+    ordered = find_snapshots(str(tmp_path))['raw_data']
+    assert [name.split('000000')[1] for name in ordered[:-1]] == ['.json', '_2.json', '_3.json', '_10.json']
+
+    compact(str(tmp_path), keep=1, keep_days=0, now=NOW)
+    archived = [name for name, _, _ in retention.read_archive(str(tmp_path / 'archive' / 'raw_data_202501.jsonl.gz'))]
+    assert archived == ordered[:-1]
+    assert restore(str(tmp_path), 'raw_data', 'raw_data_20250101_000000_10.json')[1] == [{'url': 'u', 'address': 'a', 'n': 2}]
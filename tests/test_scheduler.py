@@ -0,0 +1,151 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import scheduler
+from scheduler import FAILURE_RETRY, HOUR, MAX_INTERVAL, MIN_INTERVAL, Scheduler
+
+START = datetime(2025, 3, 1, 12).timestamp()
+
+
+def stamp(when):
+    return datetime.fromtimestamp(when).strftime('%Y%m%d_%H%M%S')
+
+
+def write_snapshot(directory, broker, when, rows):
+    (directory / f'{broker}_properties_{stamp(when)}.json').write_text(json.dumps(rows))
+
+
+class FakeProcess:
+    """Stands in for a re_crawl.py run; exits with `result` once `finish()` is called, saving a snapshot on success."""
+
+    def __init__(self, result, save):
+        self.pid = 4242
+        self.result = result
+        self.save = save
+        self.returncode = None
+
+    def finish(self):
+        if self.result == 0:
+            self.save()
+        self.returncode = self.result
+
+    def poll(self):
+        return self.returncode
+
+
+@pytest.fixture
+def host(tmp_path, monkeypatch):
+    """Records the crawls started, with the host load and each crawl's outcome under the test's control."""
+    monkeypatch.setattr(scheduler, 'LOG_DIR', str(tmp_path / 'logs'))
+    monkeypatch.setattr(scheduler, 'log', lambda message: None)
+    state = {'load': (0.1, 10.0), 'returncode': 0, 'started': []}
+    monkeypatch.setattr(scheduler, 'host_load', lambda: state['load'])
+
+    def popen(args, cwd, **kwargs):
+        broker = args[args.index('--brokers') + 1]
+        now = state['now']
+        process = FakeProcess(state['returncode'], lambda: write_snapshot(tmp_path, broker, now, [{'url': 'new', 'address': 'a'}]))
+        state['started'].append((broker, process))
+        return process
+
+    monkeypatch.setattr(scheduler.subprocess, 'Popen', popen)
+    return state
+
+
+def make_scheduler(tmp_path, brokers=('lee',)):
+    return Scheduler(list(brokers), str(tmp_path), state_path=str(tmp_path / 'state.json'), stagger=0)
+
+
+def tick(sched, host, now):
+    host['now'] = now
+    return sched.tick(now)
+
+
+def test_due_broker_waits_while_the_host_is_busy(tmp_path, host):
+    sched = make_scheduler(tmp_path)
+    host['load'] = (2.0, 10.0)
+    assert tick(sched, host, START) is None
+    host['load'] = (0.1, 95.0)
+    assert tick(sched, host, START + 60) is None
+    assert host['started'] == []
+
+    host['load'] = (0.1, 10.0)
+    assert tick(sched, host, START + 120) == 'lee'
+
+
+def test_failed_crawl_is_retried_after_the_backoff(tmp_path, host):
+    sched = make_scheduler(tmp_path)
+    host['returncode'] = 1
+    assert tick(sched, host, START) == 'lee'
+    host['started'][-1][1].finish()
+
+    assert tick(sched, host, START + 60) is None
+    assert sched.state['lee']['status'] == 'failed'
+    assert tick(sched, host, START + FAILURE_RETRY - 60) is None
+    assert tick(sched, host, START + FAILURE_RETRY + 60) == 'lee'
+    assert len(host['started']) == 2
+
+
+def test_crawl_that_saves_nothing_counts_as_failed(tmp_path, host):
+    sched = make_scheduler(tmp_path)
+    tick(sched, host, START)
+    process = host['started'][-1][1]
+    process.save = lambda: None   # exits cleanly without writing a property file
+    process.finish()
+    sched.reap(START + 60)
+    assert sched.state['lee']['status'] == 'failed'
+
+
+def test_cadence_shortens_for_fast_changing_brokers(tmp_path, host):
+    rows = [{'url': str(n), 'address': 'a', 'price': 1} for n in range(10)]
+    changed = [dict(row, price=2) if n < 5 else row for n, row in enumerate(rows)]
+    for broker, second in (('fast', changed), ('slow', rows)):
+        write_snapshot(tmp_path, broker, START - 12 * HOUR, rows)
+        write_snapshot(tmp_path, broker, START - 6 * HOUR, second)
+    sched = make_scheduler(tmp_path, brokers=('slow', 'fast'))
+
+    plan = {entry['broker']: entry for entry in sched.plan(START)}
+    assert plan['fast']['rate'] == pytest.approx(0.5 / 6)
+    assert plan['fast']['interval'] == MIN_INTERVAL
+    assert plan['slow']['interval'] == MAX_INTERVAL
+    # Half the listings changed in six hours, so the fast broker is due and goes first
+    assert [entry['broker'] for entry in sched.plan(START)] == ['fast', 'slow']
+    assert tick(sched, host, START) == 'fast'
+
+
+def test_state_survives_a_restart(tmp_path, host):
+    sched = make_scheduler(tmp_path, brokers=('lee', 'cbre'))
+    assert tick(sched, host, START) in ('lee', 'cbre')
+    first = host['started'][-1]
+    first[1].finish()
+    host['returncode'] = 1
+    second_broker = tick(sched, host, START + 60)
+    assert second_broker != first[0]
+    host['started'][-1][1].finish()
+    sched.reap(START + 120)
+
+    restarted = make_scheduler(tmp_path, brokers=('lee', 'cbre'))
+    assert restarted.state[first[0]]['status'] == 'ok'
+    assert restarted.state[first[0]]['last_success'] == START + 60
+    assert restarted.state[second_broker]['status'] == 'failed'
+    # Neither broker is due again: one just succeeded, the other waits out its retry delay
+    assert tick(restarted, host, START + 180) is None
+    assert tick(restarted, host, START + 120 + FAILURE_RETRY + 60) == second_broker
+
+
+def test_published_files_are_recorded_in_the_backend_history(tmp_path, host, monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduler.subprocess, 'run', lambda args, cwd, **kwargs: calls.append((args, cwd)))
+    sched = Scheduler(['lee'], str(tmp_path), state_path=str(tmp_path / 'state.json'), stagger=0,
+                      publish_dir=str(tmp_path / 'published'), history=True)
+    tick(sched, host, START)
+    host['started'][-1][1].finish()
+    sched.reap(START + 60)
+
+    name = f'lee_properties_{stamp(START)}.json'
+    assert (tmp_path / 'published' / name).exists()
+    [(args, cwd)] = calls
+    assert args[1:] == ['history.py', 'ingest', str(tmp_path / 'published' / name)]
+    assert cwd == scheduler.BACKEND_DIR
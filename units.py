@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import time
+import weakref
+from datetime import datetime
+
+import arrow
+
+from geocode import Geocoder
+from pricing import normalize_units
+
+# How updated_at used to be stored, and how fetch times are still shown
+DISPLAY_FORMAT = 'h:mm:ssA M/D/YY'
+
+
+def new_run_id():
+    """Identifier for one crawl run: its UTC start time, sortable as a string."""
+    return arrow.utcnow().format('YYYYMMDD[T]HHmmss[Z]')
+
+
+def to_epoch(value):
+    """Coerce a fetch time (epoch seconds, ISO string, datetime or Arrow) to epoch seconds."""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return arrow.get(value).timestamp()
+
+
+def format_fetched_at(fetched_at, tz='local'):
+    """Render a fetch time the way the old updated_at column looked ("12:05:44PM 2/4/25")."""
+    return arrow.get(fetched_at).to(tz).format(DISPLAY_FORMAT)
+
+
+class Property:
+    """Property-level fields shared by every unit listed on the same page.
+
+    Instances are interned: Property.intern() returns the existing record for
+    the same (name, address, location, listing_url), so a building with 30
+    suites stores those strings once instead of once per unit row.
+    """
+    __slots__ = ('property_name', 'address', 'location', 'listing_url', '__weakref__')
+
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, property_name, address, listing_url, location=None):
+        self.property_name = property_name
+        self.address = address
+        self.location = location
+        self.listing_url = listing_url
+
+    @classmethod
+    def intern(cls, property_name, address, listing_url, location=None):
+        key = (property_name, address, location, listing_url)
+        record = cls._interned.get(key)
+        if record is None:
+            record = cls(property_name, address, listing_url, location)
+            cls._interned[key] = record
+        return record
+
+
+class Unit:
+    """One available suite. Property-level fields live on `self.property`.
+
+    fetched_at is the epoch time the detail page was fetched (shared by every
+    unit on the page) and run_id names the crawl run; neither is formatted
+    until something displays it.
+    """
+    __slots__ = ('property', 'floor_suite', 'space_available', 'price', 'fetched_at', 'run_id')
+
+    def __init__(self, property, floor_suite, space_available, price, fetched_at, run_id=None):
+        self.property = property
+        # Unit-level values repeat a lot across rows ("N/A", "Contact for
+        # Details"), so keep a single copy of each
+        self.floor_suite = sys.intern(floor_suite)
+        self.space_available = sys.intern(space_available)
+        self.price = sys.intern(price)
+        self.fetched_at = fetched_at
+        self.run_id = run_id
+
+    @property
+    def updated_at(self):
+        return format_fetched_at(self.fetched_at)
+
+    def to_dict(self, iso_cache=None):
+        """The row written to <broker>_properties_*.json.
+
+        iso_cache maps fetched_at to its ISO string, so a page's units share
+        one formatted value when a whole file is serialized.
+        """
+        if iso_cache is None:
+            iso_cache = {}
+        fetched_at = iso_cache.get(self.fetched_at)
+        if fetched_at is None:
+            fetched_at = iso_cache[self.fetched_at] = arrow.get(self.fetched_at).isoformat()
+        record = self.property
+        row = {"property_name": record.property_name, "address": record.address}
+        if record.location is not None:
+            row["location"] = record.location
+        row["listing_url"] = record.listing_url
+        row["floor_suite"] = self.floor_suite
+        row["space_available"] = self.space_available
+        row["price"] = self.price
+        row["fetched_at"] = fetched_at
+        row["run_id"] = self.run_id
+        return row
+
+    @classmethod
+    def from_dict(cls, row, epoch_cache=None):
+        """Build a Unit from a file row, including pre-run_id rows that only carry updated_at."""
+        if epoch_cache is None:
+            epoch_cache = {}
+        stamp = row.get("fetched_at") or row["updated_at"]
+        fetched_at = epoch_cache.get(stamp)
+        if fetched_at is None:
+            if "fetched_at" in row:
+                fetched_at = arrow.get(stamp).timestamp()
+            else:
+                fetched_at = arrow.get(stamp, DISPLAY_FORMAT, tzinfo='local').timestamp()
+            epoch_cache[stamp] = fetched_at
+        record = Property.intern(row["property_name"], row["address"], row["listing_url"], row.get("location"))
+        return cls(record, row["floor_suite"], row["space_available"], row["price"], fetched_at, row.get("run_id"))
+
+
+def dump_units(units, geocoder=None):
+    """Serialize units as a compact JSON array (one pass through the C encoder).
+
+    Each row also gets annual_psf and annual_rent from pricing.py and
+    lat/lon/borough from geocode.py, so readers never have to interpret the
+    broker's price or address strings themselves.
+    """
+    geocoder = geocoder or Geocoder()
+    iso_cache = {}
+    rows = []
+    for unit, rent, place in zip(units, normalize_units(units), geocoder.resolve_units(units)):
+        row = unit.to_dict(iso_cache)
+        row["annual_psf"] = rent.annual_psf
+        row["annual_rent"] = rent.annual_rent
+        row["size_sf"] = rent.size_sf
+        row["lat"] = place["lat"]
+        row["lon"] = place["lon"]
+        row["borough"] = place["borough"]
+        rows.append(row)
+    return json.dumps(rows, separators=(',', ':'))
+
+
+def save_units(broker, units, output_dir='.'):
+    """Write units to <output_dir>/<broker>_properties_<timestamp>.json and return the path."""
+    timestamp = arrow.now().format('YYYYMMDD_HHmmss')
+    output_file = os.path.join(output_dir, f"{broker}_properties_{timestamp}.json")
+    geocoder = Geocoder()
+    with open(output_file, 'w') as f:
+        f.write(dump_units(units, geocoder))
+    # Only addresses first seen in this crawl were resolved; keep them
+    geocoder.save()
+    return output_file
+
+
+def load_units(path):
+    """Load a <broker>_properties_*.json file back into interned Unit objects."""
+    epoch_cache = {}
+    with open(path) as f:
+        return [Unit.from_dict(row, epoch_cache) for row in json.load(f)]